@@ -0,0 +1,101 @@
+"""
+Cache codec benchmark: compression ratio, encode/decode CPU and end-to-end hit latency over local Redis.
+
+    python -m bin.bench_codec --samples pages.ndjson     # one Jikan page (JSON) per line
+    python -m bin.bench_codec --fetch 20                 # or pull N pages of /anime from Jikan first (slow, rate limited)
+
+The zstd+dict row trains a dictionary on half of the samples and measures on the other half,
+so the ratio isn't flattered by compressing the training set.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from redis.asyncio import Redis
+
+from src import config
+from src.cache.codec import Codec, train_dictionary, zstandard
+
+
+def fetch_samples(pages: int) -> list[dict]:
+    samples = []
+    with httpx.Client(timeout=10.0) as client:
+        for page in range(1, pages + 1):
+            samples.append(client.get("https://api.jikan.moe/v4/anime", params={"order_by": "members", "sort": "desc", "page": page}).json())
+            time.sleep(1)   # jikan rate limit
+    return samples
+
+
+def cpu_per_op(fn, items: list, rounds: int) -> float:
+    start = time.process_time()
+    for _ in range(rounds):
+        for item in items:
+            fn(item)
+    return (time.process_time() - start) / (rounds * len(items)) * 1e6
+
+
+async def hit_latency(redis: Redis, codec: Codec, encoded: list[bytes], rounds: int) -> list[float]:
+    keys = [f"bench:codec:{i}" for i in range(len(encoded))]
+    for key, value in zip(keys, encoded):
+        await redis.set(key, value, ex=300)
+
+    latencies = []
+    for _ in range(rounds):
+        for key in keys:
+            start = time.perf_counter()
+            codec.decode(await redis.get(key))
+            latencies.append((time.perf_counter() - start) * 1e3)
+    await redis.delete(*keys)
+    return latencies
+
+
+async def main(args):
+    if args.samples:
+        with open(args.samples) as f:
+            samples = [json.loads(line) for line in f if line.strip()]
+    else:
+        samples = fetch_samples(args.fetch)
+    train, test = samples[::2], samples[1::2] or samples
+
+    codecs = {
+        "plain": Codec("off", 0, config.CACHE_ZSTD_LEVEL, None),
+        "zlib": Codec("zlib", 0, config.CACHE_ZSTD_LEVEL, None),
+    }
+    if zstandard is not None:
+        codecs["zstd"] = Codec("zstd", 0, config.CACHE_ZSTD_LEVEL, None)
+        dict_path = Path(tempfile.mkdtemp()) / "bench.zdict"
+        dict_path.write_bytes(train_dictionary([json.dumps(s, separators=(",", ":")).encode() for s in train], dict_size=args.dict_size))
+        codecs["zstd+dict"] = Codec("zstd", 0, config.CACHE_ZSTD_LEVEL, dict_path)
+    else:
+        print("zstandard not installed, skipping zstd rows")
+
+    redis = Redis.from_url(args.redis_url)
+    raw_size = sum(len(json.dumps(s, separators=(",", ":"))) for s in test)
+    print(f"{len(test)} test pages, avg {raw_size / len(test) / 1024:.1f} KiB raw JSON\n")
+    print(f"{'codec':<10} {'ratio':>6} {'enc us':>8} {'dec us':>8} {'hit p50 ms':>11} {'hit p99 ms':>11}")
+
+    for name, codec in codecs.items():
+        encoded = [codec.encode(s) for s in test]
+        ratio = raw_size / sum(map(len, encoded))
+        enc_us = cpu_per_op(codec.encode, test, args.rounds)
+        dec_us = cpu_per_op(codec.decode, encoded, args.rounds)
+        latencies = sorted(await hit_latency(redis, codec, encoded, args.rounds))
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"{name:<10} {ratio:>6.2f} {enc_us:>8.1f} {dec_us:>8.1f} {statistics.median(latencies):>11.3f} {p99:>11.3f}")
+
+    await redis.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", help="NDJSON file of Jikan pages")
+    parser.add_argument("--fetch", type=int, default=20, help="pages to pull from Jikan when --samples isn't given")
+    parser.add_argument("--redis-url", default="redis://localhost:6379")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--dict-size", type=int, default=32 * 1024)
+    asyncio.run(main(parser.parse_args()))
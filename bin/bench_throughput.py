@@ -0,0 +1,135 @@
+"""
+End to end throughput of serve.py with 1, 2 and 4 workers.
+
+    python -m bin.bench_throughput --workers 1 2 4 --duration 15 --concurrency 64
+    python -m bin.bench_throughput --workers 1 --backend memory     # handler CPU alone, no Redis round trips
+
+Starts bin/fake_jikan (so the upstream is never the bottleneck and nobody hammers the real Jikan),
+then for every worker count starts serve.py against it and a local Redis (db 15, flushed between runs),
+replays a fixed mix of requests (mostly cache hits, like production) and prints req/s, p50 and p99.
+The load generator runs on the same machine, so numbers only mean something relative to each other.
+With --backend memory every worker caches in-process (src/cache/memory_backend.py), so the difference
+with --backend redis is what the network hop costs.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from redis import Redis
+
+
+BODIES = [
+    {"status": status, "order_by": order_by, "type": media_type}
+    for status in ("airing", "complete", "upcoming")
+    for order_by in ("score", "popularity")
+    for media_type in ("tv", "movie")
+]
+
+
+def wait_until_up(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def stop(process: subprocess.Popen):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=40)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def load(base_url: str, duration: float, concurrency: int, pages: int) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+    requests = [(body, page) for body in BODIES for page in range(1, pages + 1)]
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=httpx.Limits(max_connections=concurrency)) as client:
+        # one pass to fill the cache, the run itself measures the steady state
+        for body, page in requests:
+            await client.post("/get_recommendation/anime", params={"page": page}, json=body)
+
+        deadline = time.perf_counter() + duration
+
+        async def user(offset: int):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                body, page = requests[i % len(requests)]
+                start = time.perf_counter()
+                response = await client.post("/get_recommendation/anime", params={"page": page}, json=body)
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+                i += 1
+
+        await asyncio.gather(*(user(n) for n in range(concurrency)))
+    return latencies, errors
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--jikan-port", type=int, default=8100)
+    parser.add_argument("--backend", choices=["redis", "memory"], default="redis")
+    args = parser.parse_args()
+
+    redis = Redis(host="localhost", port=6379, db=15) if args.backend == "redis" else None
+    fake_jikan = subprocess.Popen([sys.executable, "-m", "bin.fake_jikan", "--port", str(args.jikan_port)])
+    try:
+        wait_until_up(f"http://127.0.0.1:{args.jikan_port}/v4/genres/anime")
+        print(f"cpus={os.cpu_count()} duration={args.duration}s concurrency={args.concurrency} backend={args.backend}")
+        print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+
+        # keep fake-upstream keys out of the real warmup manifest, and every run starts cold
+        manifest_path = os.path.join(tempfile.gettempdir(), "anireco_bench_manifest.json")
+        for workers in args.workers:
+            if redis is not None:
+                redis.flushdb()
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)
+            env = os.environ | {
+                "ANIRECO_WORKERS": str(workers),
+                "ANIRECO_CACHE_BACKEND": args.backend,
+                "ANIRECO_PORT": str(args.port),
+                "ANIRECO_REDIS_DB": "15",
+                "ANIRECO_JIKAN_BASE_URL": f"http://127.0.0.1:{args.jikan_port}/v4",
+                "ANIRECO_JIKAN_RATE": "10000",
+                "ANIRECO_JIKAN_BURST": "10000",
+                "ANIRECO_WARMUP_MANIFEST_PATH": manifest_path,
+            }
+            server = subprocess.Popen([sys.executable, "serve.py"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_up(f"http://127.0.0.1:{args.port}/ready")
+                latencies, errors = asyncio.run(load(f"http://127.0.0.1:{args.port}", args.duration, args.concurrency, args.pages))
+            finally:
+                stop(server)
+
+            print(f"{workers:>7} {len(latencies) / args.duration:>9.0f} {percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} {errors:>7}")
+    finally:
+        stop(fake_jikan)
+        if redis is not None:
+            redis.flushdb()
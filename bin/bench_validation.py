@@ -0,0 +1,53 @@
+"""
+Per-request cost of params validation + canonicalization.
+
+    python -m bin.bench_validation
+
+"dump json" is the old path (model_dump(mode="json") on every request), "canonical" is
+canonical_params(), cold (first time a distinct request is seen) and warm (memoized).
+"""
+import argparse
+import json
+import time
+
+from src.data.schemas import AnimeParams, canonical_pairs
+
+
+BODIES = [
+    {"status": "airing", "order_by": "scored_by"},
+    {"order_by": "score", "type": "tv", "min_score": 7.5, "genres": ["Action", "Comedy"]},
+    {"status": "complete", "start_date": "2010-01-01", "end_date": "2015-12-31", "rating": "pg13"},
+    {"genres": ["Romance"], "type": "movie", "max_score": 9, "sfw": "true"},
+]
+
+
+def per_op(fn, items: list, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for item in items:
+            fn(item)
+    return (time.perf_counter() - start) / (rounds * len(items)) * 1e6
+
+
+def cold_canonical(params: AnimeParams) -> dict:
+    canonical_pairs.cache_clear()
+    return params.canonical_params()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    raw_bodies = [json.dumps(body).encode() for body in BODIES]
+    models = [AnimeParams.model_validate(body) for body in BODIES]
+
+    rows = [
+        ("validate (python dict)", lambda body: AnimeParams.model_validate(body), BODIES),
+        ("validate (raw json)", lambda raw: AnimeParams.model_validate_json(raw), raw_bodies),
+        ("dump json (old path)", lambda params: params.model_dump(mode="json", exclude_none=True), models),
+        ("canonical, cold", cold_canonical, models),
+        ("canonical, warm", lambda params: params.canonical_params(), models),
+    ]
+    for name, fn, items in rows:
+        print(f"{name:<24} {per_op(fn, items, args.rounds):>7.2f} us/request")
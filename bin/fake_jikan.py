@@ -0,0 +1,156 @@
+"""
+Local stand-in for the Jikan API, for benchmarks and offline runs. Never point production at it.
+
+    python -m bin.fake_jikan --port 8100
+    ANIRECO_JIKAN_BASE_URL=http://127.0.0.1:8100/v4 python serve.py
+
+Serves /v4/anime, /v4/manga (25 items a page, deterministic catalog), /v4/{anime,manga}/{id} and
+/v4/genres/{anime,manga}. Filters other than status, type and start_date are ignored, order_by supports
+mal_id and start_date. Pages carry an ETag and honor If-None-Match, like Jikan.
+--latency adds a fixed delay per request to look like a real upstream.
+--revision N moves the catalog forward in time (some airing/publishing titles finish), for incremental ingest runs.
+"""
+import argparse
+import asyncio
+import datetime
+import hashlib
+import json
+import random
+
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import Response
+import uvicorn
+
+
+PAGE_SIZE = 25
+GENRES = ["Action", "Adventure", "Comedy", "Drama", "Fantasy", "Horror", "Mystery", "Romance", "Sci-Fi", "Slice of Life", "Sports", "Supernatural"]
+STATUSES = {
+    "anime": ["Finished Airing", "Currently Airing", "Not yet aired"],
+    "manga": ["Finished", "Publishing", "On Hiatus", "Discontinued", "Not yet published"],
+}
+STATUS_PARAMS = {
+    "anime": {"airing": "Currently Airing", "complete": "Finished Airing", "upcoming": "Not yet aired"},
+    "manga": {"publishing": "Publishing", "complete": "Finished", "hiatus": "On Hiatus", "discontinued": "Discontinued", "upcoming": "Not yet published"},
+}
+FINISHED = {"anime": "Finished Airing", "manga": "Finished"}
+ONGOING = {"anime": "Currently Airing", "manga": "Publishing"}
+TODAY = datetime.date(2026, 1, 1)
+TYPES = {"anime": ["TV", "Movie", "OVA", "ONA", "Special"], "manga": ["Manga", "Novel", "Manhwa", "Manhua", "Oneshot"]}
+DAYS = ["Mondays", "Tuesdays", "Wednesdays", "Thursdays", "Fridays", "Saturdays", "Sundays"]
+
+
+def build_catalog(media: str, size: int, seed: int = 7, revision: int = 0) -> list[dict]:
+    rng = random.Random(f"{media}:{seed}")
+    items = []
+    for mal_id in range(1, size + 1):
+        status = rng.choice(STATUSES[media])
+        if status.startswith("Not yet"):
+            start = TODAY + datetime.timedelta(days=rng.randint(1, 365))
+        elif status == ONGOING[media]:
+            start = TODAY - datetime.timedelta(days=rng.randint(0, 400))
+        else:
+            start = TODAY - datetime.timedelta(days=rng.randint(30, 9000))
+        item = {
+            "mal_id": mal_id,
+            "url": f"https://myanimelist.net/{media}/{mal_id}",
+            "title": f"{media.title()} {mal_id}",
+            "type": rng.choice(TYPES[media]),
+            "status": status,
+            "score": round(rng.uniform(4, 9.5), 2),
+            "scored_by": rng.randint(100, 2_000_000),
+            "synopsis": " ".join(rng.choice(GENRES).lower() for _ in range(60)),
+            "genres": [{"mal_id": GENRES.index(g) + 1, "type": media, "name": g} for g in rng.sample(GENRES, 3)],
+        }
+        if media == "anime":
+            item["airing"] = status == "Currently Airing"
+            item["aired"] = {"from": f"{start.isoformat()}T00:00:00+00:00"}
+            item["broadcast"] = {"day": rng.choice(DAYS), "time": f"{rng.randint(0, 23):02}:00", "timezone": "Asia/Tokyo"} if item["airing"] else {}
+        else:
+            item["publishing"] = status == "Publishing"
+            item["published"] = {"from": f"{start.isoformat()}T00:00:00+00:00"}
+        # applied last, so every revision makes the same draws and only these titles differ
+        if status == ONGOING[media] and revision and mal_id % 5 == revision % 5:
+            item["status"] = FINISHED[media]
+            item["airing" if media == "anime" else "publishing"] = False
+            if media == "anime":
+                item["broadcast"] = {}
+        items.append(item)
+    return items
+
+
+def start_date(item: dict) -> str:
+    return (item.get("aired") or item.get("published"))["from"][:10]
+
+
+def create_app(size: int = 2000, latency: float = 0.0, revision: int = 0) -> FastAPI:
+    app = FastAPI()
+    catalogs = {media: build_catalog(media, size, revision=revision) for media in ("anime", "manga")}
+    by_id = {media: {item["mal_id"]: item for item in items} for media, items in catalogs.items()}
+
+    def page_response(payload: dict, if_none_match: str | None) -> Response:
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+    @app.get("/v4/genres/{media}")
+    async def genres(media: str):
+        return {"data": [{"mal_id": i + 1, "name": name, "url": "", "count": 0} for i, name in enumerate(GENRES)]}
+
+    @app.get("/v4/{media}/{mal_id:int}")
+    async def single(media: str, mal_id: int):
+        if latency:
+            await asyncio.sleep(latency)
+        item = by_id.get(media, {}).get(mal_id)
+        if item is None:
+            return Response(status_code=404, content=json.dumps({"status": 404, "message": "Not found"}), media_type="application/json")
+        return {"data": item}
+
+    @app.get("/v4/{media}")
+    async def search(media: str, request: Request, if_none_match: str | None = Header(default=None)):
+        if latency:
+            await asyncio.sleep(latency)
+        if media not in catalogs:
+            return Response(status_code=404, content=json.dumps({"status": 404, "message": "Not found"}), media_type="application/json")
+
+        params = request.query_params
+        items = catalogs[media]
+        if "status" in params:
+            items = [i for i in items if i["status"] == STATUS_PARAMS[media].get(params["status"], params["status"])]
+        if "type" in params:
+            items = [i for i in items if i["type"].lower() == params["type"].lower()]
+        if "start_date" in params:
+            items = [i for i in items if start_date(i) >= params["start_date"]]
+        if params.get("order_by") == "start_date":
+            items = sorted(items, key=start_date)
+        if params.get("sort") == "desc":
+            items = items[::-1]
+
+        page = max(1, int(params.get("page", 1)))
+        limit = min(PAGE_SIZE, int(params.get("limit", PAGE_SIZE)))
+        last_page = max(1, -(-len(items) // limit))
+        data = items[(page - 1) * limit:page * limit]
+        payload = {
+            "pagination": {
+                "last_visible_page": last_page,
+                "has_next_page": page < last_page,
+                "current_page": page,
+                "items": {"count": len(data), "total": len(items), "per_page": limit},
+            },
+            "data": data,
+        }
+        return page_response(payload, if_none_match)
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--size", type=int, default=2000, help="items per catalog")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every search")
+    parser.add_argument("--revision", type=int, default=0, help="catalog revision, > 0 finishes some ongoing titles")
+    args = parser.parse_args()
+    uvicorn.run(create_app(size=args.size, latency=args.latency, revision=args.revision), host=args.host, port=args.port, log_level="warning")
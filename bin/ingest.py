@@ -0,0 +1,47 @@
+"""
+Mirror the Jikan catalogs into the local store (ANIRECO_CATALOG_DB_PATH, default var/catalog.db).
+
+    python -m bin.ingest anime manga --full       # everything. Resumes if a previous full run was interrupted
+    python -m bin.ingest anime manga              # incremental: ongoing/upcoming/recent titles only
+
+Jikan's rate limit is for the whole deployment: while the API runs, give the ingest its own share
+(ex: ANIRECO_JIKAN_RATE=0.3 python -m bin.ingest anime).
+
+End to end against the fake upstream (tests/test_ingest.py runs the same in process: a full run killed midway
+and resumed, then an incremental run after --revision 1):
+
+    python -m bin.fake_jikan --port 8100 &
+    ANIRECO_JIKAN_BASE_URL=http://127.0.0.1:8100/v4 ANIRECO_JIKAN_RATE=50 ANIRECO_JIKAN_BURST=10 python -m bin.ingest anime --full
+    # restart the fake with --revision 1 (some airing titles finish), then
+    ANIRECO_JIKAN_BASE_URL=http://127.0.0.1:8100/v4 ANIRECO_JIKAN_RATE=50 ANIRECO_JIKAN_BURST=10 python -m bin.ingest anime
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from src import config
+from src.catalog.ingest import CatalogIngest
+from src.catalog.store import MEDIA, CatalogStore
+
+
+async def main(media_list: list[str], full: bool):
+    store = CatalogStore(config.CATALOG_DB_PATH)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as client:
+        ingest = CatalogIngest(store=store, client=client)
+        try:
+            for media in media_list:
+                start = time.perf_counter()
+                written = await (ingest.full(media) if full else ingest.incremental(media))
+                print(f"{media}: {written} title/s written, {store.count(media)} in store ({time.perf_counter() - start:.1f}s)")
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("media", nargs="+", choices=MEDIA)
+    parser.add_argument("--full", action="store_true", help="crawl everything instead of an incremental update")
+    args = parser.parse_args()
+    asyncio.run(main(args.media, args.full))
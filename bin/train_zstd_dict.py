@@ -0,0 +1,54 @@
+"""
+Train the zstd dictionary used by src/cache/codec.py from real cached Jikan pages.
+
+    python -m bin.train_zstd_dict                       # samples l1:/l2: entries from local Redis
+    python -m bin.train_zstd_dict --samples pages.ndjson   # or from a file, one Jikan page (JSON) per line
+
+Writes to ANIRECO_CACHE_ZSTD_DICT_PATH (default var/jikan.zdict). Every worker needs the same file,
+entries compressed with a dictionary a worker doesn't have are treated as misses there.
+"""
+import argparse
+import asyncio
+import json
+
+from redis.asyncio import Redis
+
+from src import config
+from src.cache.codec import codec, train_dictionary
+
+
+async def samples_from_redis(url: str, limit: int) -> list[bytes]:
+    redis = Redis.from_url(url)
+    samples = []
+    for pattern in ("l1:*", "l2:*"):
+        async for key in redis.scan_iter(match=pattern, count=500):
+            value = await redis.get(key)
+            data = codec.decode(value) if value else None
+            if data is not None:
+                samples.append(json.dumps(data, separators=(",", ":")).encode())
+            if len(samples) >= limit:
+                break
+    await redis.aclose()
+    return samples
+
+
+def samples_from_file(path: str) -> list[bytes]:
+    with open(path, "rb") as f:
+        return [json.dumps(json.loads(line), separators=(",", ":")).encode() for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", help="NDJSON file of Jikan pages (default: sample local Redis)")
+    parser.add_argument("--redis-url", default="redis://localhost:6379")
+    parser.add_argument("--limit", type=int, default=2000)
+    parser.add_argument("--dict-size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    samples = samples_from_file(args.samples) if args.samples else asyncio.run(samples_from_redis(args.redis_url, args.limit))
+    print(f"{len(samples)} samples, {sum(map(len, samples)) / 1024:.1f} KiB")
+
+    dict_bytes = train_dictionary(samples, dict_size=args.dict_size)
+    config.CACHE_ZSTD_DICT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    config.CACHE_ZSTD_DICT_PATH.write_bytes(dict_bytes)
+    print(f"Dictionary written to {config.CACHE_ZSTD_DICT_PATH} ({len(dict_bytes) / 1024:.1f} KiB)")
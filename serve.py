@@ -0,0 +1,35 @@
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from src import config
+
+"""
+Production entry point. main.py stays the dev one (reload, single worker).
+
+    ANIRECO_WORKERS=4 python serve.py
+
+- Every worker is its own process with its own lifespan: HTTP client, Redis pool, in-process caches,
+  prefetcher and its share of the Jikan budget. Workers share nothing but Redis.
+- uvloop and httptools are picked up when installed ("auto").
+- SIGTERM / SIGINT: stop accepting, give in-flight requests ANIRECO_GRACEFUL_TIMEOUT seconds, run lifespan shutdown.
+- SIGHUP: zero-downtime reload. Workers are replaced one at a time and each replacement is serving
+  before the old worker is retired (the listening socket stays open in the supervisor the whole time).
+- SIGTTIN / SIGTTOU: one worker more / less.
+All of it with ANIRECO_WORKERS=1 too: the supervisor runs even for a single worker.
+"""
+
+if __name__ == "__main__":
+    server_config = uvicorn.Config(
+        "src.app:app",
+        host=config.HOST,
+        port=config.PORT,
+        workers=config.WORKERS,
+        loop="auto",
+        http="auto",
+        timeout_graceful_shutdown=config.GRACEFUL_TIMEOUT,
+        proxy_headers=True,
+        access_log=False,
+    )
+    # always supervised, a single worker included: uvicorn.run() serves one worker in-process,
+    # where SIGHUP would kill the server instead of reloading it
+    Multiprocess(server_config, sockets=[server_config.bind_socket()]).run()
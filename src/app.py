@@ -1,40 +1,86 @@
 from contextlib import asynccontextmanager
+import os
 import time
-from fastapi import FastAPI, Depends
-
-
-from src.request_handlers import reco_request_handler
-
-from src.data.schemas import AnimeParams, MangaParams
+from typing import Annotated
+from fastapi import Body, FastAPI, Depends, Header, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+
+from src.request_handlers import MAX_BATCH_SIZE, MAX_STREAM_PAGES, http_request_handler, reco_batch_handler, reco_request_handler, reco_stream_handler, req_collapser
+
+from src import config
+from src.cache.backend import create_backend
+from src.cache.budgets import cache_budgets
+from src.cache.feeds import canned_feeds
+from src.cache.local_cache import local_cache
+from src.cache.negative import negative_cache
+from src.cache.prefetch import prefetcher
+from src.cache.redis_health import redis_health
+from src.cache.rollups import hotness_rollups
+from src.cache.warmup import warmup
+from src.data.schemas import AnimeParams, AnimeQuery, MangaParams, MangaQuery
+from src.dependencies.admin import require_admin
 from src.dependencies.services import ServiceProvider
 from src.tools.Logs import Logger
+from src.tools.profiling import ProfilingMiddleware, flight_recorder
 
 import httpx
 
-from redis.asyncio import Redis
 
 
 
 
 
-
-# Logging for debugging
-app_logger = Logger(logger_name='app_logger', log_file='app.log').get_logger()
+# Logging for debugging. One file per worker process when there are several (see serve.py)
+app_logger = Logger(logger_name='app_logger', log_file='app.log' if config.WORKERS == 1 else f'app.{os.getpid()}.log').get_logger()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     
     app.state.client = httpx.AsyncClient(timeout=httpx.Timeout(10.0))
-    app.state.redis = Redis(host="localhost", port=6379, decode_responses=True)
+    # Redis, or the in-process backend (CACHE_BACKEND, see src/cache/backend.py). Still app.state.redis/services.redis
+    app.state.redis = create_backend()
     app_logger.info("HTTP client started")
-    app_logger.info("Redis connection started\n")
+    app_logger.info(f"Cache backend started ({config.CACHE_BACKEND})")
+    if config.CACHE_BACKEND == "memory" and config.WORKERS > 1:
+        app_logger.warning("Memory cache backend with several workers: each one has its own cache, nothing is shared")
+    req_collapser.start(services=ServiceProvider.from_state(app.state))
+    app_logger.info("Request collapser listening")
+    prefetcher.start(services=ServiceProvider.from_state(app.state))
+    app_logger.info("Prefetcher started")
+    # not awaited: the worker serves (cold) traffic while the manifest is replayed
+    warmup.start(services=ServiceProvider.from_state(app.state))
+    app_logger.info("Warmup started")
+    cache_budgets.start(services=ServiceProvider.from_state(app.state))
+    app_logger.info("Cache budget sweeper started")
+    negative_cache.start(services=ServiceProvider.from_state(app.state))
+    app_logger.info("Negative cache sync started")
+    hotness_rollups.start(services=ServiceProvider.from_state(app.state))
+    app_logger.info("Hotness rollups started")
+    canned_feeds.start(services=ServiceProvider.from_state(app.state))
+    app_logger.info("Canned feeds started\n")
 
     yield
 
+    await canned_feeds.stop()
+    app_logger.info("Canned feeds stopped")
+    # flushed before warmup writes its last manifest out of them
+    await hotness_rollups.stop()
+    app_logger.info("Hotness rollups flushed and stopped")
+    await negative_cache.stop()
+    app_logger.info("Negative cache sync stopped")
+    await cache_budgets.stop()
+    app_logger.info("Cache budget sweeper stopped")
+    await warmup.stop()
+    app_logger.info("Warmup stopped, manifest written")
+    await prefetcher.stop()
+    app_logger.info("Prefetcher stopped")
+    await req_collapser.stop()
+    app_logger.info("Request collapser stopped")
     await app.state.client.aclose()
-    await app.state.redis.close()
-    app_logger.info("Redis connection closed")
+    await app.state.redis.aclose()
+    app_logger.info("Cache backend closed")
     app_logger.info("HTTP client closed")
 
 
@@ -42,19 +88,168 @@ async def lifespan(app: FastAPI):
 app = FastAPI(lifespan=lifespan)
 # ===================================
 
+# opt-in span trees, see src/tools/profiling.py
+app.add_middleware(ProfilingMiddleware)
+
 
     
 
 
 
 @app.post("/get_recommendation/anime", status_code=200)
-async def get_recommendation(params: AnimeParams, services: ServiceProvider = Depends(ServiceProvider)) -> dict:
+async def get_recommendation(params: AnimeParams, page: int = Query(default=1, ge=1), services: ServiceProvider = Depends(ServiceProvider)) -> dict:
 
     # TODO: MAKE SURE TO RETURN AND CACHE ONLY NECESSARY DATA (Name, Start/End Date, Score, ).
 
     start_time = time.perf_counter()
     app_logger.info("Request Received!")
-    result = await reco_request_handler(params=params, services=services)
+    result = await reco_request_handler(params=params, services=services, page=page)
+    end_time = time.perf_counter()
+    app_logger.info(f"Request Handled! ({end_time - start_time:4F}s)\n")
+    return result
+
+
+
+@app.post("/get_recommendation/manga", status_code=200)
+async def get_manga_recommendation(params: MangaParams, page: int = Query(default=1, ge=1), services: ServiceProvider = Depends(ServiceProvider)) -> dict:
+
+    start_time = time.perf_counter()
+    app_logger.info("Request Received!")
+    result = await reco_request_handler(params=params, services=services, page=page)
     end_time = time.perf_counter()
     app_logger.info(f"Request Handled! ({end_time - start_time:4F}s)\n")
     return result
+
+
+
+
+# Cacheable variant of the POST endpoints: same canonical query, but with ETag/304 and pre-compressed bodies
+@app.get("/get_recommendation/anime", status_code=200)
+async def get_recommendation_cacheable(params: Annotated[AnimeQuery, Query()],
+                                       if_none_match: str | None = Header(default=None), accept_encoding: str | None = Header(default=None),
+                                       services: ServiceProvider = Depends(ServiceProvider)) -> Response:
+
+    start_time = time.perf_counter()
+    app_logger.info("GET Request Received!")
+    response = await http_request_handler(params=params, services=services, if_none_match=if_none_match, accept_encoding=accept_encoding)
+    end_time = time.perf_counter()
+    app_logger.info(f"GET Request Handled! [{response.status_code}] ({end_time - start_time:4F}s)\n")
+    return response
+
+
+
+@app.get("/get_recommendation/manga", status_code=200)
+async def get_manga_recommendation_cacheable(params: Annotated[MangaQuery, Query()],
+                                             if_none_match: str | None = Header(default=None), accept_encoding: str | None = Header(default=None),
+                                             services: ServiceProvider = Depends(ServiceProvider)) -> Response:
+
+    start_time = time.perf_counter()
+    app_logger.info("GET Request Received!")
+    response = await http_request_handler(params=params, services=services, if_none_match=if_none_match, accept_encoding=accept_encoding)
+    end_time = time.perf_counter()
+    app_logger.info(f"GET Request Handled! [{response.status_code}] ({end_time - start_time:4F}s)\n")
+    return response
+
+
+
+
+# several carousels in one request. results in the same order, errors per item
+@app.post("/get_recommendation/anime/batch", status_code=200)
+async def batch_recommendation(params: Annotated[list[AnimeParams], Body(min_length=1, max_length=MAX_BATCH_SIZE)], services: ServiceProvider = Depends(ServiceProvider)) -> dict:
+
+    start_time = time.perf_counter()
+    app_logger.info(f"Batch Request Received! ({len(params)} item/s)")
+    results = await reco_batch_handler(params_list=params, services=services)
+    end_time = time.perf_counter()
+    app_logger.info(f"Batch Request Handled! ({end_time - start_time:4F}s)\n")
+    return {"results": results}
+
+
+
+@app.post("/get_recommendation/manga/batch", status_code=200)
+async def batch_manga_recommendation(params: Annotated[list[MangaParams], Body(min_length=1, max_length=MAX_BATCH_SIZE)], services: ServiceProvider = Depends(ServiceProvider)) -> dict:
+
+    start_time = time.perf_counter()
+    app_logger.info(f"Batch Request Received! ({len(params)} item/s)")
+    results = await reco_batch_handler(params_list=params, services=services)
+    end_time = time.perf_counter()
+    app_logger.info(f"Batch Request Handled! ({end_time - start_time:4F}s)\n")
+    return {"results": results}
+
+
+
+
+# readiness probe: 503 until startup warmup reached WARMUP_READY_COVERAGE
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    return JSONResponse(
+        status_code=200 if warmup.ready else 503,
+        content={"ready": warmup.ready, "coverage": round(warmup.coverage, 3), "warmed": warmup.warmed, "total": warmup.total},
+    )
+
+
+
+# occupancy per cache class. redis: as of the last budget sweep (any worker), local: this worker
+@app.get("/admin/cache", dependencies=[Depends(require_admin)])
+async def cache_stats(services: ServiceProvider = Depends(ServiceProvider)) -> dict:
+    redis_stats = None if redis_health.degraded else await cache_budgets.stats(services.redis)
+    return {"redis": redis_stats, "local": local_cache.stats(), "redis_degraded": redis_health.degraded}
+
+
+
+# top-K queries/params/pages over the last `hours`, every worker's traffic (flushed every ROLLUP_INTERVAL)
+@app.get("/admin/hotness", dependencies=[Depends(require_admin)])
+async def hotness_report(hours: float = Query(default=24, gt=0), k: int = Query(default=20, ge=1, le=500),
+                         services: ServiceProvider = Depends(ServiceProvider)) -> dict:
+    report = None if redis_health.degraded else await hotness_rollups.report(services.redis, hours=hours, k=k)
+    return {"report": report, "redis_degraded": redis_health.degraded}
+
+
+
+# canned feeds this worker routes, with their stored version and refresh schedule
+@app.get("/admin/feeds", dependencies=[Depends(require_admin)])
+async def feeds_status(services: ServiceProvider = Depends(ServiceProvider)) -> dict:
+    feeds = None if redis_health.degraded else await canned_feeds.status(services.redis)
+    return {"feeds": feeds, "redis_degraded": redis_health.degraded}
+
+
+
+# flight recorder of this worker: slow (or X-Profile) requests, newest last
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def profiles() -> dict:
+    return {"slow_ms": config.PROFILE_SLOW_MS, "sample_rate": config.PROFILE_SAMPLE_RATE,
+            "profiles": [profile.summary() for profile in flight_recorder.profiles]}
+
+
+
+# every recorded profile as folded stacks (µs), for flamegraph.pl / speedscope
+@app.get("/admin/profiles/folded", dependencies=[Depends(require_admin)])
+async def profiles_folded() -> PlainTextResponse:
+    return PlainTextResponse(flight_recorder.folded(list(flight_recorder.profiles)))
+
+
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def profile_detail(profile_id: int, format: str = Query(default="json", pattern="^(json|folded)$")) -> Response:
+    profile = flight_recorder.get(profile_id)
+    if profile is None:
+        return JSONResponse(status_code=404, content={"detail": "Profile not found (or already out of the buffer)"})
+    if format == "folded":
+        return PlainTextResponse(flight_recorder.folded([profile]))
+    return JSONResponse(profile.to_dict())
+
+
+
+
+# NDJSON: one line per page, first line goes out as soon as page 1 is ready
+@app.post("/get_recommendation/anime/stream", status_code=200)
+async def stream_recommendation(params: AnimeParams, pages: int = Query(default=3, ge=1, le=MAX_STREAM_PAGES), services: ServiceProvider = Depends(ServiceProvider)) -> StreamingResponse:
+    app_logger.info(f"Stream Request Received! ({pages} page/s)")
+    return StreamingResponse(await reco_stream_handler(params=params, services=services, pages=pages), media_type="application/x-ndjson")
+
+
+
+@app.post("/get_recommendation/manga/stream", status_code=200)
+async def stream_manga_recommendation(params: MangaParams, pages: int = Query(default=3, ge=1, le=MAX_STREAM_PAGES), services: ServiceProvider = Depends(ServiceProvider)) -> StreamingResponse:
+    app_logger.info(f"Stream Request Received! ({pages} page/s)")
+    return StreamingResponse(await reco_stream_handler(params=params, services=services, pages=pages), media_type="application/x-ndjson")
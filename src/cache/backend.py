@@ -0,0 +1,94 @@
+from typing import Any, AsyncIterator, Protocol
+
+from redis.asyncio import BlockingConnectionPool, Redis
+
+from src import config
+
+
+"""
+Cache backends. Everything that caches talks to services.redis through CacheBackend: the subset of
+redis.asyncio.Redis (decode_responses=False: values come back as bytes) this codebase uses.
+
+    redis    redis.asyncio.Redis itself, shared by every worker and every node (default)
+    memory   src/cache/memory_backend.py, in-process. No server, no network hop: tests, benchmarks that
+             measure handler CPU alone, single-worker edge nodes. Nothing is shared between workers
+
+Picked with CACHE_BACKEND. New code only uses commands listed here (and the memory backend implements them).
+"""
+
+
+class CachePipeline(Protocol):
+    """Commands are queued (and chainable: pipe.get(a).ttl(a)), execute() sends them and returns their results in order"""
+    def __getattr__(self, command: str) -> Any: ...
+    async def execute(self) -> list: ...
+    async def __aenter__(self) -> "CachePipeline": ...
+    async def __aexit__(self, *exc) -> None: ...
+
+
+class CachePubSub(Protocol):
+    async def subscribe(self, *channels: str) -> None: ...
+    async def unsubscribe(self, *channels: str) -> None: ...
+    async def get_message(self, ignore_subscribe_messages: bool = False, timeout: float | None = 0.0) -> dict | None: ...
+    def listen(self) -> AsyncIterator[dict]: ...
+    async def aclose(self) -> None: ...
+
+
+class CacheBackend(Protocol):
+    # strings / counters
+    async def get(self, name: str) -> bytes | None: ...
+    async def set(self, name: str, value, ex: int | None = None, nx: bool = False) -> bool | None: ...
+    async def setnx(self, name: str, value) -> bool: ...
+    async def incr(self, name: str, amount: int = 1) -> int: ...
+
+    # keys
+    async def exists(self, *names: str) -> int: ...
+    async def delete(self, *names: str) -> int: ...
+    async def expire(self, name: str, time: int) -> bool: ...
+    async def ttl(self, name: str) -> int: ...
+    def scan_iter(self, match: str | None = None, count: int | None = None) -> AsyncIterator[bytes]: ...
+
+    # hashes
+    async def hget(self, name: str, key: str) -> bytes | None: ...
+    async def hmget(self, name: str, keys: list, *args) -> list[bytes | None]: ...
+    async def hgetall(self, name: str) -> dict[bytes, bytes]: ...
+    async def hset(self, name: str, key: str | None = None, value=None, mapping: dict | None = None) -> int: ...
+    async def hsetnx(self, name: str, key: str, value) -> bool: ...
+    async def hdel(self, name: str, *keys: str) -> int: ...
+    async def hincrby(self, name: str, key: str, amount: int = 1) -> int: ...
+
+    # sorted sets
+    async def zadd(self, name: str, mapping: dict, nx: bool = False) -> int: ...
+    async def zincrby(self, name: str, amount: float, value) -> float: ...
+    async def zrem(self, name: str, *values) -> int: ...
+    async def zremrangebyrank(self, name: str, min: int, max: int) -> int: ...
+    async def zrange(self, name: str, start: int, end: int, withscores: bool = False) -> list: ...
+    async def zrangebyscore(self, name: str, min, max, withscores: bool = False) -> list: ...
+    async def zremrangebyscore(self, name: str, min, max) -> int: ...
+
+    # pub/sub
+    async def publish(self, channel: str, message) -> int: ...
+    def pubsub(self) -> CachePubSub: ...
+
+    def pipeline(self, transaction: bool = True) -> CachePipeline: ...
+    async def flushdb(self) -> bool: ...
+    async def aclose(self) -> None: ...
+
+
+
+def create_backend() -> CacheBackend:
+    if config.CACHE_BACKEND == "memory":
+        from src.cache.memory_backend import MemoryBackend
+        return MemoryBackend()
+    if config.CACHE_BACKEND != "redis":
+        raise ValueError(f"Unknown ANIRECO_CACHE_BACKEND: {config.CACHE_BACKEND!r} (redis or memory)")
+
+    # raw bytes: cached values may be compressed (src/cache/codec.py)
+    # bounded pool: when it's exhausted callers wait REDIS_POOL_TIMEOUT at most, then the request degrades (redis_health)
+    return Redis.from_pool(BlockingConnectionPool(
+        host=config.REDIS_HOST, port=config.REDIS_PORT, db=config.REDIS_DB,
+        max_connections=config.REDIS_MAX_CONNECTIONS,
+        timeout=config.REDIS_POOL_TIMEOUT,
+        socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=config.REDIS_CONNECT_TIMEOUT,
+        health_check_interval=30,
+    ))
@@ -0,0 +1,205 @@
+import asyncio
+import time
+
+from redis.exceptions import RedisError
+
+from src import config
+from src.cache.redis_health import redis_health
+from src.dependencies.services import ServiceProvider
+from src.tools.background import BackgroundJobs
+
+
+"""
+Cache classes. Every cached thing belongs to one, each with its own memory budget and eviction policy,
+so a burst of cheap counters or one-off pages can't push out lookup tables or hot pages.
+
+    counters  hot_request|*, param_hotness|*      coldest (lowest count) first. They expire in 60s anyway
+    lookups   lookup:*                            never evicted, everything depends on them. Only reported
+    negative  pages with no results               oldest first
+    hot       pages get_cache_level calls hot     lowest hotness per byte first (big pages have to earn their space)
+    regular   every other page                    least recently used first
+    feeds     feed:* (src/cache/feeds.py)          never evicted, they must never miss. Only reported
+
+Pages keep their l1:/l2: keys. Each class has its own namespace of bookkeeping keys next to them:
+    cache_index:{class}   zset, key -> eviction score (lowest goes first)
+    cache_sizes:{class}   hash, key -> bytes
+    cache_stats:{class}   hash, entries/bytes/budget/evictions as of the last sweep
+A page's http:/validators: keys go with it when it's evicted.
+"""
+
+CACHE_CLASSES: dict[str, str] = {      # class -> eviction policy
+    "counters": "coldest",
+    "lookups": "none",
+    "negative": "oldest",
+    "hot": "value_per_byte",
+    "regular": "lru",
+    "feeds": "none",
+}
+
+# get_cache_level "description" -> class
+DESCRIPTION_CLASSES = {
+    "hot_request": "hot",
+    "hot_params": "hot",
+    "negative_cache": "negative",
+    "regular_cache": "regular",
+}
+
+PAGE_CLASSES = ("negative", "hot", "regular")
+COUNTER_PATTERNS = ("hot_request|*", "param_hotness|*")
+COUNTER_OVERHEAD = 64           # bytes Redis spends on a small string key besides the key itself (approx.)
+
+
+def page_class(cache_status: dict, data: dict) -> str:
+    """A page with no results stays negative even when a hit re-levels it as hot/regular"""
+    if not data.get("data"):
+        return "negative"
+    return DESCRIPTION_CLASSES[cache_status["description"]]
+
+
+def index_score(cache_class: str, size: int, hotness: int) -> float:
+    policy = CACHE_CLASSES[cache_class]
+    if policy == "value_per_byte":
+        return hotness / max(size, 1)
+    if policy in ("lru", "oldest"):
+        return time.time()
+    return 0
+
+
+def track(pipe, cache_class: str, key: str, size: int, hotness: int = 0, reclassify: bool = False):
+    """
+    Queue the bookkeeping of a cache write/hit on a pipeline the caller already sends.
+    reclassify: the key may have been tracked under another page class before (a rewrite), drop that
+    """
+    pipe.zadd(f"cache_index:{cache_class}", {key: index_score(cache_class, size, hotness)}, nx=CACHE_CLASSES[cache_class] == "oldest")
+    pipe.hset(f"cache_sizes:{cache_class}", key, size)
+    if reclassify:
+        for other in PAGE_CLASSES:
+            if other != cache_class:
+                pipe.zrem(f"cache_index:{other}", key)
+                pipe.hdel(f"cache_sizes:{other}", key)
+
+
+
+class CacheBudgets(BackgroundJobs):
+    """
+    Every CACHE_SWEEP_INTERVAL one worker (cache_budgets:sweep lock) sweeps each class:
+    drops index entries whose key expired, then evicts by policy until the class fits its budget,
+    and writes the class's occupancy to cache_stats:{class}.
+    """
+    def __init__(self, budgets: dict[str, int], interval: float):
+        super().__init__()
+        self.budgets = budgets
+        self.interval = interval
+
+
+    def jobs(self, services: ServiceProvider):
+        return [self.sweeper(services)]
+
+
+    async def sweeper(self, services: ServiceProvider):
+        from src.app import app_logger
+
+        redis = services.redis
+        while True:
+            await asyncio.sleep(self.interval)
+            if redis_health.degraded:
+                continue
+            try:
+                if not await redis.set("cache_budgets:sweep", 1, nx=True, ex=max(1, int(self.interval))):
+                    continue
+                for cache_class in CACHE_CLASSES:
+                    stats = await (self.sweep_counters(redis) if cache_class == "counters" else self.sweep(redis, cache_class))
+                    if stats["evicted"]:
+                        app_logger.info(f"Cache class {cache_class}: evicted {stats["evicted"]} key/s, {stats["bytes"]}/{stats["budget"]} bytes")
+            except RedisError as e:
+                redis_health.trip(repr(e))
+                app_logger.warning(f"Cache budget sweep failed! {e!r}")
+
+
+    async def sweep(self, redis, cache_class: str) -> dict:
+        index_key, sizes_key = f"cache_index:{cache_class}", f"cache_sizes:{cache_class}"
+        budget = self.budgets[cache_class]
+
+        # lowest score first = eviction order
+        keys = [key.decode() for key in await redis.zrange(index_key, 0, -1)]
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.exists(key)
+            pipe.hgetall(sizes_key)
+            *alive, sizes = await pipe.execute()
+
+        sizes = {key.decode(): int(size) for key, size in sizes.items()}
+        expired = [key for key, exists in zip(keys, alive) if not exists]
+        live = [key for key, exists in zip(keys, alive) if exists]
+        used = sum(sizes.get(key, 0) for key in live)
+
+        victims = []
+        if CACHE_CLASSES[cache_class] != "none":
+            for key in live:
+                if used <= budget:
+                    break
+                victims.append(key)
+                used -= sizes.get(key, 0)
+
+        async with redis.pipeline(transaction=False) as pipe:
+            if victims:
+                pipe.delete(*victims)
+                for key in victims:
+                    if key.startswith(("l1:", "l2:")):
+                        request_name = key.split(":", 1)[1]
+                        pipe.delete(f"http:{request_name}", f"validators:{request_name}")
+            if expired or victims:
+                pipe.zrem(index_key, *expired, *victims)
+                pipe.hdel(sizes_key, *expired, *victims)
+            self.write_stats(pipe, cache_class, entries=len(live) - len(victims), used=used, evicted=len(victims))
+            await pipe.execute()
+        return {"bytes": used, "budget": budget, "evicted": len(victims)}
+
+
+    async def sweep_counters(self, redis) -> dict:
+        """Counters aren't indexed (one more write per request isn't worth it), they're scanned"""
+        budget = self.budgets["counters"]
+
+        keys = []
+        for pattern in COUNTER_PATTERNS:
+            keys += [key async for key in redis.scan_iter(match=pattern, count=1000)]
+        used = sum(len(key) + COUNTER_OVERHEAD for key in keys)
+
+        victims = []
+        if used > budget:
+            async with redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.get(key)
+                counts = await pipe.execute()
+            for key, count in sorted(zip(keys, counts), key=lambda item: int(item[1] or 0)):
+                if used <= budget:
+                    break
+                victims.append(key)
+                used -= len(key) + COUNTER_OVERHEAD
+
+        async with redis.pipeline(transaction=False) as pipe:
+            if victims:
+                pipe.delete(*victims)
+            self.write_stats(pipe, "counters", entries=len(keys) - len(victims), used=used, evicted=len(victims))
+            await pipe.execute()
+        return {"bytes": used, "budget": budget, "evicted": len(victims)}
+
+
+    def write_stats(self, pipe, cache_class: str, entries: int, used: int, evicted: int):
+        stats_key = f"cache_stats:{cache_class}"
+        pipe.hset(stats_key, mapping={"entries": entries, "bytes": used, "budget": self.budgets[cache_class], "swept_at": time.time()})
+        pipe.hincrby(stats_key, "evictions", evicted)
+
+
+    async def stats(self, redis) -> dict:
+        """Occupancy per class as of the last sweep, whichever worker did it"""
+        async with redis.pipeline(transaction=False) as pipe:
+            for cache_class in CACHE_CLASSES:
+                pipe.hgetall(f"cache_stats:{cache_class}")
+            results = await pipe.execute()
+        return {
+            cache_class: {"policy": CACHE_CLASSES[cache_class], **{k.decode(): float(v) if k == b"swept_at" else int(v) for k, v in stats.items()}}
+            for cache_class, stats in zip(CACHE_CLASSES, results)
+        }
+
+cache_budgets = CacheBudgets(budgets=config.CACHE_BUDGETS, interval=config.CACHE_SWEEP_INTERVAL)
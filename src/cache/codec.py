@@ -0,0 +1,102 @@
+import json
+import struct
+import zlib
+
+from src import config
+
+try:
+    import zstandard
+except ImportError:         # optional. without it large values fall back to zlib
+    zstandard = None
+
+
+"""
+Cache value format
+
+Small values (< CACHE_COMPRESSION_MIN_BYTES) and everything written before this codec existed
+are plain JSON, so any reader can handle them. Large values get a header:
+
+    b"AZ" | version (1 byte) | codec (1 byte) | [dict id (4 bytes, zstd+dict only)] | payload
+
+Readers accept both, which is what makes a mixed rollout safe: deploy readers first
+(ANIRECO_CACHE_COMPRESSION=off), then turn compression on.
+"""
+
+MAGIC = b"AZ"
+VERSION = 1
+
+PLAIN = 0
+ZLIB = 1
+ZSTD = 2
+ZSTD_DICT = 3
+
+
+class Codec:
+    def __init__(self, compression: str, min_bytes: int, zstd_level: int, dict_path):
+        self.min_bytes = min_bytes
+        self.dict_data = None
+        self.dict_id = 0
+
+        if compression == "zstd" and zstandard is None:
+            compression = "zlib"
+        self.compression = compression
+
+        if zstandard is not None:
+            if dict_path is not None and dict_path.exists():
+                self.dict_data = zstandard.ZstdCompressionDict(dict_path.read_bytes())
+                self.dict_id = self.dict_data.dict_id()
+            # compressor/decompressor objects are reused, building them per call costs more than small payloads
+            self.compressor = zstandard.ZstdCompressor(level=zstd_level, dict_data=self.dict_data)
+            self.plain_decompressor = zstandard.ZstdDecompressor()
+            self.dict_decompressor = zstandard.ZstdDecompressor(dict_data=self.dict_data) if self.dict_data else None
+
+
+    def encode(self, data: dict) -> bytes:
+        raw = json.dumps(data, separators=(",", ":")).encode()
+        if self.compression == "off" or len(raw) < self.min_bytes:
+            return raw
+
+        if self.compression == "zstd":
+            if self.dict_data is not None:
+                return MAGIC + struct.pack(">BBI", VERSION, ZSTD_DICT, self.dict_id) + self.compressor.compress(raw)
+            return MAGIC + struct.pack(">BB", VERSION, ZSTD) + self.compressor.compress(raw)
+        return MAGIC + struct.pack(">BB", VERSION, ZLIB) + zlib.compress(raw, 6)
+
+
+    def decode(self, value: bytes | str) -> dict | None:
+        """None means "can't read this here" (ex: unknown dictionary) and should be treated as a miss"""
+        if isinstance(value, str) or not value.startswith(MAGIC):
+            return json.loads(value)
+
+        version, codec = value[2], value[3]
+        if version != VERSION:
+            return None
+        if codec == PLAIN:
+            return json.loads(value[4:])
+        if codec == ZLIB:
+            return json.loads(zlib.decompress(value[4:]))
+        if zstandard is None:
+            return None
+        if codec == ZSTD:
+            return json.loads(self.plain_decompressor.decompress(value[4:]))
+        if codec == ZSTD_DICT:
+            (dict_id,) = struct.unpack(">I", value[4:8])
+            if self.dict_decompressor is None or dict_id != self.dict_id:
+                return None
+            return json.loads(self.dict_decompressor.decompress(value[8:]))
+        return None
+
+
+def train_dictionary(samples: list[bytes], dict_size: int = 64 * 1024) -> bytes:
+    """Samples should be raw JSON of real Jikan pages. Needs zstandard"""
+    if zstandard is None:
+        raise RuntimeError("zstandard is not installed")
+    return zstandard.train_dictionary(dict_size, samples).as_bytes()
+
+
+codec = Codec(
+    compression=config.CACHE_COMPRESSION,
+    min_bytes=config.CACHE_COMPRESSION_MIN_BYTES,
+    zstd_level=config.CACHE_ZSTD_LEVEL,
+    dict_path=config.CACHE_ZSTD_DICT_PATH,
+)
@@ -0,0 +1,270 @@
+import asyncio
+import datetime
+import time
+
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+
+from src import config
+from src.cache.budgets import track
+from src.cache.codec import codec
+from src.cache.freshness import page_freshness
+from src.cache.http_variants import build_variants
+from src.cache.local_cache import local_cache
+from src.cache.redis_database import content_hash
+from src.cache.redis_health import redis_health
+from src.dependencies.services import ServiceProvider
+from src.tools.background import BackgroundJobs, LeaderLock
+
+
+"""
+Canned feeds: the few queries most traffic is made of (see bin/try.py), precomputed.
+
+    airing     status=airing, order_by=scored_by
+    top        order_by=score
+    season     status=airing, start_date=first day of the current season
+    popular    order_by=popularity, one per genre
+each one untyped and once per FEED_TYPES, FEED_PAGES pages. They're plain AnimeParams run through
+build_query, so a client asking for the same filters lands on the same request_name.
+
+    feed:{request_name}   hash: value (codec blob, served as is), version (+1 whenever the content
+                          changes), content_hash, etag, refreshed_at, fresh_until (the next scheduled refresh).
+                          Expires after FEED_KEEP without a refresh
+    http:{request_name}   the page's HTTP variants (src/cache/http_variants.py), rebuilt on every refresh and
+                          fresh until the next one, like any page's
+    feeds:schedule        zset, request_name -> when to refresh it next
+
+Every worker knows the feed names (self.specs, rebuilt every FEED_DEFINE_INTERVAL), load_page answers
+those with one HMGET and doesn't go upstream for them, unless the stored page is FEED_STALE_GRACE past its
+refresh (then it's an ordinary page until the feed is refreshed again). One worker (feeds:leader) refreshes them:
+conditionally (ETag/content hash), and next when src/cache/freshness.py expects their titles to change,
+so an airing feed is refetched after each broadcast and the top feed every few hours.
+"""
+
+LEADER_KEY = "feeds:leader"
+SCHEDULE_KEY = "feeds:schedule"
+
+FEEDS = {
+    "airing": lambda today: {"status": "airing", "order_by": "scored_by"},
+    "top": lambda today: {"order_by": "score"},
+    "season": lambda today: {"status": "airing", "start_date": season_start(today)},
+}
+GENRE_FEEDS = {
+    "popular": {"order_by": "popularity"},
+}
+
+
+def season_start(today: datetime.date) -> datetime.date:
+    """winter: January, spring: April, summer: July, fall: October"""
+    return today.replace(month=(today.month - 1) // 3 * 3 + 1, day=1)
+
+
+
+class CannedFeeds(BackgroundJobs):
+    def __init__(self):
+        super().__init__()
+        self.leader = LeaderLock(LEADER_KEY, config.FEED_LEADER_TTL)
+        # request_name -> {"label", "query", "page"}, in refresh priority order
+        self.specs: dict[str, dict] = {}
+
+
+    def jobs(self, services: ServiceProvider):
+        from src.app import app_logger
+        from src.jikan import jikan_limiter
+
+        # without a materializer the feed pages go through the generic path, like any other
+        if not jikan_limiter.can_spare(config.FEED_RESERVE):
+            app_logger.warning(f"Canned feeds off: this worker's Jikan bucket holds {jikan_limiter.burst} token/s, nothing beyond the reserve ({config.FEED_RESERVE})")
+            return [self.definer(services)]
+        return [self.definer(services), self.materializer(services)]
+
+    async def on_stop(self, services: ServiceProvider):
+        await self.leader.release(services.redis)
+
+
+    async def define(self, services: ServiceProvider, today: datetime.date | None = None) -> dict[str, dict]:
+        """Every feed as request_name -> spec. Per-genre feeds need the genre lookup table (warmup restores it)"""
+        from src.data.schemas import AnimeParams
+        from src.lookups import local_lookups
+        from src.request_handlers import build_query
+
+        today = today or datetime.date.today()
+        types = [None, *config.FEED_TYPES]
+        feeds: list[tuple[str, dict]] = [(name, fields(today)) for name, fields in FEEDS.items()]
+
+        table_name = "lookup:genres:anime"
+        genres = local_lookups.get(table_name) or {}
+        if not genres and not redis_health.degraded:
+            genres = {k.decode(): v for k, v in (await services.redis.hgetall(table_name)).items()}
+        for name, fields in GENRE_FEEDS.items():
+            feeds += [(f"{name}|genre:{genre}", {**fields, "genres": (genre,)}) for genre in sorted(genres)]
+
+        specs = {}
+        for name, fields in feeds:
+            for media_type in types:
+                label = f"{name}|type:{media_type}" if media_type else name
+                query = await build_query(params=AnimeParams(**fields, type=media_type), services=services)
+                for page in range(1, config.FEED_PAGES + 1):
+                    specs[f"{query["request_name"]}page:{page}|"] = {"label": label, "query": query, "page": page}
+        return specs
+
+
+    async def definer(self, services: ServiceProvider):
+        from src.app import app_logger
+
+        while True:
+            try:
+                specs = await self.define(services)
+                if specs.keys() != self.specs.keys():
+                    app_logger.info(f"Canned feeds: {len(specs)} page/s")
+                self.specs = specs
+            except RedisError as e:
+                redis_health.trip(repr(e))
+            except Exception as e:
+                app_logger.warning(f"Canned feeds definition failed! {e!r}")
+            await asyncio.sleep(config.FEED_DEFINE_INTERVAL)
+
+
+    def servable(self, request_name: str, value: bytes | None, fresh_until: bytes | None) -> dict | None:
+        """
+        A stored feed page is served until FEED_STALE_GRACE past its scheduled refresh (a failed refresh
+        retries meanwhile). Later than that the leader is gone or stuck: None, the generic path takes over
+        """
+        if value is None or fresh_until is None or float(fresh_until) + config.FEED_STALE_GRACE < time.time():
+            return None
+        data = codec.decode(value)
+        if data is not None:
+            local_cache.set(request_name, value, config.LOCAL_CACHE_TTL, "feeds")
+        return data
+
+    async def serve(self, redis, request_name: str) -> dict | None:
+        """The stored feed page, None if there's none (yet) or it's overdue"""
+        value, fresh_until = await redis.hmget(f"feed:{request_name}", ["value", "fresh_until"])
+        return self.servable(request_name, value, fresh_until)
+
+    async def serve_many(self, redis, request_names: list[str]) -> dict[str, dict]:
+        async with redis.pipeline(transaction=False) as pipe:
+            for request_name in request_names:
+                pipe.hmget(f"feed:{request_name}", ["value", "fresh_until"])
+            stored = await pipe.execute()
+        served = {}
+        for request_name, (value, fresh_until) in zip(request_names, stored):
+            data = self.servable(request_name, value, fresh_until)
+            if data is not None:
+                served[request_name] = data
+        return served
+
+
+    async def fresh_ttl(self, redis, request_name: str) -> int | None:
+        """Fresh seconds left on a stored feed page, until its next scheduled refresh. None if it isn't stored"""
+        fresh_until = await redis.hget(f"feed:{request_name}", "fresh_until")
+        return int(float(fresh_until) - time.time()) if fresh_until else None
+
+
+    async def materializer(self, services: ServiceProvider):
+        """Leader only: refresh the feeds that are due, oldest schedule first, within spare upstream budget"""
+        from src.app import app_logger
+        from src.jikan import jikan_limiter
+
+        redis = services.redis
+        while True:
+            await asyncio.sleep(config.FEED_SCAN_INTERVAL)
+            if redis_health.degraded or not self.specs:
+                continue
+            try:
+                if not await self.leader.acquire(redis):
+                    continue
+                scheduled = {member.decode(): at for member, at in await redis.zrange(SCHEDULE_KEY, 0, -1, withscores=True)}
+                gone = [name for name in scheduled if name not in self.specs]
+                if gone:
+                    await redis.zrem(SCHEDULE_KEY, *gone)
+
+                now = time.time()
+                # never materialized first (in priority order), then the most overdue
+                due = [name for name in self.specs if name not in scheduled]
+                due += sorted((name for name in self.specs if name in scheduled and scheduled[name] <= now), key=scheduled.get)
+                for request_name in due:
+                    if not jikan_limiter.has_budget(reserve=config.FEED_RESERVE) or redis_health.degraded:
+                        break
+                    await self.refresh(request_name, services)
+            except RedisError as e:
+                redis_health.trip(repr(e))
+            except Exception as e:
+                app_logger.warning(f"Canned feeds refresh failed! {e!r}")
+
+
+    async def refresh(self, request_name: str, services: ServiceProvider):
+        from src.app import app_logger
+        from src.jikan import fetch_jikan
+
+        redis = services.redis
+        spec = self.specs[request_name]
+        feed_key = f"feed:{request_name}"
+        value, version, stored_hash, etag = await redis.hmget(feed_key, ["value", "version", "content_hash", "etag"])
+
+        try:
+            response = await fetch_jikan(
+                request_url=spec["query"]["request_url"], client=services.client,
+                params={**spec["query"]["params"], "page": spec["page"]},
+                headers={"If-None-Match": etag.decode()} if value and etag else None,
+            )
+        except HTTPException as e:
+            # the old version keeps being served
+            app_logger.warning(f"Canned feed {spec["label"]} page {spec["page"]}: upstream {e.status_code}, retry in {config.FEED_RETRY}s")
+            await redis.zadd(SCHEDULE_KEY, {request_name: time.time() + config.FEED_RETRY})
+            return
+
+        new_hash = None if response.status_code == 304 else content_hash(response.content)
+        unchanged = response.status_code == 304 or (value is not None and new_hash == (stored_hash or b"").decode())
+        data = codec.decode(value) if unchanged else response.json()
+        if data is None:
+            # 304 for a value this worker can't decode (ex: zstd dictionary): refetch it unconditionally next scan
+            await redis.hdel(feed_key, "etag")
+            return
+        ttl, reason = page_freshness(data)
+        http_key = f"http:{request_name}"
+        variants = build_variants(data)
+        now = time.time()
+
+        async with redis.pipeline(transaction=False) as pipe:
+            if not unchanged:
+                encoded = codec.encode(data)
+                version = int(version or 0) + 1
+                pipe.hset(feed_key, mapping={
+                    "value": encoded,
+                    "version": version,
+                    "content_hash": new_hash,
+                    "etag": response.headers.get("ETag", ""),
+                    "refreshed_at": now,
+                })
+                track(pipe, "feeds", feed_key, size=len(encoded))
+            pipe.hset(feed_key, "fresh_until", now + ttl)
+            pipe.expire(feed_key, config.FEED_KEEP)
+            # stored TTL, grace included (see get_fresh): fresh until the next refresh, GETs never build them
+            pipe.hset(http_key, mapping=variants)
+            pipe.expire(http_key, ttl + config.REVALIDATE_GRACE)
+            track(pipe, "feeds", http_key, size=sum(map(len, variants.values())))
+            pipe.zadd(SCHEDULE_KEY, {request_name: now + ttl})
+            await pipe.execute()
+        app_logger.info(f"Canned feed {spec["label"]} page {spec["page"]}: {"unchanged" if unchanged else f"v{version}"}, next in {ttl}s ({reason})")
+
+
+    async def status(self, redis) -> list[dict]:
+        names = list(self.specs)
+        async with redis.pipeline(transaction=False) as pipe:
+            for request_name in names:
+                pipe.hmget(f"feed:{request_name}", ["version", "refreshed_at"])
+            pipe.zrange(SCHEDULE_KEY, 0, -1, withscores=True)
+            *stored, scheduled = await pipe.execute()
+        scheduled = {member.decode(): at for member, at in scheduled}
+        return [
+            {
+                "label": self.specs[request_name]["label"], "page": self.specs[request_name]["page"], "request_name": request_name,
+                "version": int(version) if version else None,
+                "refreshed_at": float(refreshed_at) if refreshed_at else None,
+                "next_refresh": scheduled.get(request_name),
+            }
+            for request_name, (version, refreshed_at) in zip(names, stored)
+        ]
+
+canned_feeds = CannedFeeds()
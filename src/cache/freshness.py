@@ -0,0 +1,81 @@
+import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from src import config
+
+
+"""
+Freshness model: a page stays fresh until the next time one of its titles is expected to change.
+
+    finished / discontinued            FRESHNESS_STABLE_TTL
+    airing with a broadcast slot       until the next broadcast + FRESHNESS_SETTLE (MAL needs a moment)
+    airing / publishing otherwise      FRESHNESS_AIRING_TTL
+    not started, start date known      until the start date + FRESHNESS_SETTLE (capped at STABLE)
+    not started otherwise              FRESHNESS_UPCOMING_TTL
+
+The page gets the smallest of its titles, within [FRESHNESS_MIN_TTL, FRESHNESS_STABLE_TTL].
+"""
+
+WEEKDAYS = {"mondays": 0, "tuesdays": 1, "wednesdays": 2, "thursdays": 3, "fridays": 4, "saturdays": 5, "sundays": 6}
+STABLE_STATUSES = {"Finished Airing", "Finished", "Discontinued", "On Hiatus"}
+JST = datetime.timezone(datetime.timedelta(hours=9), "JST")     # Jikan's broadcast timezone, if tzdata is missing
+
+
+def zone(name: str | None) -> datetime.tzinfo:
+    try:
+        return ZoneInfo(name) if name else JST
+    except (ZoneInfoNotFoundError, ValueError):
+        return JST
+
+
+def next_broadcast(broadcast: dict, now: datetime.datetime) -> datetime.datetime | None:
+    """Next airing of a weekly slot. One that aired less than FRESHNESS_SETTLE ago still counts as next"""
+    day = WEEKDAYS.get((broadcast.get("day") or "").lower())
+    try:
+        hour, minute = map(int, (broadcast.get("time") or "").split(":"))
+    except ValueError:
+        return None
+    if day is None:
+        return None
+
+    local_now = now.astimezone(zone(broadcast.get("timezone")))
+    airing = local_now.replace(hour=hour, minute=minute, second=0, microsecond=0) + datetime.timedelta(days=(day - local_now.weekday()) % 7)
+    if airing + datetime.timedelta(seconds=config.FRESHNESS_SETTLE) <= local_now:
+        airing += datetime.timedelta(days=7)
+    return airing
+
+
+def start_date(item: dict) -> datetime.datetime | None:
+    dates = item.get("aired") or item.get("published") or {}
+    try:
+        return datetime.datetime.fromisoformat(dates["from"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def item_ttl(item: dict, now: datetime.datetime) -> tuple[int, str]:
+    status = item.get("status") or ""
+    if status in STABLE_STATUSES:
+        return config.FRESHNESS_STABLE_TTL, "stable"
+
+    if status.startswith("Not yet"):
+        start = start_date(item)
+        if start is not None and start.tzinfo is not None and start > now:
+            return int((start - now).total_seconds()) + config.FRESHNESS_SETTLE, "upcoming"
+        return config.FRESHNESS_UPCOMING_TTL, "upcoming"
+
+    airing = next_broadcast(item.get("broadcast") or {}, now)
+    if airing is not None:
+        return int((airing - now).total_seconds()) + config.FRESHNESS_SETTLE, "broadcast"
+    return config.FRESHNESS_AIRING_TTL, "ongoing"
+
+
+def page_freshness(data: dict, now: datetime.datetime | None = None) -> tuple[int, str]:
+    """(ttl, reason) of a Jikan page, reason being what drives it (ex: "broadcast")"""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    ttl, reason = config.FRESHNESS_STABLE_TTL, "stable"
+    for item in data.get("data") or []:
+        candidate = item_ttl(item, now)
+        if candidate[0] < ttl:
+            ttl, reason = candidate
+    return max(config.FRESHNESS_MIN_TTL, min(ttl, config.FRESHNESS_STABLE_TTL)), reason
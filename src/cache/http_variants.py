@@ -0,0 +1,57 @@
+import gzip
+import hashlib
+import json
+
+try:
+    import brotli
+except ImportError:         # optional. without it clients get gzip
+    brotli = None
+
+
+"""Pre-built HTTP representations of a cache entry, stored in an http:{request_name} hash"""
+
+
+def build_variants(data: dict) -> dict[str, bytes]:
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    variants = {
+        # strong ETag: same bytes <=> same ETag, across workers
+        "etag": f'"{hashlib.blake2b(raw, digest_size=16).hexdigest()}"'.encode(),
+        "gzip": gzip.compress(raw, compresslevel=6, mtime=0),
+    }
+    if brotli is not None:
+        variants["br"] = brotli.compress(raw, quality=5)
+    return variants
+
+
+def pick_encoding(accept_encoding: str | None) -> str:
+    """"br" > "gzip" > "identity". q-values other than q=0 are ignored"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, q = part.strip().partition(";")
+        if coding and q.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return "identity"
+
+
+def decode_variant(body: bytes, encoding: str) -> bytes:
+    return gzip.decompress(body) if encoding == "identity" else body
+
+
+def content_encoding_header(encoding: str) -> dict:
+    return {} if encoding == "identity" else {"Content-Encoding": encoding}
+
+
+def cache_headers(etag: str, ttl: int) -> dict:
+    return {"ETag": etag, "Cache-Control": f"public, max-age={max(ttl, 0)}", "Vary": "Accept-Encoding"}
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # weak comparison, as RFC 9110 asks for If-None-Match
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
@@ -0,0 +1,61 @@
+import time
+from collections import OrderedDict
+
+from src import config
+
+
+class LocalCache:
+    """
+    In-process tier: the pages this worker cached or served, as stored in Redis (encoded bytes),
+    one LRU per cache class, each within its own byte budget (LOCAL_BUDGETS, see src/cache/budgets.py).
+    Kept up to date on every Redis write/hit but only read while Redis is degraded (see redis_health),
+    so workers never disagree with Redis while it's healthy. Entries past their TTL are kept
+    (stale) until evicted: with Redis down and Jikan failing, stale beats nothing.
+    """
+    def __init__(self, budgets: dict[str, int]):
+        self.budgets = budgets
+        # class -> request_name -> (expires_at, value)
+        self.classes: dict[str, OrderedDict[str, tuple[float, bytes]]] = {cls: OrderedDict() for cls in budgets}
+        self.used = dict.fromkeys(budgets, 0)
+        self.evictions = dict.fromkeys(budgets, 0)
+        self.class_of: dict[str, str] = {}
+
+    def set(self, request_name: str, value: bytes, ttl: float, cache_class: str):
+        self.discard(request_name)
+        if len(value) > self.budgets[cache_class]:
+            return
+
+        entries = self.classes[cache_class]
+        entries[request_name] = (time.monotonic() + ttl, value)
+        self.class_of[request_name] = cache_class
+        self.used[cache_class] += len(value)
+        while self.used[cache_class] > self.budgets[cache_class]:
+            evicted, (_, evicted_value) = entries.popitem(last=False)
+            self.class_of.pop(evicted)
+            self.used[cache_class] -= len(evicted_value)
+            self.evictions[cache_class] += 1
+
+    def get(self, request_name: str, allow_stale: bool = False) -> bytes | None:
+        cache_class = self.class_of.get(request_name)
+        if cache_class is None:
+            return None
+        entries = self.classes[cache_class]
+        expires_at, value = entries[request_name]
+        if not allow_stale and expires_at < time.monotonic():
+            return None
+        entries.move_to_end(request_name)
+        return value
+
+    def discard(self, request_name: str):
+        cache_class = self.class_of.pop(request_name, None)
+        if cache_class is not None:
+            _, value = self.classes[cache_class].pop(request_name)
+            self.used[cache_class] -= len(value)
+
+    def stats(self) -> dict:
+        return {
+            cls: {"policy": "lru", "entries": len(entries), "bytes": self.used[cls], "budget": self.budgets[cls], "evictions": self.evictions[cls]}
+            for cls, entries in self.classes.items()
+        }
+
+local_cache = LocalCache(budgets=config.LOCAL_BUDGETS)
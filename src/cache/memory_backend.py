@@ -0,0 +1,357 @@
+import asyncio
+import fnmatch
+import heapq
+import time
+from typing import AsyncIterator
+
+
+"""
+In-process CacheBackend (see src/cache/backend.py). Same replies as redis.asyncio.Redis with
+decode_responses=False: keys, values, fields and members come back as bytes, numbers as Redis sends them.
+
+Expiry: every command first drains a heap of deadlines, so expired keys are gone before anything reads
+them, including keys nobody reads again (counters, validators), which would otherwise pile up.
+Commands never suspend, so a pipeline runs as a block, no other task's command lands in the middle.
+"""
+
+
+def encode(value) -> bytes:
+    """Like redis-py's encoder: bytes as is, str as UTF-8, numbers as their repr"""
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode()
+    if isinstance(value, bool):
+        raise TypeError("Invalid input of type: 'bool'. Convert to a bytes, string, int or float first.")
+    if isinstance(value, (int, float)):
+        return repr(value).encode()
+    raise TypeError(f"Invalid input of type: {type(value).__name__!r}. Convert to a bytes, string, int or float first.")
+
+
+def score_bound(bound) -> tuple[float, bool]:
+    """ZRANGEBYSCORE bound -> (score, exclusive). "(5" is exclusive, "-inf"/"+inf" are allowed"""
+    if isinstance(bound, bytes):
+        bound = bound.decode()
+    if isinstance(bound, str) and bound.startswith("("):
+        return float(bound[1:]), True
+    return float(bound), False
+
+
+
+class MemoryPipeline:
+    def __init__(self, backend: "MemoryBackend"):
+        self.backend = backend
+        self.commands: list[tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, command: str):
+        if not hasattr(self.backend, command) or command.startswith("_"):
+            raise AttributeError(command)
+
+        def queue(*args, **kwargs) -> "MemoryPipeline":
+            self.commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> list:
+        commands, self.commands = self.commands, []
+        return [await getattr(self.backend, command)(*args, **kwargs) for command, args, kwargs in commands]
+
+    async def __aenter__(self) -> "MemoryPipeline":
+        return self
+
+    async def __aexit__(self, *exc):
+        self.commands = []
+
+
+
+class MemoryPubSub:
+    def __init__(self, backend: "MemoryBackend"):
+        self.backend = backend
+        self.channels: set[bytes] = set()
+        self.messages: asyncio.Queue[dict] = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        for channel in map(encode, channels):
+            self.channels.add(channel)
+            self.backend.subscribers.setdefault(channel, set()).add(self)
+            self.messages.put_nowait({"type": "subscribe", "pattern": None, "channel": channel, "data": len(self.channels)})
+
+    async def unsubscribe(self, *channels):
+        for channel in [*map(encode, channels)] or list(self.channels):
+            self.channels.discard(channel)
+            subscribers = self.backend.subscribers.get(channel, set())
+            subscribers.discard(self)
+            if not subscribers:
+                self.backend.subscribers.pop(channel, None)
+            self.messages.put_nowait({"type": "unsubscribe", "pattern": None, "channel": channel, "data": len(self.channels)})
+
+    async def get_message(self, ignore_subscribe_messages: bool = False, timeout: float | None = 0.0) -> dict | None:
+        """Next message, waiting up to timeout seconds (None: until there is one)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                if deadline is None:
+                    message = await self.messages.get()
+                else:
+                    message = await asyncio.wait_for(self.messages.get(), max(0.0, deadline - time.monotonic()))
+            except TimeoutError:
+                return None
+            if not (ignore_subscribe_messages and message["type"] in ("subscribe", "unsubscribe")):
+                return message
+
+    async def listen(self) -> AsyncIterator[dict]:
+        while self.channels:
+            yield await self.messages.get()
+
+    async def aclose(self):
+        await self.unsubscribe()
+
+
+
+class MemoryBackend:
+    def __init__(self):
+        self.data: dict[bytes, bytes | dict] = {}           # strings: bytes, hashes: {field: value}, zsets: {member: score}
+        self.expires: dict[bytes, float] = {}                # key -> monotonic deadline
+        self.deadlines: list[tuple[float, bytes]] = []       # heap, may hold outdated deadlines (checked against expires)
+        self.subscribers: dict[bytes, set[MemoryPubSub]] = {}
+
+
+    # expiry
+    def _purge(self):
+        now = time.monotonic()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, key = heapq.heappop(self.deadlines)
+            if self.expires.get(key) == deadline:
+                self._drop(key)
+        # renewed TTLs leave outdated deadlines behind (hotness counters renew every request)
+        if len(self.deadlines) > 2 * len(self.expires) + 1024:
+            self.deadlines = [(deadline, key) for key, deadline in self.expires.items()]
+            heapq.heapify(self.deadlines)
+
+    def _drop(self, key: bytes):
+        self.data.pop(key, None)
+        self.expires.pop(key, None)
+
+    def _lookup(self, name):
+        self._purge()
+        return self.data.get(encode(name))
+
+    def _set_expiry(self, key: bytes, seconds: float):
+        deadline = time.monotonic() + seconds
+        self.expires[key] = deadline
+        heapq.heappush(self.deadlines, (deadline, key))
+
+    def _container(self, name) -> dict:
+        """The hash/zset at name, created empty if missing"""
+        self._purge()
+        return self.data.setdefault(encode(name), {})
+
+    def _drop_if_empty(self, name):
+        key = encode(name)
+        if key in self.data and not self.data[key]:
+            self._drop(key)
+
+
+    # strings / counters
+    async def get(self, name) -> bytes | None:
+        return self._lookup(name)
+
+    async def set(self, name, value, ex: int | None = None, nx: bool = False) -> bool | None:
+        self._purge()
+        key = encode(name)
+        if nx and key in self.data:
+            return None
+        self._drop(key)
+        self.data[key] = encode(value)
+        if ex is not None:
+            self._set_expiry(key, int(ex))
+        return True
+
+    async def setnx(self, name, value) -> bool:
+        return bool(await self.set(name, value, nx=True))
+
+    async def incr(self, name, amount: int = 1) -> int:
+        self._purge()
+        key = encode(name)
+        value = int(self.data.get(key, b"0")) + amount
+        self.data[key] = encode(value)
+        return value
+
+
+    # keys
+    async def exists(self, *names) -> int:
+        self._purge()
+        return sum(encode(name) in self.data for name in names)
+
+    async def delete(self, *names) -> int:
+        self._purge()
+        deleted = 0
+        for key in map(encode, names):
+            if key in self.data:
+                self._drop(key)
+                deleted += 1
+        return deleted
+
+    async def expire(self, name, time) -> bool:
+        self._purge()
+        key = encode(name)
+        if key not in self.data:
+            return False
+        if int(time) <= 0:
+            self._drop(key)
+        else:
+            self._set_expiry(key, int(time))
+        return True
+
+    async def ttl(self, name) -> int:
+        self._purge()
+        key = encode(name)
+        if key not in self.data:
+            return -2
+        if key not in self.expires:
+            return -1
+        return round(self.expires[key] - time.monotonic())
+
+    async def scan_iter(self, match: str | None = None, count: int | None = None) -> AsyncIterator[bytes]:
+        self._purge()
+        for key in list(self.data):
+            if key in self.data and (match is None or fnmatch.fnmatchcase(key.decode(errors="replace"), match)):
+                yield key
+
+
+    # hashes
+    async def hget(self, name, key) -> bytes | None:
+        return (self._lookup(name) or {}).get(encode(key))
+
+    async def hmget(self, name, keys, *args) -> list[bytes | None]:
+        fields = [keys] if isinstance(keys, (str, bytes)) else list(keys)
+        hash_ = self._lookup(name) or {}
+        return [hash_.get(encode(field)) for field in [*fields, *args]]
+
+    async def hgetall(self, name) -> dict[bytes, bytes]:
+        return dict(self._lookup(name) or {})
+
+    async def hset(self, name, key=None, value=None, mapping: dict | None = None) -> int:
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        hash_ = self._container(name)
+        added = 0
+        for field, field_value in items.items():
+            field = encode(field)
+            added += field not in hash_
+            hash_[field] = encode(field_value)
+        return added
+
+    async def hsetnx(self, name, key, value) -> bool:
+        hash_ = self._container(name)
+        field = encode(key)
+        if field in hash_:
+            return False
+        hash_[field] = encode(value)
+        return True
+
+    async def hdel(self, name, *keys) -> int:
+        hash_ = self._lookup(name) or {}
+        deleted = sum(hash_.pop(encode(field), None) is not None for field in keys)
+        self._drop_if_empty(name)
+        return deleted
+
+    async def hincrby(self, name, key, amount: int = 1) -> int:
+        hash_ = self._container(name)
+        field = encode(key)
+        value = int(hash_.get(field, b"0")) + amount
+        hash_[field] = encode(value)
+        return value
+
+
+    # sorted sets
+    def _sorted(self, name) -> list[tuple[bytes, float]]:
+        return sorted((self._lookup(name) or {}).items(), key=lambda item: (item[1], item[0]))
+
+    async def zadd(self, name, mapping: dict, nx: bool = False) -> int:
+        zset = self._container(name)
+        added = 0
+        for member, score in mapping.items():
+            member = encode(member)
+            if member in zset:
+                if nx:
+                    continue
+            else:
+                added += 1
+            zset[member] = float(score)
+        return added
+
+    async def zincrby(self, name, amount: float, value) -> float:
+        zset = self._container(name)
+        member = encode(value)
+        zset[member] = zset.get(member, 0.0) + float(amount)
+        return zset[member]
+
+    async def zrem(self, name, *values) -> int:
+        zset = self._lookup(name) or {}
+        removed = sum(zset.pop(encode(member), None) is not None for member in values)
+        self._drop_if_empty(name)
+        return removed
+
+    def _by_rank(self, name, start: int, end: int) -> list[tuple[bytes, float]]:
+        items = self._sorted(name)
+        size = len(items)
+        start, end = (start + size if start < 0 else start), (end + size if end < 0 else end)
+        return items[max(start, 0):end + 1]
+
+    async def zrange(self, name, start: int, end: int, withscores: bool = False) -> list:
+        items = self._by_rank(name, start, end)
+        return items if withscores else [member for member, _ in items]
+
+    async def zremrangebyrank(self, name, min: int, max: int) -> int:
+        zset = self._lookup(name) or {}
+        items = self._by_rank(name, min, max)
+        for member, _ in items:
+            zset.pop(member)
+        self._drop_if_empty(name)
+        return len(items)
+
+    def _by_score(self, name, min, max) -> list[tuple[bytes, float]]:
+        (low, low_open), (high, high_open) = score_bound(min), score_bound(max)
+        return [
+            (member, score) for member, score in self._sorted(name)
+            if (score > low if low_open else score >= low) and (score < high if high_open else score <= high)
+        ]
+
+    async def zrangebyscore(self, name, min, max, withscores: bool = False) -> list:
+        items = self._by_score(name, min, max)
+        return items if withscores else [member for member, _ in items]
+
+    async def zremrangebyscore(self, name, min, max) -> int:
+        zset = self._lookup(name) or {}
+        items = self._by_score(name, min, max)
+        for member, _ in items:
+            zset.pop(member)
+        self._drop_if_empty(name)
+        return len(items)
+
+
+    # pub/sub
+    async def publish(self, channel, message) -> int:
+        channel = encode(channel)
+        subscribers = self.subscribers.get(channel, ())
+        for subscriber in subscribers:
+            subscriber.messages.put_nowait({"type": "message", "pattern": None, "channel": channel, "data": encode(message)})
+        return len(subscribers)
+
+    def pubsub(self) -> MemoryPubSub:
+        return MemoryPubSub(self)
+
+
+    def pipeline(self, transaction: bool = True) -> MemoryPipeline:
+        return MemoryPipeline(self)
+
+    async def flushdb(self) -> bool:
+        self.data.clear()
+        self.expires.clear()
+        self.deadlines.clear()
+        return True
+
+    async def aclose(self):
+        pass
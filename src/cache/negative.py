@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import json
+import math
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+
+from src import config
+from src.cache.budgets import track
+from src.cache.redis_health import redis_health
+from src.dependencies.services import ServiceProvider
+from src.tools.background import BackgroundJobs
+
+
+"""
+Negative cache: pages that came back empty and cacheable upstream errors (config.NEGATIVE_ERROR_TTLS),
+keyed by page request_name. Entries:
+    {"kind": "empty", "data": {...}, "expires_at": ...}
+    {"kind": "error", "status_code": 404, "detail": "...", "expires_at": ...}
+
+In Redis:
+    neg:{request_name}   the entry, with its TTL
+    neg:log              zset, entry (with its request_name) -> written_at. Workers pull what's new every
+                         NEGATIVE_SYNC_INTERVAL and old members are trimmed
+Per worker:
+    a Bloom filter of every negative request_name it knows of, in front of everything: a query that was
+    never negative costs a few hashes and no I/O. A hit is confirmed in the local entries (bounded LRU),
+    and only if it isn't there, with one GET.
+Bloom filters can't forget, so the filter is rebuilt from the live entries once expired ones pile up.
+"""
+
+LOG_KEY = "neg:log"
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))      # bits
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item: str):
+        # double hashing (Kirsch-Mitzenmacher): k positions out of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+
+
+class NegativeCache(BackgroundJobs):
+    def __init__(self, capacity: int, error_rate: float, local_size: int, sync_interval: float):
+        super().__init__()
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.local_size = local_size
+        self.sync_interval = sync_interval
+
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.entries: OrderedDict[str, dict] = OrderedDict()     # request_name -> entry, LRU
+        self.expiries: dict[str, float] = {}                       # request_name -> expires_at, everything in the filter
+        self.stale = 0                                             # expired names still set in the filter
+        self.synced_at = 0.0                                       # newest neg:log score pulled so far
+
+
+    def jobs(self, services: ServiceProvider):
+        return [self.syncer(services)]
+
+
+    def remember(self, request_name: str, entry: dict):
+        if request_name not in self.expiries:
+            self.bloom.add(request_name)
+        self.expiries[request_name] = max(entry["expires_at"], self.expiries.get(request_name, 0))
+        self.entries[request_name] = entry
+        self.entries.move_to_end(request_name)
+        while len(self.entries) > self.local_size:
+            self.entries.popitem(last=False)
+
+
+    async def lookup(self, request_name: str, services: ServiceProvider) -> dict | None:
+        """The negative answer for a page, if there is one. No I/O unless the filter says "maybe" and it's not local"""
+        if request_name not in self.bloom:
+            return None
+        now = time.time()
+        if self.expiries.get(request_name, 0) < now:
+            return None     # expired, or a false positive
+
+        entry = self.entries.get(request_name)
+        if entry is None and not redis_health.degraded:
+            try:
+                value = await services.redis.get(f"neg:{request_name}")
+            except RedisError as e:
+                redis_health.trip(repr(e))
+                return None
+            entry = json.loads(value) if value else None
+            if entry is not None:
+                self.remember(request_name, entry)
+        if entry is None or entry["expires_at"] < now:
+            return None
+        self.entries.move_to_end(request_name)
+        return entry
+
+
+    async def add(self, request_name: str, entry: dict, ttl: int, services: ServiceProvider):
+        """Record locally right away, then share it through Redis (skipped while Redis is degraded)"""
+        entry = {**entry, "expires_at": time.time() + ttl}
+        self.remember(request_name, entry)
+        if redis_health.degraded:
+            return
+
+        value = json.dumps(entry, separators=(",", ":"))
+        try:
+            async with services.redis.pipeline(transaction=False) as pipe:
+                pipe.set(f"neg:{request_name}", value, ex=ttl)
+                pipe.zadd(LOG_KEY, {json.dumps({"request_name": request_name, **entry}, separators=(",", ":")): time.time()})
+                track(pipe, "negative", f"neg:{request_name}", size=len(value))
+                await pipe.execute()
+        except RedisError as e:
+            redis_health.trip(repr(e))
+
+
+    async def add_empty(self, request_name: str, data: dict, ttl: int, services: ServiceProvider):
+        await self.add(request_name, {"kind": "empty", "data": data}, ttl, services)
+
+    async def add_error(self, request_name: str, error: HTTPException, services: ServiceProvider):
+        ttl = config.NEGATIVE_ERROR_TTLS.get(error.status_code)
+        if ttl:
+            await self.add(request_name, {"kind": "error", "status_code": error.status_code, "detail": error.detail}, ttl, services)
+
+
+    async def syncer(self, services: ServiceProvider):
+        from src.app import app_logger
+
+        redis = services.redis
+        max_ttl = max([*config.NEGATIVE_ERROR_TTLS.values(), 600])
+        while True:
+            try:
+                if not redis_health.degraded:
+                    async with redis.pipeline(transaction=False) as pipe:
+                        pipe.zremrangebyscore(LOG_KEY, "-inf", time.time() - max_ttl)
+                        pipe.zrangebyscore(LOG_KEY, f"({self.synced_at}", "+inf", withscores=True)
+                        _, new = await pipe.execute()
+                    for member, written_at in new:
+                        entry = json.loads(member)
+                        self.remember(entry.pop("request_name"), entry)
+                        self.synced_at = max(self.synced_at, written_at)
+                self.prune()
+            except RedisError as e:
+                redis_health.trip(repr(e))
+            except Exception as e:
+                app_logger.warning(f"Negative cache sync failed! {e!r}")
+            await asyncio.sleep(self.sync_interval)
+
+
+    def prune(self):
+        """Drop expired entries. Rebuild the filter once they're a quarter of it (or it's over capacity)"""
+        now = time.time()
+        expired = [name for name, expires_at in self.expiries.items() if expires_at < now]
+        for name in expired:
+            self.expiries.pop(name)
+            self.entries.pop(name, None)
+        self.stale += len(expired)
+        if self.stale and (self.bloom.count >= self.capacity or self.stale * 4 >= self.bloom.count):
+            self.bloom = BloomFilter(self.capacity, self.error_rate)
+            for name in self.expiries:
+                self.bloom.add(name)
+            self.stale = 0
+
+
+def negative_result(entry: dict) -> dict:
+    """What a negative entry answers: the empty page, or the upstream error again"""
+    if entry["kind"] == "error":
+        raise HTTPException(status_code=entry["status_code"], detail=entry["detail"])
+    return entry["data"]
+
+negative_cache = NegativeCache(
+    capacity=config.NEGATIVE_BLOOM_CAPACITY,
+    error_rate=config.NEGATIVE_BLOOM_ERROR_RATE,
+    local_size=config.NEGATIVE_LOCAL_SIZE,
+    sync_interval=config.NEGATIVE_SYNC_INTERVAL,
+)
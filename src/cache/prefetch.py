@@ -0,0 +1,130 @@
+import asyncio
+
+from redis.exceptions import RedisError
+
+from src.cache.feeds import canned_feeds
+from src.cache.redis_database import entry_fresh_ttl
+from src.cache.redis_health import redis_health
+from src.dependencies.services import ServiceProvider
+from src.tools.background import BackgroundJobs
+
+
+class Prefetcher(BackgroundJobs):
+    """
+    Background cache warmer. Uses the hotness counters the handler already keeps:
+    - page N is hot  -> fetch page N+1 before anyone asks for it
+    - top-K hot pages -> refetch them shortly before their cache entry expires
+
+    Runs at the lowest priority we have in asyncio: one job at a time, and only while
+    jikan_limiter has spare tokens and no foreground request is waiting on it.
+    When the upstream budget is tight it does nothing at all.
+    """
+    def __init__(self, hot_threshold: int = 5, max_tracked: int = 200, top_k: int = 20,
+                 refresh_ahead: int = 15, scan_interval: float = 5.0, reserve: int = 1, max_queue: int = 100):
+        super().__init__()
+        self.hot_threshold = hot_threshold      # request hotness that makes a page worth prefetching
+        self.max_tracked = max_tracked          # hot pages remembered (coldest dropped first)
+        self.top_k = top_k                      # hot pages refreshed before TTL
+        self.refresh_ahead = refresh_ahead      # seconds of TTL left when a refresh kicks in
+        self.scan_interval = scan_interval
+        self.reserve = reserve                  # tokens always left for foreground requests
+
+        # request_name -> {"query", "page", "hot_params", "request_hotness"}
+        self.tracked: dict[str, dict] = {}
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.queued: set[str] = set()
+
+
+    def jobs(self, services: ServiceProvider):
+        from src.app import app_logger
+        from src.jikan import jikan_limiter
+
+        if not jikan_limiter.can_spare(self.reserve):
+            app_logger.warning(f"Prefetch off: this worker's Jikan bucket holds {jikan_limiter.burst} token/s, nothing beyond the reserve ({self.reserve})")
+            return []
+        return [self.worker(), self.scanner()]
+
+
+    def note(self, query: dict, page: int, hot_params: dict, request_hotness: int, result: dict):
+        """Called by the handler after every served page. Cheap, no I/O"""
+        if self.services is None or request_hotness < self.hot_threshold:
+            return
+
+        request_name = f"{query["request_name"]}page:{page}|"
+        self.tracked[request_name] = {"query": query, "page": page, "hot_params": hot_params, "request_hotness": request_hotness}
+        if len(self.tracked) > self.max_tracked:
+            coldest = min(self.tracked, key=lambda name: self.tracked[name]["request_hotness"])
+            self.tracked.pop(coldest)
+
+        if result.get("pagination", {}).get("has_next_page"):
+            self.enqueue("next_page", query=query, page=page + 1, hot_params=hot_params, request_hotness=request_hotness)
+
+
+    def enqueue(self, kind: str, query: dict, page: int, hot_params: dict, request_hotness: int):
+        request_name = f"{query["request_name"]}page:{page}|"
+        # canned feeds have their own refresh job (src/cache/feeds.py)
+        if request_name in self.queued or request_name in canned_feeds.specs:
+            return
+        try:
+            self.queue.put_nowait((kind, request_name, query, page, hot_params, request_hotness))
+            self.queued.add(request_name)
+        except asyncio.QueueFull:
+            pass    # prefetching is best effort
+
+
+    async def worker(self):
+        from src.app import app_logger
+        from src.jikan import jikan_limiter
+        from src.request_handlers import collapsed_fetch
+
+        redis = self.services.redis
+        while True:
+            kind, request_name, query, page, hot_params, request_hotness = await self.queue.get()
+            try:
+                # upstream budget is tight (or Redis is degraded): stop entirely until foreground traffic leaves room
+                while not jikan_limiter.has_budget(reserve=self.reserve) or redis_health.degraded:
+                    await asyncio.sleep(1)
+
+                if kind == "next_page" and await entry_fresh_ttl(redis, request_name) > 0:
+                    continue
+
+                app_logger.info(f"Prefetch ({kind}) {request_name}")
+                await collapsed_fetch(query=query, hot_params=hot_params, request_hotness=request_hotness, services=self.services, page=page)
+            except asyncio.CancelledError:
+                raise
+            except RedisError as e:
+                redis_health.trip(repr(e))
+            except Exception as e:
+                app_logger.warning(f"Prefetch failed! {request_name} | {e!r}")
+            finally:
+                self.queued.discard(request_name)
+
+
+    async def scanner(self):
+        """Every scan_interval: refresh the top-K hot pages whose cache entry is about to expire"""
+        from src.app import app_logger
+        from src.jikan import jikan_limiter
+
+        redis = self.services.redis
+        while True:
+            await asyncio.sleep(self.scan_interval)
+            if not jikan_limiter.has_budget(reserve=self.reserve) or redis_health.degraded:
+                continue
+
+            try:
+                hottest = sorted(self.tracked.items(), key=lambda item: item[1]["request_hotness"], reverse=True)[:self.top_k]
+                for request_name, entry in hottest:
+                    # hotness counter gone = nobody asked for it in the last minute. Let it expire
+                    if not await redis.exists(f"hot_request|{request_name}"):
+                        self.tracked.pop(request_name, None)
+                        continue
+
+                    # a stale or missing entry is refreshed too, it's hot after all
+                    if await entry_fresh_ttl(redis, request_name) < self.refresh_ahead:
+                        self.enqueue("refresh", **entry)
+            except RedisError as e:
+                redis_health.trip(repr(e))
+            except Exception as e:
+                app_logger.warning(f"Prefetch scan failed! {e!r}")
+
+prefetcher = Prefetcher()
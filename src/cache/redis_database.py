@@ -1,30 +1,77 @@
-import httpx
+import hashlib
 
+from src import config
+from src.cache.backend import CacheBackend
+from src.cache.freshness import page_freshness
+from src.cache.redis_health import redis_health
+from src.tools.profiling import profiled
 
-async def get_cache_level(hot_params: dict, request_hotness: int, jikan_response: httpx.Response = None) -> dict:
+
+async def get_cache_level(hot_params: dict, request_hotness: int, data: dict = None) -> dict:
+    """
+    Layer and description come from hotness. The ttl comes from the page itself (src/cache/freshness.py)
+    when there is one, otherwise the fixed ttl of the level
+    """
     from src.app import app_logger
+
+    freshness = page_freshness(data) if data is not None and data.get("data") else None
+
     if request_hotness > 5:
         app_logger.info("Returning cache for HOT REQUEST")
-        return {"layer": "l1", "ttl": 120, "description": "hot_request"}
-  
-    if jikan_response:
-        json_data = jikan_response.json()
-        data_len = len(json_data["data"])
+        return level("l1", 120, "hot_request", freshness)
 
-        # check if request gives negative data
-        if data_len == 0:
-            app_logger.info("Returning cache for NEGATIVE CACHE")
-            return {"layer":"l2", "ttl": 60, "description":"negative_cache"}
+    # check if request gives negative data
+    if data is not None and not data.get("data"):
+        app_logger.info("Returning cache for NEGATIVE CACHE")
+        return {"layer":"l2", "ttl": 60, "description":"negative_cache"}
 
     
     total = 0
     for hotness in hot_params.values():
         total += hotness
-    avg = total / len(hot_params)
+    avg = total / len(hot_params) if hot_params else 0
     if avg > 10:
         app_logger.info("Returning cache for HOT PARAMS")
-        return {"layer": "l1", "ttl": 150, "description": "hot_params"}
+        return level("l1", 150, "hot_params", freshness)
     
 
     app_logger.info("Returning cache for REGULAR CACHE")
-    return {"layer":"l2", "ttl": 60, "description": "regular_cache"}
\ No newline at end of file
+    return level("l2", 60, "regular_cache", freshness)
+
+
+def level(layer: str, ttl: int, description: str, freshness: tuple[int, str] | None) -> dict:
+    if freshness is None:
+        return {"layer": layer, "ttl": ttl, "description": description}
+    return {"layer": layer, "ttl": freshness[0], "description": description, "freshness": freshness[1]}
+
+
+
+@profiled("cache_read")
+async def get_fresh(redis: CacheBackend, key: str) -> tuple[bytes | None, int]:
+    """
+    Value of a cache entry if it's still fresh (else None), and its Redis TTL.
+    Entries are stored REVALIDATE_GRACE seconds longer than their TTL: past the TTL they are stale,
+    which counts as a miss here, but fetch_page can still revalidate them instead of rewriting.
+    """
+    # the one read every request makes, so it's what Redis latency is judged by
+    with redis_health.timed():
+        async with redis.pipeline(transaction=False) as pipe:
+            value, ttl = await pipe.get(key).ttl(key).execute()
+    return (value if ttl > config.REVALIDATE_GRACE else None), ttl
+
+
+def fresh_ttl(ttl: int) -> int:
+    """Remaining fresh seconds of an entry, given its Redis TTL"""
+    return ttl - config.REVALIDATE_GRACE
+
+
+async def entry_fresh_ttl(redis: CacheBackend, request_name: str) -> int:
+    """Fresh seconds left on a page's cache entry, whichever layer has it. <= 0: stale or missing"""
+    async with redis.pipeline(transaction=False) as pipe:
+        l1_ttl, l2_ttl = await pipe.ttl(f"l1:{request_name}").ttl(f"l2:{request_name}").execute()
+    ttl = max(l1_ttl, l2_ttl)
+    return fresh_ttl(ttl) if ttl > 0 else -1
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
@@ -0,0 +1,55 @@
+import contextlib
+import time
+
+from redis.exceptions import RedisError
+
+from src import config
+
+
+class RedisHealth:
+    """
+    Decides when Redis is too slow (or down) to be worth waiting on.
+
+    Cache reads report their latency, smoothed (EWMA). When it crosses REDIS_SLOW_MS, or a command
+    fails/times out, Redis is "degraded" for REDIS_DEGRADED_COOLDOWN seconds: handlers skip hotness
+    bookkeeping, serve from local_cache and go straight to Jikan. After the cooldown the next requests
+    probe Redis again.
+    """
+    def __init__(self, slow_seconds: float, cooldown: float, alpha: float = 0.2):
+        self.slow_seconds = slow_seconds
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.latency = 0.0                  # EWMA, seconds
+        self.degraded_until = 0.0
+        self.trips = 0
+
+    @property
+    def degraded(self) -> bool:
+        return time.monotonic() < self.degraded_until
+
+    def trip(self, reason: str):
+        from src.app import app_logger
+
+        if not self.degraded:
+            self.trips += 1
+            app_logger.warning(f"Redis degraded for {self.cooldown}s ({reason})")
+        self.degraded_until = time.monotonic() + self.cooldown
+        self.latency = 0.0      # start over once the cooldown ends
+
+    def observe(self, seconds: float):
+        self.latency += self.alpha * (seconds - self.latency)
+        if self.latency > self.slow_seconds:
+            self.trip(f"latency {self.latency * 1000:.0f}ms")
+
+    @contextlib.contextmanager
+    def timed(self):
+        """Wrap a Redis round trip: reports its latency, and trips on connection errors/timeouts before re-raising"""
+        start = time.perf_counter()
+        try:
+            yield
+        except RedisError as e:
+            self.trip(repr(e))
+            raise
+        self.observe(time.perf_counter() - start)
+
+redis_health = RedisHealth(slow_seconds=config.REDIS_SLOW_MS / 1000, cooldown=config.REDIS_DEGRADED_COOLDOWN)
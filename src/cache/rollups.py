@@ -0,0 +1,146 @@
+import asyncio
+import re
+import time
+
+from redis.exceptions import RedisError
+
+from src import config
+from src.cache.redis_health import redis_health
+from src.dependencies.services import ServiceProvider
+from src.tools.background import BackgroundJobs
+
+
+"""
+Hotness rollups: what traffic looked like over the last hours/days, where hot_request|*/param_hotness|*
+only know the last minute. Kinds:
+    pages    page request_name ("anime|https://...?status:airing|...|page:1|")
+    params   "{media}|{param}:{value}", the priority params of param_hotness
+Queries (every page of a canonical query) are summed out of pages when reported.
+
+Per worker, every hit is a dict increment (no I/O). Every ROLLUP_INTERVAL the counts are added to
+    rollup:{kind}:{bucket}   zset, member -> hits. One per ROLLUP_BUCKET_SECONDS, trimmed to its
+                             ROLLUP_BUCKET_TOP members, expires after ROLLUP_RETENTION buckets
+so storage is bounded whatever the traffic. Workers add up (ZINCRBY), no leader needed.
+"""
+
+KINDS = ("pages", "params")
+PAGE_SUFFIX = re.compile(r"page:\d+\|$")
+
+
+class HotnessRollups(BackgroundJobs):
+    def __init__(self, interval: float, bucket_seconds: int, retention: int, bucket_top: int, local_max: int):
+        super().__init__()
+        self.interval = interval
+        self.bucket_seconds = bucket_seconds
+        self.retention = retention
+        self.bucket_top = bucket_top
+        self.local_max = local_max
+        self.counts: dict[str, dict[str, int]] = {kind: {} for kind in KINDS}      # not flushed yet
+
+
+    def jobs(self, services: ServiceProvider):
+        return [self.flusher(services)]
+
+    async def on_stop(self, services: ServiceProvider):
+        # what's left would be lost with the process
+        await self.flush(services.redis)
+
+
+    def note(self, kind: str, name: str):
+        counts = self.counts[kind]
+        counts[name] = counts.get(name, 0) + 1
+        # a flood of one-off names (or Redis down for long) can't grow this forever: keep the heaviest half
+        if len(counts) > self.local_max:
+            heaviest = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:self.local_max // 2]
+            self.counts[kind] = dict(heaviest)
+
+
+    def bucket(self, now: float | None = None) -> int:
+        return int((now or time.time()) // self.bucket_seconds)
+
+
+    async def flush(self, redis):
+        counts, self.counts = self.counts, {kind: {} for kind in KINDS}
+        if not any(counts.values()):
+            return
+
+        bucket = self.bucket()
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for kind, names in counts.items():
+                    if not names:
+                        continue
+                    key = f"rollup:{kind}:{bucket}"
+                    for name, hits in names.items():
+                        pipe.zincrby(key, hits, name)
+                    pipe.zremrangebyrank(key, 0, -self.bucket_top - 1)
+                    pipe.expire(key, self.bucket_seconds * self.retention)
+                await pipe.execute()
+        except RedisError:
+            # keep them for the next flush
+            for kind, names in counts.items():
+                for name, hits in names.items():
+                    self.counts[kind][name] = self.counts[kind].get(name, 0) + hits
+            raise
+
+
+    async def flusher(self, services: ServiceProvider):
+        from src.app import app_logger
+
+        while True:
+            await asyncio.sleep(self.interval)
+            if redis_health.degraded:
+                continue
+            try:
+                await self.flush(services.redis)
+            except RedisError as e:
+                redis_health.trip(repr(e))
+            except Exception as e:
+                app_logger.warning(f"Hotness rollup flush failed! {e!r}")
+
+
+    async def totals(self, redis, kind: str, hours: float) -> dict[str, float]:
+        """Hits per name over the last `hours` (whole buckets), every worker's flushed counts"""
+        current = self.bucket()
+        buckets = range(current - max(1, round(hours * 3600 / self.bucket_seconds)) + 1, current + 1)
+        async with redis.pipeline(transaction=False) as pipe:
+            for bucket in buckets:
+                pipe.zrange(f"rollup:{kind}:{bucket}", 0, -1, withscores=True)
+            results = await pipe.execute()
+
+        totals: dict[str, float] = {}
+        for members in results:
+            for member, hits in members:
+                name = member.decode()
+                totals[name] = totals.get(name, 0) + hits
+        return totals
+
+
+    async def top(self, redis, kind: str, hours: float, k: int) -> list[tuple[str, float]]:
+        """kind: pages, params, or queries (pages summed per canonical query)"""
+        totals = await self.totals(redis, "pages" if kind == "queries" else kind, hours)
+        if kind == "queries":
+            queries: dict[str, float] = {}
+            for request_name, hits in totals.items():
+                query_name = PAGE_SUFFIX.sub("", request_name)
+                queries[query_name] = queries.get(query_name, 0) + hits
+            totals = queries
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+    async def report(self, redis, hours: float, k: int) -> dict:
+        return {
+            "hours": hours,
+            **{
+                kind: [{"name": name, "hits": int(hits)} for name, hits in await self.top(redis, kind, hours, k)]
+                for kind in ("queries", "params", "pages")
+            },
+        }
+
+hotness_rollups = HotnessRollups(
+    interval=config.ROLLUP_INTERVAL,
+    bucket_seconds=config.ROLLUP_BUCKET_SECONDS,
+    retention=config.ROLLUP_RETENTION,
+    bucket_top=config.ROLLUP_BUCKET_TOP,
+    local_max=config.ROLLUP_LOCAL_MAX,
+)
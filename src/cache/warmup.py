@@ -0,0 +1,226 @@
+import asyncio
+import json
+import math
+import os
+import time
+
+from redis.exceptions import RedisError
+
+from src import config
+from src.cache.feeds import canned_feeds
+from src.cache.redis_database import entry_fresh_ttl
+from src.cache.redis_health import redis_health
+from src.cache.rollups import hotness_rollups
+from src.dependencies.services import ServiceProvider
+from src.tools.background import BackgroundJobs, LeaderLock
+from src.tools.crafters import parse_request_name
+
+
+"""
+Manifest layout (JSON):
+{
+    "written_at": 1700000000.0,
+    "requests": [{"request_name": "anime|https://...page:1|", "score": 12.5}, ...],   # hottest first, score: hits/minute
+    "lookups": {"lookup:genres:anime": {"action": "1", ...}, ...}
+}
+"""
+
+
+def read_manifest() -> dict:
+    try:
+        with open(config.WARMUP_MANIFEST_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"requests": [], "lookups": {}}
+
+
+def write_manifest(manifest: dict):
+    # write then rename so a crash (or another worker) never leaves half a file behind
+    path = config.WARMUP_MANIFEST_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def replay_hotness(score: float) -> int:
+    """
+    request_hotness of a warmed page. It's a hit count everywhere else, while a manifest score averages a day of
+    traffic into fractions of a hit per minute (int() would make nearly every page 0, the coldest class).
+    Scaled back to one rollup bucket, the finest grain that history has: the page's usual hits per bucket
+    """
+    return math.ceil(score * config.ROLLUP_BUCKET_SECONDS / 60)
+
+
+async def snapshot_manifest(services: ServiceProvider, previous: dict) -> dict:
+    """
+    The hottest pages of the last WARMUP_HISTORY_HOURS, from the hotness rollups (every worker's traffic).
+    Score is hits per minute over that window (see replay_hotness for what a warmed page gets).
+    Pages hit only once in the window aren't worth an upstream call at startup.
+    """
+    redis = services.redis
+
+    # this worker's latest counts too, not just what was flushed up to a minute ago
+    await hotness_rollups.flush(redis)
+    hottest = await hotness_rollups.top(redis, "pages", hours=config.WARMUP_HISTORY_HOURS, k=config.WARMUP_TOP_N)
+    minutes = config.WARMUP_HISTORY_HOURS * 60
+
+    lookups = {}
+    async for table_name in redis.scan_iter(match="lookup:*", count=100):
+        table = await redis.hgetall(table_name)
+        lookups[table_name.decode()] = {k.decode(): v.decode() for k, v in table.items()}
+
+    return {
+        "written_at": time.time(),
+        "requests": [{"request_name": name, "score": round(hits / minutes, 3)} for name, hits in hottest if hits >= 2],
+        "lookups": lookups or previous.get("lookups", {}),
+    }
+
+
+
+LEADER_KEY = "warmup:leader"
+STATUS_KEY = "warmup:status"
+
+
+class CacheWarmup(BackgroundJobs):
+    """
+    On startup: replay the manifest (lookups first, then the hottest pages) in the background
+    while the worker is already serving. `ready` flips once WARMUP_READY_COVERAGE of the
+    manifest is warm, or once warmup is done no matter what.
+    While running: rewrite the manifest every WARMUP_MANIFEST_INTERVAL seconds.
+
+    With several workers only the leader (warmup:leader lock in Redis) replays and writes the manifest.
+    The others follow its progress through warmup:status, the cache they serve from is the same one.
+    """
+    def __init__(self):
+        super().__init__()
+        self.leader = LeaderLock(LEADER_KEY, config.WARMUP_LEADER_TTL)
+        self.total = 0
+        self.warmed = 0
+        self.ready = False
+
+    @property
+    def coverage(self) -> float:
+        return self.warmed / self.total if self.total else 1.0
+
+
+    def jobs(self, services: ServiceProvider):
+        return [self.run(services), self.manifest_writer(services)]
+
+    async def on_stop(self, services: ServiceProvider):
+        # one last manifest so the next start (deploy) gets the freshest picture
+        if await self.leader.acquire(services.redis):
+            write_manifest(await snapshot_manifest(services=services, previous=read_manifest()))
+            await self.leader.release(services.redis)
+
+
+    async def publish(self, redis):
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hset(STATUS_KEY, mapping={"warmed": self.warmed, "total": self.total, "ready": int(self.ready)})
+            pipe.expire(STATUS_KEY, config.WARMUP_LEADER_TTL)
+            pipe.expire(LEADER_KEY, config.WARMUP_LEADER_TTL)
+            await pipe.execute()
+
+
+    async def follow(self, redis):
+        """Non-leader workers: mirror the leader's progress until it's ready (or gone)"""
+        while not self.ready:
+            status = await redis.hgetall(STATUS_KEY)
+            if status:
+                self.warmed, self.total = int(status[b"warmed"]), int(status[b"total"])
+                self.ready = status[b"ready"] == b"1"
+            elif not await redis.exists(LEADER_KEY):
+                self.ready = True
+            else:
+                await asyncio.sleep(1)
+                continue
+            if not self.ready:
+                await asyncio.sleep(1)
+
+
+    async def run(self, services: ServiceProvider):
+        """Warmup failing (ex: Redis down at startup) doesn't keep the worker unready: it can serve degraded"""
+        from src.app import app_logger
+
+        try:
+            await self.replay(services)
+        except RedisError as e:
+            redis_health.trip(repr(e))
+            app_logger.warning(f"Warmup aborted, ready without it! {e!r}")
+        except Exception as e:
+            app_logger.warning(f"Warmup failed, ready without it! {e!r}")
+        self.ready = True
+
+
+    async def replay(self, services: ServiceProvider):
+        from src.app import app_logger
+
+        redis = services.redis
+        if not await self.leader.acquire(redis):
+            app_logger.info("Warmup: following the leader worker")
+            await self.follow(redis)
+            return
+
+        manifest = read_manifest()
+        start_time = time.perf_counter()
+
+        # lookup tables come straight from the manifest, no upstream call needed
+        for table_name, table in manifest.get("lookups", {}).items():
+            if table and not await redis.exists(table_name):
+                await redis.hset(name=table_name, mapping=table)
+                await redis.expire(name=table_name, time=10000)
+
+        entries = manifest.get("requests", [])
+        self.total = len(entries)
+        self.warmed = 0
+        self.ready = self.coverage >= config.WARMUP_READY_COVERAGE
+        await self.publish(redis)
+        app_logger.info(f"Warmup started: {self.total} request/s, {len(manifest.get("lookups", {}))} lookup table/s")
+
+        semaphore = asyncio.Semaphore(config.WARMUP_CONCURRENCY)
+
+        async def warm(entry: dict):
+            async with semaphore:
+                try:
+                    await self.warm_one(request_name=entry["request_name"], request_hotness=replay_hotness(entry["score"]), services=services)
+                    self.warmed += 1
+                except Exception as e:
+                    app_logger.warning(f"Warmup failed! {entry["request_name"]} | {e!r}")
+            if not self.ready and self.coverage >= config.WARMUP_READY_COVERAGE:
+                self.ready = True
+                app_logger.info(f"Warmup coverage reached ({self.coverage:.0%}), ready")
+            await self.publish(redis)
+
+        await asyncio.gather(*(warm(entry) for entry in entries))
+        self.ready = True
+        await self.publish(redis)
+        app_logger.info(f"Warmup done: {self.warmed}/{self.total} warmed ({time.perf_counter() - start_time:4F}s)")
+
+
+    async def warm_one(self, request_name: str, request_hotness: int, services: ServiceProvider):
+        from src.request_handlers import collapsed_fetch
+
+        redis = services.redis
+        if request_name in canned_feeds.specs or await entry_fresh_ttl(redis, request_name) > 0:
+            return
+
+        spec = parse_request_name(request_name)
+        await collapsed_fetch(query=spec["query"], hot_params={}, request_hotness=request_hotness, services=services, page=spec["page"])
+
+
+    async def manifest_writer(self, services: ServiceProvider):
+        from src.app import app_logger
+
+        while True:
+            await asyncio.sleep(config.WARMUP_MANIFEST_INTERVAL)
+            try:
+                if not await self.leader.acquire(services.redis):
+                    continue
+                manifest = await snapshot_manifest(services=services, previous=read_manifest())
+                write_manifest(manifest)
+                app_logger.info(f"Warmup manifest written ({len(manifest["requests"])} request/s)")
+            except Exception as e:
+                app_logger.warning(f"Warmup manifest write failed! {e!r}")
+
+warmup = CacheWarmup()
@@ -0,0 +1,150 @@
+import asyncio
+import datetime
+from typing import AsyncIterator
+
+from fastapi import HTTPException
+import httpx
+
+from src import config
+from src.catalog.store import CatalogStore
+from src.jikan import fetch_jikan
+from src.tools.Logs import Logger
+
+
+"""
+Catalog ingest. Two kinds of run per media, each made of jobs checkpointed in the store:
+
+    full          {media}:full                 every title, by mal_id. Tens of thousands of calls, resumable
+    incremental   {media}:incremental          the run itself (its started_at tells what this run refetched)
+                  {media}:incremental:{seg}    ongoing statuses (airing/publishing, upcoming) + titles that started
+                                               in the last INGEST_RECENT_DAYS. Then every ongoing title in the store
+                                               the segments didn't touch is refetched by id: it changed status
+
+An interrupted run resumes where its checkpoints stopped, a finished one starts over.
+Pages are fetched up to INGEST_CONCURRENCY at a time (jikan_limiter paces them) but written in order,
+at most INGEST_CONCURRENCY pages are held in memory.
+"""
+
+ONGOING_STATUSES = {
+    "anime": ("airing", "upcoming"),
+    "manga": ("publishing", "upcoming"),
+}
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# its own log: ingest runs next to the API, which owns app.log
+ingest_logger = Logger(logger_name='ingest_logger', log_file='ingest.log').get_logger()
+
+
+class CatalogIngest:
+    def __init__(self, store: CatalogStore, client: httpx.AsyncClient, concurrency: int = config.INGEST_CONCURRENCY):
+        self.store = store
+        self.client = client
+        self.concurrency = concurrency
+
+
+    async def fetch(self, request_url: str, params: dict | None = None) -> dict:
+        for attempt in range(config.INGEST_RETRIES + 1):
+            try:
+                response = await fetch_jikan(request_url=request_url, client=self.client, params=params, logger=ingest_logger)
+                return response.json()
+            except HTTPException as e:
+                if e.status_code not in RETRY_STATUSES or attempt == config.INGEST_RETRIES:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+
+
+    async def iter_pages(self, request_url: str, params: dict, start_page: int = 1) -> AsyncIterator[tuple[int, int, list[dict]]]:
+        """(page, last_page, items) in page order, starting at start_page. Up to `concurrency` pages in flight"""
+        first = await self.fetch(request_url, {**params, "page": start_page})
+        last_page = first["pagination"]["last_visible_page"]
+        yield start_page, last_page, first["data"]
+
+        pending: dict[int, asyncio.Task] = {}
+        next_page = start_page + 1
+        try:
+            while next_page <= last_page or pending:
+                while next_page <= last_page and len(pending) < self.concurrency:
+                    pending[next_page] = asyncio.create_task(self.fetch(request_url, {**params, "page": next_page}))
+                    next_page += 1
+                page = min(pending)
+                body = await pending.pop(page)
+                # the catalog can grow (or shrink) while we crawl it
+                last_page = body["pagination"]["last_visible_page"]
+                yield page, last_page, body["data"]
+        finally:
+            for task in pending.values():
+                task.cancel()
+
+
+    async def run_job(self, job: str, media: str, params: dict) -> int:
+        """One paginated crawl, resumed from its checkpoint if it didn't finish. Returns titles written"""
+        checkpoint = self.store.checkpoint(job)
+        if checkpoint is None or checkpoint["finished_at"] is not None:
+            checkpoint = self.store.start_job(job)
+        start_page = checkpoint["next_page"]
+        if checkpoint["last_page"] is not None and start_page > checkpoint["last_page"]:
+            self.store.finish_job(job)
+            return 0
+        ingest_logger.info(f"Ingest {job}: from page {start_page}")
+
+        written = 0
+        async for page, last_page, items in self.iter_pages(f"{config.JIKAN_BASE_URL}/{media}", params, start_page):
+            self.store.commit_page(media, items, job=job, next_page=page + 1, last_page=last_page)
+            written += len(items)
+        self.store.finish_job(job)
+        ingest_logger.info(f"Ingest {job}: done, {written} title/s")
+        return written
+
+
+    async def full(self, media: str) -> int:
+        return await self.run_job(f"{media}:full", media, {"order_by": "mal_id", "sort": "asc"})
+
+
+    async def incremental(self, media: str, today: datetime.date | None = None) -> int:
+        run_job = f"{media}:incremental"
+        run = self.store.checkpoint(run_job)
+        if run is None or run["finished_at"] is not None:
+            run = self.store.start_job(run_job)
+        started_at = run["started_at"]
+
+        since = (today or datetime.date.today()) - datetime.timedelta(days=config.INGEST_RECENT_DAYS)
+        segments = {status: {"status": status, "order_by": "mal_id", "sort": "asc"} for status in ONGOING_STATUSES[media]}
+        segments["recent"] = {"start_date": since.isoformat(), "order_by": "mal_id", "sort": "asc"}
+
+        written = 0
+        for segment, params in segments.items():
+            job = f"{run_job}:{segment}"
+            checkpoint = self.store.checkpoint(job)
+            # finished during this run (before a restart): skip. Finished during an older run: redo
+            if checkpoint is not None and checkpoint["finished_at"] is not None and checkpoint["finished_at"] >= started_at:
+                continue
+            if checkpoint is not None and checkpoint["started_at"] < started_at:
+                self.store.start_job(job)
+            written += await self.run_job(job, media, params)
+
+        written += await self.refetch(media, self.store.stale_ongoing(media, before=started_at))
+        self.store.finish_job(run_job)
+        return written
+
+
+    async def refetch(self, media: str, mal_ids: list[int]) -> int:
+        """Titles one by one (by id), `concurrency` at a time. Gone upstream (404) = left as is"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        written = 0
+
+        async def one(mal_id: int):
+            nonlocal written
+            async with semaphore:
+                try:
+                    body = await self.fetch(f"{config.JIKAN_BASE_URL}/{media}/{mal_id}")
+                except HTTPException as e:
+                    if e.status_code == 404:
+                        return
+                    raise
+            self.store.upsert(media, [body["data"]])
+            written += 1
+
+        if mal_ids:
+            ingest_logger.info(f"Ingest {media}: refetching {len(mal_ids)} title/s by id")
+        await asyncio.gather(*(one(mal_id) for mal_id in mal_ids))
+        return written
@@ -0,0 +1,127 @@
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+
+"""
+Local mirror of the Jikan catalogs, one SQLite file (config.CATALOG_DB_PATH).
+
+    anime / manga         one row per title: a few columns to query on + the Jikan item as JSON
+    ingest_checkpoints    one row per ingest job (see src/catalog/ingest.py), updated in the same
+                          transaction as the page it covers, so a restart resumes exactly after it
+"""
+
+MEDIA = ("anime", "manga")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS {media} (
+    mal_id      INTEGER PRIMARY KEY,
+    status      TEXT,
+    ongoing     INTEGER NOT NULL,      -- airing/publishing or not started yet: what incremental runs refetch
+    start_date  TEXT,
+    score       REAL,
+    fetched_at  REAL NOT NULL,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS {media}_ongoing ON {media} (ongoing, fetched_at);
+"""
+
+CHECKPOINTS = """
+CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+    job          TEXT PRIMARY KEY,
+    next_page    INTEGER NOT NULL,
+    last_page    INTEGER,
+    started_at   REAL NOT NULL,
+    updated_at   REAL NOT NULL,
+    finished_at  REAL
+);
+"""
+
+
+def is_ongoing(item: dict) -> bool:
+    status = item.get("status") or ""
+    return bool(item.get("airing") or item.get("publishing") or status.startswith("Not yet"))
+
+
+def item_start_date(item: dict) -> str | None:
+    dates = item.get("aired") or item.get("published") or {}
+    return (dates.get("from") or "")[:10] or None
+
+
+class CatalogStore:
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        # WAL: the API can read while an ingest writes
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        for media in MEDIA:
+            self.db.executescript(SCHEMA.format(media=media))
+        self.db.executescript(CHECKPOINTS)
+
+    def close(self):
+        self.db.close()
+
+
+    def upsert_rows(self, media: str, items: list[dict], fetched_at: float):
+        self.db.executemany(
+            f"""INSERT INTO {media} (mal_id, status, ongoing, start_date, score, fetched_at, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (mal_id) DO UPDATE SET
+                    status=excluded.status, ongoing=excluded.ongoing, start_date=excluded.start_date,
+                    score=excluded.score, fetched_at=excluded.fetched_at, data=excluded.data""",
+            [
+                (item["mal_id"], item.get("status"), int(is_ongoing(item)), item_start_date(item), item.get("score"),
+                 fetched_at, json.dumps(item, separators=(",", ":")))
+                for item in items
+            ],
+        )
+
+    def commit_page(self, media: str, items: list[dict], job: str, next_page: int, last_page: int):
+        """Items of one page and the checkpoint past it, all or nothing"""
+        now = time.time()
+        with self.db:
+            self.upsert_rows(media, items, fetched_at=now)
+            self.db.execute(
+                "UPDATE ingest_checkpoints SET next_page = ?, last_page = ?, updated_at = ? WHERE job = ?",
+                (next_page, last_page, now, job),
+            )
+
+    def upsert(self, media: str, items: list[dict]):
+        with self.db:
+            self.upsert_rows(media, items, fetched_at=time.time())
+
+
+    def checkpoint(self, job: str) -> dict | None:
+        row = self.db.execute("SELECT * FROM ingest_checkpoints WHERE job = ?", (job,)).fetchone()
+        return dict(row) if row else None
+
+    def start_job(self, job: str) -> dict:
+        now = time.time()
+        with self.db:
+            self.db.execute(
+                """INSERT INTO ingest_checkpoints (job, next_page, last_page, started_at, updated_at, finished_at)
+                   VALUES (?, 1, NULL, ?, ?, NULL)
+                   ON CONFLICT (job) DO UPDATE SET next_page=1, last_page=NULL, started_at=?, updated_at=?, finished_at=NULL""",
+                (job, now, now, now, now),
+            )
+        return self.checkpoint(job)
+
+    def finish_job(self, job: str):
+        with self.db:
+            self.db.execute("UPDATE ingest_checkpoints SET finished_at = ?, updated_at = ? WHERE job = ?", (time.time(), time.time(), job))
+
+
+    def stale_ongoing(self, media: str, before: float) -> list[int]:
+        """Ongoing titles not refetched since `before`: they dropped out of the airing/upcoming lists, likely finished"""
+        rows = self.db.execute(f"SELECT mal_id FROM {media} WHERE ongoing = 1 AND fetched_at < ?", (before,))
+        return [row["mal_id"] for row in rows]
+
+    def get(self, media: str, mal_id: int) -> dict | None:
+        row = self.db.execute(f"SELECT data FROM {media} WHERE mal_id = ?", (mal_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def count(self, media: str) -> int:
+        return self.db.execute(f"SELECT COUNT(*) FROM {media}").fetchone()[0]
@@ -0,0 +1,134 @@
+import os
+from pathlib import Path
+
+"""Settings that change per deployment. Everything can be overridden with an ANIRECO_* env var"""
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+# Server (serve.py). main.py is the dev entry point and ignores these
+HOST = os.getenv("ANIRECO_HOST", "0.0.0.0")
+PORT = int(os.getenv("ANIRECO_PORT", 8000))
+WORKERS = int(os.getenv("ANIRECO_WORKERS", os.getenv("WEB_CONCURRENCY", 1)))
+GRACEFUL_TIMEOUT = int(os.getenv("ANIRECO_GRACEFUL_TIMEOUT", 30))               # seconds in-flight requests get on SIGTERM
+
+
+# Cache backend (src/cache/backend.py): "redis", shared by every worker, or "memory", in-process (tests, benchmarks, single-worker edge nodes)
+CACHE_BACKEND = os.getenv("ANIRECO_CACHE_BACKEND", "redis")
+
+# Redis. Shared by every worker
+REDIS_HOST = os.getenv("ANIRECO_REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("ANIRECO_REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("ANIRECO_REDIS_DB", 0))
+REDIS_MAX_CONNECTIONS = int(os.getenv("ANIRECO_REDIS_MAX_CONNECTIONS", 50))      # per worker
+REDIS_POOL_TIMEOUT = float(os.getenv("ANIRECO_REDIS_POOL_TIMEOUT", 0.2))          # seconds to wait for a free connection
+REDIS_SOCKET_TIMEOUT = float(os.getenv("ANIRECO_REDIS_SOCKET_TIMEOUT", 0.5))      # per command
+REDIS_CONNECT_TIMEOUT = float(os.getenv("ANIRECO_REDIS_CONNECT_TIMEOUT", 0.5))
+
+# Degradation (src/cache/redis_health.py). Redis slower than this = skip it for a while
+REDIS_SLOW_MS = float(os.getenv("ANIRECO_REDIS_SLOW_MS", 50))
+REDIS_DEGRADED_COOLDOWN = float(os.getenv("ANIRECO_REDIS_DEGRADED_COOLDOWN", 10))
+LOCAL_CACHE_TTL = int(os.getenv("ANIRECO_LOCAL_CACHE_TTL", 60))                 # after that a local copy is stale, only served if Jikan fails too
+
+
+# Upstream. Jikan allows 3 requests/second and 60/minute for the whole deployment,
+# every worker gets an equal share (see jikan_limiter)
+JIKAN_BASE_URL = os.getenv("ANIRECO_JIKAN_BASE_URL", "https://api.jikan.moe/v4")
+JIKAN_RATE = float(os.getenv("ANIRECO_JIKAN_RATE", 1.0))                         # tokens/second
+JIKAN_BURST = int(os.getenv("ANIRECO_JIKAN_BURST", 3))
+# a page missed by several workers at once is fetched by one of them (RequestCollapser in src/request_handlers.py)
+COLLAPSE_WAIT = int(os.getenv("ANIRECO_COLLAPSE_WAIT", 10))        # seconds the others wait for it before fetching themselves
+
+
+# Startup warmup (src/cache/warmup.py)
+WARMUP_MANIFEST_PATH = Path(os.getenv("ANIRECO_WARMUP_MANIFEST_PATH", BASE_DIR / "var" / "warmup_manifest.json"))
+WARMUP_TOP_N = int(os.getenv("ANIRECO_WARMUP_TOP_N", 50))                        # hottest request keys kept in the manifest
+WARMUP_HISTORY_HOURS = float(os.getenv("ANIRECO_WARMUP_HISTORY_HOURS", 24))      # hottest over that window, from the hotness rollups
+WARMUP_MANIFEST_INTERVAL = float(os.getenv("ANIRECO_WARMUP_MANIFEST_INTERVAL", 60))  # seconds between manifest writes
+WARMUP_CONCURRENCY = int(os.getenv("ANIRECO_WARMUP_CONCURRENCY", 3))
+WARMUP_READY_COVERAGE = float(os.getenv("ANIRECO_WARMUP_READY_COVERAGE", 0.8))  # share of the manifest warmed before /ready says yes
+WARMUP_LEADER_TTL = int(os.getenv("ANIRECO_WARMUP_LEADER_TTL", 180))            # one worker replays/writes the manifest, the rest follow
+
+
+# Cache value compression (src/cache/codec.py)
+CACHE_COMPRESSION = os.getenv("ANIRECO_CACHE_COMPRESSION", "zstd")                  # "zstd", "zlib" or "off" (readers always accept all)
+CACHE_COMPRESSION_MIN_BYTES = int(os.getenv("ANIRECO_CACHE_COMPRESSION_MIN_BYTES", 1024))
+CACHE_ZSTD_LEVEL = int(os.getenv("ANIRECO_CACHE_ZSTD_LEVEL", 3))
+CACHE_ZSTD_DICT_PATH = Path(os.getenv("ANIRECO_CACHE_ZSTD_DICT_PATH", BASE_DIR / "var" / "jikan.zdict"))   # see bin/train_zstd_dict.py
+
+
+# Upstream revalidation (fetch_page in src/request_handlers.py)
+REVALIDATE_GRACE = int(os.getenv("ANIRECO_REVALIDATE_GRACE", 600))      # seconds a cache entry outlives its TTL, waiting to be revalidated
+
+
+# Cache classes (src/cache/budgets.py). Memory budget per class in MB, in Redis and in process (local_cache).
+# ANIRECO_CACHE_BUDGET_<CLASS>_MB / ANIRECO_LOCAL_BUDGET_<CLASS>_MB
+_BUDGETS_MB = {         # class: (redis, in process)
+    "counters": (16, 0),
+    "lookups": (4, 0),
+    "negative": (8, 1),
+    "hot": (128, 16),
+    "regular": (64, 8),
+    "feeds": (32, 8),
+}
+CACHE_BUDGETS = {cls: int(float(os.getenv(f"ANIRECO_CACHE_BUDGET_{cls.upper()}_MB", mb)) * 2**20) for cls, (mb, _) in _BUDGETS_MB.items()}
+LOCAL_BUDGETS = {cls: int(float(os.getenv(f"ANIRECO_LOCAL_BUDGET_{cls.upper()}_MB", mb)) * 2**20) for cls, (_, mb) in _BUDGETS_MB.items()}
+CACHE_SWEEP_INTERVAL = float(os.getenv("ANIRECO_CACHE_SWEEP_INTERVAL", 30))     # seconds between budget sweeps (one worker per interval)
+
+
+# Negative cache (src/cache/negative.py): empty results and upstream errors, answered before any I/O
+NEGATIVE_BLOOM_CAPACITY = int(os.getenv("ANIRECO_NEGATIVE_BLOOM_CAPACITY", 100_000))
+NEGATIVE_BLOOM_ERROR_RATE = float(os.getenv("ANIRECO_NEGATIVE_BLOOM_ERROR_RATE", 0.01))
+NEGATIVE_LOCAL_SIZE = int(os.getenv("ANIRECO_NEGATIVE_LOCAL_SIZE", 4096))          # entries kept in process, the rest is one GET away
+NEGATIVE_SYNC_INTERVAL = float(os.getenv("ANIRECO_NEGATIVE_SYNC_INTERVAL", 2))   # seconds between pulls of other workers' entries
+# upstream status -> seconds it's cached. Only answers about the query itself, they won't change on retry.
+# 5xx/429 are upstream blips, cached they would be shared by every worker: the rate limiter and retries deal with them
+NEGATIVE_ERROR_TTLS = {
+    int(status): int(ttl)
+    for status, ttl in (pair.split(":") for pair in os.getenv("ANIRECO_NEGATIVE_ERROR_TTLS", "400:300,404:300").split(","))
+}
+
+
+# Local catalog mirror (src/catalog). bin/ingest.py fills it
+CATALOG_DB_PATH = Path(os.getenv("ANIRECO_CATALOG_DB_PATH", BASE_DIR / "var" / "catalog.db"))
+INGEST_CONCURRENCY = int(os.getenv("ANIRECO_INGEST_CONCURRENCY", 3))      # pages in flight. jikan_limiter still paces them
+INGEST_RECENT_DAYS = int(os.getenv("ANIRECO_INGEST_RECENT_DAYS", 30))     # incremental runs refetch titles that started within this window
+INGEST_RETRIES = int(os.getenv("ANIRECO_INGEST_RETRIES", 3))               # per page, for 429/5xx
+
+
+# Freshness (src/cache/freshness.py): how long a page stays fresh depends on what's in it
+FRESHNESS_MIN_TTL = int(os.getenv("ANIRECO_FRESHNESS_MIN_TTL", 60))
+FRESHNESS_STABLE_TTL = int(os.getenv("ANIRECO_FRESHNESS_STABLE_TTL", 6 * 3600))       # only finished/discontinued titles (scores still drift)
+FRESHNESS_AIRING_TTL = int(os.getenv("ANIRECO_FRESHNESS_AIRING_TTL", 3600))           # airing/publishing without a known schedule
+FRESHNESS_UPCOMING_TTL = int(os.getenv("ANIRECO_FRESHNESS_UPCOMING_TTL", 3 * 3600))   # not started yet, no start date
+FRESHNESS_SETTLE = int(os.getenv("ANIRECO_FRESHNESS_SETTLE", 1800))                   # seconds after a broadcast before MAL reflects it
+
+
+# Admin: the /admin routes and the X-Profile header need X-Admin-Token: <ANIRECO_ADMIN_TOKEN>. Unset, they're off
+ADMIN_TOKEN = os.getenv("ANIRECO_ADMIN_TOKEN", "")
+
+
+# Profiling (src/tools/profiling.py): opt-in per request (X-Profile: 1, admins only) or sampled
+PROFILE_SAMPLE_RATE = float(os.getenv("ANIRECO_PROFILE_SAMPLE_RATE", 0.0))    # share of requests profiled without the header
+PROFILE_SLOW_MS = float(os.getenv("ANIRECO_PROFILE_SLOW_MS", 1000))            # profiled requests this slow go to the flight recorder
+PROFILE_BUFFER_SIZE = int(os.getenv("ANIRECO_PROFILE_BUFFER_SIZE", 50))        # per worker
+
+
+# Hotness rollups (src/cache/rollups.py): hits per page/param over time, bounded
+ROLLUP_INTERVAL = float(os.getenv("ANIRECO_ROLLUP_INTERVAL", 60))               # seconds between flushes (per worker)
+ROLLUP_BUCKET_SECONDS = int(os.getenv("ANIRECO_ROLLUP_BUCKET_SECONDS", 3600))
+ROLLUP_RETENTION = int(os.getenv("ANIRECO_ROLLUP_RETENTION", 7 * 24))            # buckets kept
+ROLLUP_BUCKET_TOP = int(os.getenv("ANIRECO_ROLLUP_BUCKET_TOP", 2000))            # members kept per bucket, the heaviest
+ROLLUP_LOCAL_MAX = int(os.getenv("ANIRECO_ROLLUP_LOCAL_MAX", 20000))             # distinct names a worker holds between flushes
+
+
+# Canned feeds (src/cache/feeds.py): precomputed pages of the most common queries
+FEED_TYPES = [t for t in os.getenv("ANIRECO_FEED_TYPES", "tv,movie").split(",") if t]   # every feed untyped + once per type
+FEED_PAGES = int(os.getenv("ANIRECO_FEED_PAGES", 1))
+FEED_DEFINE_INTERVAL = float(os.getenv("ANIRECO_FEED_DEFINE_INTERVAL", 300))    # seconds between feed list rebuilds (new genres, new season)
+FEED_SCAN_INTERVAL = float(os.getenv("ANIRECO_FEED_SCAN_INTERVAL", 10))         # seconds between looks for due feeds (leader)
+FEED_RETRY = int(os.getenv("ANIRECO_FEED_RETRY", 300))                          # after an upstream error, the old version is served meanwhile
+FEED_KEEP = int(os.getenv("ANIRECO_FEED_KEEP", 7 * 24 * 3600))                 # a feed nobody refreshes for that long is dropped
+FEED_STALE_GRACE = int(os.getenv("ANIRECO_FEED_STALE_GRACE", 1800))             # overdue feeds are served that long, then requests take the generic path
+FEED_LEADER_TTL = int(os.getenv("ANIRECO_FEED_LEADER_TTL", 60))
+FEED_RESERVE = int(os.getenv("ANIRECO_FEED_RESERVE", 1))                        # Jikan tokens always left for foreground requests
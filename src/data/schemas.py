@@ -1,8 +1,8 @@
 import datetime
 from enum import Enum
-from fastapi.exceptions import RequestValidationError
-from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from functools import lru_cache
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from pydantic_core import PydanticCustomError
 
 
 
@@ -18,17 +18,6 @@ class AnimeTypeEnum(str, Enum):
     pv = "pv"
     tv_special = "tv_special"
 
-class MangaTypeEnum(str, Enum):
-    tv = "tv"
-    movie = "movie"
-    ova = "ova"
-    special = "special"
-    ona = "ona"
-    music = "music"
-    cm = "cm"
-    pv = "pv"
-    tv_special = "tv_special"
-    
 class TypeMangaEnum(str, Enum):
     manga = "manga"
     novel = "novel"
@@ -51,11 +40,32 @@ class OrderByEnum(str, Enum):
     members= "members"
     favorites = "favorites"
 
+class MangaOrderByEnum(str, Enum):
+    mal_id = "mal_id"
+    title = "title"
+    start_date = "start_date"
+    end_date = "end_date"
+    chapters = "chapters"
+    volumes = "volumes"
+    score = "score"
+    scored_by = "scored_by"
+    rank = "rank"
+    popularity = "popularity"
+    members= "members"
+    favorites = "favorites"
+
 class StatusEnum(str, Enum):
     airing = "airing"
     complete = "complete"
     upcoming = "upcoming"
 
+class MangaStatusEnum(str, Enum):
+    publishing = "publishing"
+    complete = "complete"
+    hiatus = "hiatus"
+    discontinued = "discontinued"
+    upcoming = "upcoming"
+
 class RatingEnum(str, Enum):
     g = "g"
     pg = "pg"
@@ -68,45 +78,81 @@ class RatingEnum(str, Enum):
 
 
 
-class MangaParams(BaseModel):                                       
-    type: Optional[MangaTypeEnum] | None = Field(default=None)
-    order_by: Optional[OrderByEnum] | None = Field(default=None)
-    status: Optional[StatusEnum] | None = Field(default=None)
-    sfw: Optional[str] | None = Field(default="true")
-    min_score: Optional[float] | None = Field(default=None)
-    max_score: Optional[float] | None = Field(default=None)
-    start_date: Optional[str] | None = Field(default=None)           # Format: YYYY-MM-DD
-    end_date: Optional[str] | None = Field(default=None)             # Format: YYYY-MM-DD
-    genres: Optional[list[str]] | None = Field(default=None)
-    rating: Optional[RatingEnum] | None = Field(default=None)
+class BaseParams(BaseModel):
+    """
+    Filters shared by anime and manga.
+    Frozen, so a validated params object is hashable and its canonical form is computed once per
+    distinct request (canonical_params) instead of being re-dumped to JSON every time.
+    Field checks are plain types/constraints so they all run inside pydantic-core, the only python
+    validator is the cross-field one below.
+    order_by and status take different values per media, each subclass narrows them. Overriding keeps
+    their position, and field order is the order of the cache key.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    order_by: Enum | None = None
+    status: Enum | None = None
+    sfw: str | None = "true"
+    min_score: float | None = Field(default=None, ge=0, le=10)
+    max_score: float | None = Field(default=None, ge=0, le=10)
+    start_date: datetime.date | None = Field(default=None, ge=datetime.date(1900, 1, 1), le=datetime.date(2100, 12, 31))    # Format: YYYY-MM-DD
+    end_date: datetime.date | None = Field(default=None, ge=datetime.date(1900, 1, 1), le=datetime.date(2100, 12, 31))      # Format: YYYY-MM-DD
+    genres: tuple[str, ...] | None = None
+
+
+    @model_validator(mode="after")
+    def check_ranges(self):
+        if self.start_date and self.end_date and self.start_date > self.end_date:
+            raise PydanticCustomError("date_range", "start_date should be before end_date")
+        if self.min_score is not None and self.max_score is not None and self.min_score > self.max_score:
+            raise PydanticCustomError("score_range", "min_score should be lower than max_score")
+        return self
+
+
+    def canonical_params(self) -> dict:
+        """
+        What goes into the cache key and the Jikan request: same as model_dump(mode="json", exclude_none=True)
+        minus page, without the dump. Returns a fresh dict (and genres list), callers may modify it.
+        """
+        return {name: list(value) if isinstance(value, tuple) else value for name, value in canonical_pairs(self)}
+
+
+
+class MangaParams(BaseParams):                                       
+    order_by: MangaOrderByEnum | None = None
+    status: MangaStatusEnum | None = None                             # "publishing", "complete", "hiatus", "discontinued" or "upcoming"
+    type: TypeMangaEnum | None = None                                  # no rating: Jikan's /manga doesn't filter on it
+
+
+
+class AnimeParams(BaseParams):                                         # only manga or anime. Manga includes the types: Manhua, Manhwa, Light Novels, One-shot
+    order_by: OrderByEnum | None = None
+    status: StatusEnum | None = None                                  # "airing" or "complete" or "upcoming"
+    rating: RatingEnum | None = None
+    type: AnimeTypeEnum | None = None
 
 
-    @field_validator("start_date", "end_date")
-    def validate_date(cls, value):
-            try:
-                datetime.date.fromisoformat(value)
-            except ValueError:
-                raise RequestValidationError("Incorrect data format, should be YYYY-MM-DD")
 
+# GET flavours: filters and page all come from the query string (FastAPI needs them in one model)
+class MangaQuery(MangaParams):
+    page: int = Field(default=1, ge=1)
 
 
-class AnimeParams(BaseModel):                                         # only manga or anime. Manga includes the types: Manhua, Manhwa, Light Novels, One-shot
-    type: Optional[AnimeTypeEnum] | None = Field(default=None)
-    order_by: Optional[OrderByEnum] | None = Field(default=None)
-    status: Optional[StatusEnum] | None = Field(default=None)             # "airing" or "complete" or "upcoming"
-    sfw: Optional[str] | None = Field(default="true")
-    min_score: Optional[float] | None = Field(default=None)
-    max_score: Optional[float] | None = Field(default=None)
-    start_date: Optional[str] | None = Field(default=None)           # Format: YYYY-MM-DD
-    end_date: Optional[str] | None = Field(default=None)             # Format: YYYY-MM-DD
-    genres: Optional[list[str]] | None = Field(default=None)
-    rating: Optional[RatingEnum] | None = Field(default=None)
+class AnimeQuery(AnimeParams):
+    page: int = Field(default=1, ge=1)
 
 
-    @field_validator("start_date", "end_date")
-    def validate_date(cls, value):
-            try:
-                datetime.date.fromisoformat(value)
-            except ValueError:
-                raise RequestValidationError("Incorrect data format, should be YYYY-MM-DD")
 
+@lru_cache(maxsize=4096)
+def canonical_pairs(params: BaseParams) -> tuple[tuple[str, object], ...]:
+    pairs = []
+    for name in params.__class__.model_fields:
+        value = getattr(params, name)
+        if value is None or name == "page":
+            continue
+        if isinstance(value, Enum):
+            value = value.value
+        elif isinstance(value, datetime.date):
+            value = value.isoformat()
+        pairs.append((name, value))
+    return tuple(pairs)
@@ -0,0 +1,20 @@
+import hmac
+
+from fastapi import Header, HTTPException, status
+
+from src import config
+
+
+def is_admin(token: str | bytes | None) -> bool:
+    """The X-Admin-Token value matches ANIRECO_ADMIN_TOKEN. Without a configured token nobody is admin"""
+    if not config.ADMIN_TOKEN or not token:
+        return False
+    if isinstance(token, str):
+        token = token.encode()
+    return hmac.compare_digest(token, config.ADMIN_TOKEN.encode())
+
+
+async def require_admin(x_admin_token: str | None = Header(default=None)):
+    """The /admin routes expose query names and timings: not for anonymous clients"""
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
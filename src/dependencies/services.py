@@ -1,9 +1,18 @@
 from fastapi import Request
 import httpx
-from redis.asyncio import Redis
+
+from src.cache.backend import CacheBackend
 
 
 class ServiceProvider:
     def __init__(self, request: Request):
         self.client: httpx.AsyncClient = request.app.state.client
-        self.redis: Redis = request.app.state.redis
\ No newline at end of file
+        self.redis: CacheBackend = request.app.state.redis
+
+    @classmethod
+    def from_state(cls, state) -> "ServiceProvider":
+        """For background jobs (prefetcher) that run outside of a request"""
+        services = cls.__new__(cls)
+        services.client = state.client
+        services.redis = state.redis
+        return services
@@ -1,22 +1,90 @@
+import asyncio
+import logging
+import time
+
 from fastapi import HTTPException
 import httpx
 
-async def fetch_jikan(request_url: str, client: httpx.AsyncClient, params: dict = None) -> httpx.Response:
-    from src.app import app_logger
+from src import config
+from src.tools.profiling import profiled, span
+
+
+class RateLimiter:
+    """
+    Token bucket for upstream calls. Jikan allows 3 requests/second and 60/minute,
+    so the bucket holds 3 tokens (burst) and refills 1 token per second.
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> float:
+        self.refill()
+        return self.tokens
+
+    def has_budget(self, reserve: int = 0) -> bool:
+        """True when nobody is waiting for a token and there are tokens to spare beyond reserve"""
+        return not self.lock.locked() and self.available() >= reserve + 1
+
+    def can_spare(self, reserve: int) -> bool:
+        """
+        Whether even a full bucket has a token beyond reserve. Not the case with several workers
+        on a small JIKAN_BURST (a worker's bucket can hold a single token): background jobs don't run then
+        """
+        return self.burst >= reserve + 1
+
+    async def acquire(self):
+        # lock keeps callers in arrival order while they wait for a token
+        async with self.lock:
+            self.refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.refill()
+            self.tokens -= 1
+
+# per process: with several workers each one gets its share of the upstream budget
+jikan_limiter = RateLimiter(rate=config.JIKAN_RATE / config.WORKERS, burst=max(1, config.JIKAN_BURST // config.WORKERS))
+
+
+
+@profiled("fetch_jikan")
+async def fetch_jikan(request_url: str, client: httpx.AsyncClient, params: dict = None, headers: dict = None,
+                      logger: logging.Logger | None = None) -> httpx.Response:
+    """
+    headers: conditional request validators (If-None-Match/If-Modified-Since). A 304 comes back as is, without a body
+    logger: the API's by default. Jobs that run next to it (ingest) pass theirs, importing src.app would truncate its log
+    """
+    if logger is None:
+        from src.app import app_logger as logger
 
     try:
-        response = await client.get(url=request_url, params=params)
+        with span("rate_limit"):
+            await jikan_limiter.acquire()
+        with span("upstream"):
+            response = await client.get(url=request_url, params=params, headers=headers)
+        if response.status_code == 304:
+            logger.info(f"Not modified! {response.url} | HTTPStatus: 304")
+            return response
+
         json_response = response.json()
         response.raise_for_status()
 
         if isinstance(json_response, dict) and "status" in json_response and json_response.get("status", 200) >= 400:
-            app_logger.warning(f"Fetch failed! {request_url} | HTTPStatus: {json_response["status"]}")
+            logger.warning(f"Fetch failed! {request_url} | HTTPStatus: {json_response["status"]}")
             raise HTTPException(status_code=json_response.get("status", 400))
-        
-        app_logger.info(f"Fetch successful! {response.url} | HTTPStatus: {response.status_code}")
+
+        logger.info(f"Fetch successful! {response.url} | HTTPStatus: {response.status_code}")
 
         return response
-    
+
     except httpx.HTTPStatusError as e:
-            app_logger.error(f"Upstream HTTP Error: {e.response.status_code}")
+            logger.error(f"Upstream HTTP Error: {e.response.status_code}")
             raise HTTPException(status_code=e.response.status_code, detail="Jikan Server Error",)
\ No newline at end of file
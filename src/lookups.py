@@ -1,38 +1,93 @@
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+
+from src import config
+from src.cache.budgets import track
+from src.cache.redis_health import redis_health
 from src.dependencies.services import ServiceProvider
 from src.jikan import fetch_jikan
+from src.tools.profiling import profiled
 
 """LOOKUP FOR ONLY GENRE"""
 """TODO: Add lookup for producers. Tweak this function so it's using the same function"""
 
+# in-process copy of every table this worker fetched, for when Redis is degraded. Genres barely ever change
+local_lookups: dict[str, dict[str, int]] = {}
+
+
+@profiled("lookup")
 async def paramsID_lookup(param_string: list[str], services: ServiceProvider, lookup_name: str) -> list[int] | None:
     from src.app import app_logger
 
     look_ups = {
-        "lookup:genres:manga":"https://api.jikan.moe/v4/genres/anime",
-        "lookup:genres:anime":"https://api.jikan.moe/v4/genres/manga"
+        "lookup:genres:anime":f"{config.JIKAN_BASE_URL}/genres/anime",
+        "lookup:genres:manga":f"{config.JIKAN_BASE_URL}/genres/manga"
     }
 
     redis = services.redis
     client = services.client
     
     table_name = f"lookup:{lookup_name}"
-    lookup_exists = await redis.exists(table_name)
-    if not lookup_exists:
-        app_logger.info(f"Genre lookup table not found")
+    if redis_health.degraded:
+        return await local_lookup(param_string=param_string, services=services, table_name=table_name, url=look_ups[table_name])
+
+    async def fetch_lookup():
         req_url = look_ups[table_name]
         fresh_lookup = await fetch_jikan(request_url=req_url, client=client)
         new_lookup = fresh_lookup.json()["data"]
+        local_lookups[table_name] = {i["name"].lower(): i["mal_id"] for i in new_lookup}
         for i in new_lookup:
             k: str = i["name"]
             v: int = i["mal_id"]
 
             await redis.hsetnx(name=table_name, key=k.lower(), value=v)
             await redis.expire(name=table_name, time=10000)
+        async with redis.pipeline(transaction=False) as pipe:
+            track(pipe, "lookups", table_name, size=sum(len(k) + len(str(v)) for k, v in local_lookups[table_name].items()))
+            await pipe.execute()
         app_logger.info(f"Fetched and cached genre lookup")
 
-    params_int = []
-    for ps in param_string:
-        id = await redis.hget(name=table_name, key=ps.lower())
-        params_int.append(int(id))
+    try:
+        lookup_exists = await redis.exists(table_name)
+        if not lookup_exists:
+            app_logger.info(f"Genre lookup table not found")
+
+            # concurrent requests (ex: a batch) with a cold table fetch it only once
+            from src.request_handlers import req_collapser
+            await req_collapser.run(table_name, fetch_lookup)
+
+        # one round trip for every genre in the request
+        ids = await redis.hmget(table_name, [ps.lower() for ps in param_string])
+    except RedisError as e:
+        redis_health.trip(repr(e))
+        return await local_lookup(param_string=param_string, services=services, table_name=table_name, url=look_ups[table_name])
+    return resolve_ids(param_string, ids)
+
+
+
+async def local_lookup(param_string: list[str], services: ServiceProvider, table_name: str, url: str) -> list[int]:
+    """Redis is degraded: resolve from local_lookups, fetching the table from Jikan (once) if this worker never had it"""
+
+    if table_name not in local_lookups:
+        async def fetch_local():
+            fresh_lookup = await fetch_jikan(request_url=url, client=services.client)
+            local_lookups[table_name] = {i["name"].lower(): i["mal_id"] for i in fresh_lookup.json()["data"]}
+
+        from src.request_handlers import req_collapser
+        await req_collapser.run(f"local:{table_name}", fetch_local)
+
+    table = local_lookups[table_name]
+    return resolve_ids(param_string, [table.get(ps.lower()) for ps in param_string])
+
+
+
+def resolve_ids(param_string: list[str], ids: list) -> list[int]:
+    from src.app import app_logger
+
+    unknown = [ps for ps, id in zip(param_string, ids) if id is None]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown genre/s: {", ".join(unknown)}")
+
+    params_int = [int(id) for id in ids]
     app_logger.info(f"String genres converted to int mal_id")
     return params_int
@@ -1,22 +1,65 @@
 import asyncio
+import contextlib
+import functools
 import json
-from typing import Awaitable, Dict, Callable
+import os
+import socket
+import time
+from typing import AsyncIterator, Awaitable, Dict, Callable
 
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
 import httpx
-from src.cache.redis_database import get_cache_level
-from src.data.schemas import AnimeParams, MangaParams
+from redis.exceptions import RedisError
+
+from src.cache.codec import codec
+from src.cache.feeds import canned_feeds
+from src.cache.budgets import page_class, track
+from src.cache.http_variants import build_variants, cache_headers, content_encoding_header, decode_variant, etag_matches, pick_encoding
+from src.cache.local_cache import local_cache
+from src.cache.negative import negative_cache, negative_result
+from src.cache.prefetch import prefetcher
+from src.cache.redis_database import content_hash, entry_fresh_ttl, fresh_ttl, get_cache_level, get_fresh
+from src.cache.redis_health import redis_health
+from src.cache.rollups import hotness_rollups
+from src.data.schemas import AnimeParams, AnimeQuery, MangaParams, MangaQuery
+from src import config
 from src.dependencies.services import ServiceProvider
 from src.jikan import fetch_jikan
 from src.lookups import paramsID_lookup
+from src.tools.background import BackgroundJobs
 from src.tools.crafters import craft_key
+from src.tools.profiling import profiled, span
 
-class RequestCollapser:
+COLLAPSE_CHANNEL = "collapse:done"
+
+
+class RequestCollapser(BackgroundJobs):
+    """
+    Concurrent callers of the same request share one fetch. In process: one future per request_name.
+    Across workers, for callers that pass shared_read (Redis healthy, start() called): the collapse:{name}
+    lock picks the worker that fetches. The others wait for its message on COLLAPSE_CHANNEL (one
+    subscription per worker) and read what it cached. No message within COLLAPSE_WAIT, or nothing
+    cached (ex: its fetch failed), and they fetch themselves.
+    """
     def __init__(self):
+        super().__init__()
         self.pendings: dict[str, asyncio.Future] = {}
+        self.fetches: set[asyncio.Task] = set()
         self.lock = asyncio.Lock()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.remote: dict[str, list[asyncio.Future]] = {}      # request_name -> callers waiting on another worker's fetch
+        self.listening = False
+
 
-    async def run(self, request_name: str, fetch_fun: Callable[[], Awaitable[dict]]):
+    def jobs(self, services: ServiceProvider):
+        return [self.listener(services)]
+
+    async def on_stop(self, services: ServiceProvider):
+        self.listening = False
+
+
+    async def run(self, request_name: str, fetch_fun: Callable[[], Awaitable[dict]],
+                  shared_read: Callable[[], Awaitable[dict | None]] | None = None):
 
         # lock to avoid two concurrent request intertwining
         # lock is saying "only one request at a time"
@@ -34,48 +77,260 @@ class RequestCollapser:
                 # wait for future to be set instead
 
 
-        if creator:
+        # the fetch task inherits the span: a profile shows the fetch under the leader, a bare wait elsewhere
+        with span("collapse:leader" if creator else "collapse:wait"):
+            if creator:
+                if shared_read is not None and self.listening and not redis_health.degraded:
+                    fetch_fun = functools.partial(self.fetch_shared, request_name, fetch_fun, shared_read)
+                # the fetch runs in its own task so a cancelled creator (ex: closed stream) can't leave waiters hanging
+                task = asyncio.create_task(self.resolve(request_name, future, fetch_fun))
+                self.fetches.add(task)
+                task.add_done_callback(self.fetches.discard)
+
+            # use the one future for all requests
+            # shielded: cancelling one caller must not cancel the future everyone else waits on
+            return await asyncio.shield(future)
+
+    async def resolve(self, request_name: str, future: asyncio.Future, fetch_fun: Callable[[], Awaitable[dict]]):
+        try:
+            result = await fetch_fun()
+            future.set_result(result)   # sets waiting requests free with a future value
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            async with self.lock:
+                self.pendings.pop(request_name, None) # must be removed after process
+
+
+    async def fetch_shared(self, request_name: str, fetch_fun: Callable[[], Awaitable[dict]],
+                           shared_read: Callable[[], Awaitable[dict | None]]) -> dict:
+        """This worker's collapsed fetch, collapsed with the other workers' too"""
+        redis = self.services.redis
+        lock_key = f"collapse:{request_name}"
+        try:
+            leader = await redis.set(lock_key, self.worker_id, nx=True, ex=config.COLLAPSE_WAIT)
+        except RedisError as e:
+            redis_health.trip(repr(e))
+            return await fetch_fun()
+
+        if leader:
+            try:
+                return await fetch_fun()
+            finally:
+                # done or failed, the waiting workers look at the cache either way
+                try:
+                    async with redis.pipeline(transaction=False) as pipe:
+                        pipe.delete(lock_key)
+                        pipe.publish(COLLAPSE_CHANNEL, request_name)
+                        await pipe.execute()
+                except RedisError as e:
+                    redis_health.trip(repr(e))
+
+        # registered before the lock is checked again: the leader's message can't slip in between
+        waiter = asyncio.get_running_loop().create_future()
+        self.remote.setdefault(request_name, []).append(waiter)
+        result = None
+        try:
+            with span("collapse:remote"):
+                if await redis.exists(lock_key):
+                    with contextlib.suppress(TimeoutError):
+                        await asyncio.wait_for(waiter, config.COLLAPSE_WAIT)
+            result = await shared_read()
+        except RedisError as e:
+            redis_health.trip(repr(e))
+        finally:
+            waiters = self.remote.get(request_name, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+            if not waiters:
+                self.remote.pop(request_name, None)
+        return result if result is not None else await fetch_fun()
+
+
+    async def listener(self, services: ServiceProvider):
+        """The worker's one subscription: wakes up whoever waits on the fetch another worker just finished"""
+        from src.app import app_logger
+
+        while True:
+            pubsub = services.redis.pubsub()
             try:
-                result = await fetch_fun()
-                future.set_result(result)   # sets waiting requests free with a future value
+                await pubsub.subscribe(COLLAPSE_CHANNEL)
+                self.listening = True
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        for waiter in self.remote.pop(message["data"].decode(), []):
+                            if not waiter.done():
+                                waiter.set_result(None)
+            except RedisError as e:
+                redis_health.trip(repr(e))
             except Exception as e:
-                future.set_exception(e)
+                app_logger.warning(f"Collapse listener failed! {e!r}")
             finally:
-                async with self.lock:
-                    self.pendings.pop(request_name, None) # must be removed after process
-
-        # use the one future for all requests
-        return await future
+                # messages can be missed from here on: waiters would sit out COLLAPSE_WAIT, don't make any
+                self.listening = False
+                with contextlib.suppress(Exception):
+                    await pubsub.aclose()
+            await asyncio.sleep(1)
 
 req_collapser = RequestCollapser()
 
 
 
+# media type is taken from the params model so anime and manga share the same pipeline
+MEDIA_TYPES: dict[type, str] = {
+    AnimeParams: "anime",
+    MangaParams: "manga",
+}
+
+
 """
-TODO: Make this request accept both AnimeParams or MangaParams flexibly
 TODO: Return and cache filtered data. Do not return everything.
     ex: 10 per page, filtered "data":{}
 
 
 """
-async def reco_request_handler(params: AnimeParams | MangaParams, services: ServiceProvider) -> dict:
-    
+@profiled("build_query")
+async def build_query(params: AnimeParams | MangaParams, services: ServiceProvider) -> dict:
+    """Resolve lookups and craft the canonical query. Page number is NOT part of it"""
 
-    from src.app import app_logger
+    media = next(media for model, media in MEDIA_TYPES.items() if isinstance(params, model))
 
-    JIKAN_BASE_URL = "https://api.jikan.moe/v4"
-    request_url = f"{JIKAN_BASE_URL}/anime"
+    request_url = f"{config.JIKAN_BASE_URL}/{media}"
 
-    parsed_params = params.model_dump(mode="json", exclude_none=True)
+    # page is never part of the canonical query (only AnimeQuery/MangaQuery have it)
+    parsed_params = params.canonical_params()
     genres = parsed_params.get("genres", None)
     
     if genres:
-        genres_int = await paramsID_lookup(param_string=genres, services=services, lookup_name="genres:anime")
+        genres_int = await paramsID_lookup(param_string=genres, services=services, lookup_name=f"genres:{media}")
         if genres_int:
             parsed_params["genres"] = ",".join(map(str, genres_int))
 
     
-    request_name = f"{request_url}?{craft_key(parsed_params)}"
+    # media is the cache namespace. every key below is derived from request_name
+    request_name = f"{media}|{request_url}?{craft_key(parsed_params)}"
+
+    return {"media": media, "request_url": request_url, "params": parsed_params, "request_name": request_name}
+
+
+
+@profiled("param_hotness")
+async def track_param_hotness(query: dict, services: ServiceProvider) -> dict:
+    """Counted once per client request, no matter how many pages it spans"""
+
+    from src.app import app_logger
+
+    redis = services.redis
+
+    # long-term counts are local until flushed, they don't depend on Redis
+    for param in param_hotness_keys(query):
+        hotness_rollups.note("params", f"{query["media"]}|{param}")
+
+    # bookkeeping is the first thing dropped when Redis is struggling
+    if redis_health.degraded:
+        return {}
+
+    # Create hotness cache for each priority params to track hotness
+    hot_params = {}
+    try:
+        for param, hot_cache_name in param_hotness_keys(query).items():
+            val = await redis.incr(name=hot_cache_name)
+            await redis.expire(hot_cache_name, 60)
+            hot_params[param] = count = int(val)
+            app_logger.info(f"{hot_cache_name} - [{count}] cached!")
+    except RedisError as e:
+        redis_health.trip(repr(e))
+        return {}
+
+    return hot_params
+
+
+
+CACHE_PRIORITIES = ("status", "order_by", "genres", "type", "rating")
+
+def param_hotness_keys(query: dict) -> dict[str, str]:
+    """"cp:value" -> param_hotness key, for every priority param the query has"""
+    parsed_params = query["params"]
+    keys = {}
+    for cp in CACHE_PRIORITIES:                                  # cp for cache_priority
+        v_priority = parsed_params.get(cp)
+        if v_priority is not None:
+            keys[f"{cp}:{v_priority}"] = f"param_hotness|{query["media"]}|{cp}:{v_priority}"
+    return keys
+
+
+
+async def page_request_handler(query: dict, hot_params: dict, services: ServiceProvider, page: int = 1) -> dict:
+    """One page of the canonical query. Each page is its own cache entry, hotness counter and collapsed fetch"""
+
+    request_name = f"{query["request_name"]}page:{page}|"
+    with span("negative_lookup"):
+        negative = await negative_cache.lookup(request_name, services)
+    if negative is not None:
+        return negative_result(negative)
+
+    request_hotness = await track_request_hotness(request_name=request_name, services=services)
+    if redis_health.degraded:
+        return await degraded_page(query=query, services=services, page=page)
+
+    try:
+        result = await load_page(query=query, hot_params=hot_params, request_hotness=request_hotness, services=services, page=page)
+    except RedisError as e:
+        redis_health.trip(repr(e))
+        return await degraded_page(query=query, services=services, page=page)
+
+    # hot pages are what the prefetcher keeps warm (and what it reads ahead from)
+    prefetcher.note(query=query, page=page, hot_params=hot_params, request_hotness=request_hotness, result=result)
+    return result
+
+
+
+@profiled("degraded_page")
+async def degraded_page(query: dict, services: ServiceProvider, page: int = 1) -> dict:
+    """
+    Redis is degraded: serve from the in-process tier, else straight from Jikan (still collapsed and
+    rate limited). Nothing is written to Redis. If Jikan fails too, a stale local copy is better than an error
+    """
+
+    from src.app import app_logger
+
+    request_name = f"{query["request_name"]}page:{page}|"
+    cached = local_cache.get(request_name)
+    data = codec.decode(cached) if cached else None
+    if data is not None:
+        app_logger.info("local cache hit! (redis degraded)")
+        return data
+
+    async def fetch_direct() -> dict:
+        try:
+            jikan_response = await fetch_jikan(request_url=query["request_url"], client=services.client, params={**query["params"], "page": page})
+        except HTTPException as e:
+            await negative_cache.add_error(request_name, e, services)
+            raise
+        data_response = jikan_response.json()
+        cache_status: dict = await get_cache_level({}, 0, data_response)
+        local_cache.set(request_name, jikan_response.content, config.LOCAL_CACHE_TTL, page_class(cache_status, data_response))
+        if not data_response.get("data"):
+            await negative_cache.add_empty(request_name, data_response, cache_status["ttl"], services)
+        return data_response
+
+    try:
+        return await req_collapser.run(f"local:{request_name}", fetch_direct)
+    except HTTPException:
+        stale = local_cache.get(request_name, allow_stale=True)
+        stale_data = codec.decode(stale) if stale else None
+        if stale_data is None:
+            raise
+        app_logger.warning(f"Serving stale local copy! {request_name}")
+        return stale_data
+
+
+
+@profiled("request_hotness")
+async def track_request_hotness(request_name: str, services: ServiceProvider) -> int:
+
+    from src.app import app_logger
 
     redis = services.redis
     
@@ -83,61 +338,92 @@ async def reco_request_handler(params: AnimeParams | MangaParams, services: Serv
     """
     TODO: Suggestion to cache this inside fetch_jikan()
     """
+    hotness_rollups.note("pages", request_name)
+    if redis_health.degraded:
+        return 0
+
     hotness_key = f"hot_request|{request_name}"
-    temp = await redis.incr(name=hotness_key)
-    # temp = await redis.get(name=hotness_key)
-    request_hotness = int(temp)
-    if temp == 1:
-        await redis.expire(hotness_key, 60)
+    try:
+        temp = await redis.incr(name=hotness_key)
+        # temp = await redis.get(name=hotness_key)
+        request_hotness = int(temp)
+        if temp == 1:
+            await redis.expire(hotness_key, 60)
+    except RedisError as e:
+        redis_health.trip(repr(e))
+        return 0
     app_logger.info(f"{hotness_key} - [{request_hotness}] request counter cached")
+    return request_hotness
 
 
 
-    cache_priorities = {"status", "order_by", "genres", "type", "rating"}
-    # Create hotness cache for each priority params to track hotness
-    hot_params = {}
-    for cp in cache_priorities:
-        v_priority = parsed_params.get(cp)
-        hot_cache_name = f"param_hotness|anime|{cp}:{v_priority}"
-        if v_priority is not None:                               # cp for cache_priority
-            val = await redis.incr(name=hot_cache_name)
-            await redis.expire(hot_cache_name, 60)
-            hot_params[f"{cp}:{v_priority}"] = count = int(val)
-            app_logger.info(f"{hot_cache_name} - [{count}] cached!")
+@profiled("load_page")
+async def load_page(query: dict, hot_params: dict, request_hotness: int, services: ServiceProvider, page: int = 1) -> dict:
+
+    from src.app import app_logger
+
+    request_name = f"{query["request_name"]}page:{page}|"
+
+    redis = services.redis
+
+    # canned feeds (src/cache/feeds.py) are kept materialized, the generic path is only a fallback for them
+    if request_name in canned_feeds.specs:
+        with span("feed"):
+            feed_data = await canned_feeds.serve(redis, request_name)
+        if feed_data is not None:
+            app_logger.info("feed hit!")
+            return feed_data
         
     
     # l1_cache : Longer TTL
     # l2_cache : Shorter TTL (still redis)
     
-    l1_cache = await redis.get(f"l1:{request_name}")
+    l1_cache, l1_ttl = await get_fresh(redis, f"l1:{request_name}")
     """
     TODO: L1 should be blazing fast local cache. But not for now
     """
-    if l1_cache:
+    # undecodable (ex: written with a zstd dictionary this worker doesn't have) counts as a miss
+    with span("decode"):
+        l1_data = codec.decode(l1_cache) if l1_cache else None
+    if l1_data is not None:
         app_logger.info("l1 cache hit!")
         cache_status: dict = await get_cache_level(hot_params=hot_params, request_hotness=request_hotness)
         cache_key: str = f"{cache_status["layer"]}:{request_name}"
-        cache_ttl: int = cache_status["ttl"]
-        await redis.setnx(name=cache_key, value=l1_cache)
-        await redis.expire(name=cache_key, time=cache_ttl)
+        # the entry keeps the freshness it was written with, hits don't extend it (see src/cache/freshness.py)
+        cache_ttl: int = fresh_ttl(l1_ttl)
+        cache_class: str = page_class(cache_status, l1_data)
+        async with redis.pipeline(transaction=False) as pipe:
+            if cache_key != f"l1:{request_name}":
+                pipe.set(name=cache_key, value=l1_cache, ex=l1_ttl, nx=True)
+            track(pipe, cache_class, cache_key, size=len(l1_cache), hotness=request_hotness)
+            await pipe.execute()
+        local_cache.set(request_name, l1_cache, cache_ttl, cache_class)
         app_logger.info(f"Cached! || key: ({cache_key}) | ttl: ({cache_ttl})")
-        return json.loads(l1_cache)
+        return l1_data
     app_logger.info("l1 cache miss")
 
 
 
 
-    l2_cache = await redis.get(f"l2:{request_name}")
+    l2_cache, l2_ttl = await get_fresh(redis, f"l2:{request_name}")
+    with span("decode"):
+        l2_data = codec.decode(l2_cache) if l2_cache else None
 
-    if l2_cache:
+    if l2_data is not None:
         app_logger.info("l2 cache hit!")
         cache_status: dict = await get_cache_level(hot_params=hot_params, request_hotness=request_hotness)
         cache_key: str = f"{cache_status["layer"]}:{request_name}"
-        cache_ttl: int = cache_status["ttl"]
-        await redis.setnx(name=cache_key, value=l2_cache)
-        await redis.expire(name=cache_key, time=cache_ttl)
+        # the entry keeps the freshness it was written with, hits don't extend it (see src/cache/freshness.py)
+        cache_ttl: int = fresh_ttl(l2_ttl)
+        cache_class: str = page_class(cache_status, l2_data)
+        async with redis.pipeline(transaction=False) as pipe:
+            if cache_key != f"l2:{request_name}":
+                pipe.set(name=cache_key, value=l2_cache, ex=l2_ttl, nx=True)
+            track(pipe, cache_class, cache_key, size=len(l2_cache), hotness=request_hotness)
+            await pipe.execute()
+        local_cache.set(request_name, l2_cache, cache_ttl, cache_class)
         app_logger.info(f"Cached! || key: ({cache_key}) | ttl: ({cache_ttl})")
-        return json.loads(l2_cache)
+        return l2_data
     app_logger.info("l2 cache miss")
     
 
@@ -145,39 +431,505 @@ async def reco_request_handler(params: AnimeParams | MangaParams, services: Serv
 
     # Last resort (l1 and l2 miss)
     # Collapse request: If many received for the same request, one computes/fetches, others wait.
+    return await collapsed_fetch(query=query, hot_params=hot_params, request_hotness=request_hotness, services=services, page=page)
+
+
+
+async def collapsed_fetch(query: dict, hot_params: dict, request_hotness: int, services: ServiceProvider, page: int = 1) -> dict:
+    """fetch_page through req_collapser: one fetch per page for every concurrent caller, on every worker"""
+    request_name = f"{query["request_name"]}page:{page}|"
+    return await req_collapser.run(
+        request_name,
+        lambda: fetch_page(query=query, hot_params=hot_params, request_hotness=request_hotness, services=services, page=page),
+        shared_read=lambda: read_page(services.redis, request_name),
+    )
+
+
+async def read_page(redis, request_name: str) -> dict | None:
+    """The page's fresh cache entry, whichever layer has it. For a worker that waited on another one's fetch"""
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.get(f"l1:{request_name}").ttl(f"l1:{request_name}")
+        pipe.get(f"l2:{request_name}").ttl(f"l2:{request_name}")
+        l1_value, l1_ttl, l2_value, l2_ttl = await pipe.execute()
+    for value, ttl in ((l1_value, l1_ttl), (l2_value, l2_ttl)):
+        data = codec.decode(value) if value and fresh_ttl(ttl) > 0 else None
+        if data is not None:
+            return data
+    return None
+
 
-    # define fetch function. Will be called by the 'creator'. First to request
-    async def fetch_fun():
-        try:
-            # inside fetch attempt/try
 
-            # exception likely to occur here
-            jikan_response: httpx.Response = await fetch_jikan(request_url=request_url, client=services.client, params=parsed_params)
+# Called by the 'creator' of a collapsed request (first to request), and by the prefetcher
+@profiled("fetch_page")
+async def fetch_page(query: dict, hot_params: dict, request_hotness: int, services: ServiceProvider, page: int = 1) -> dict:
+    """
+    Fetch and cache one page. If a (stale) entry is still around, the request is conditional:
+    - Jikan answers 304, or the body hashes the same as before -> the entry just gets its TTL back.
+      No value is re-serialized or rewritten and the HTTP variants stay valid
+    - otherwise the new value replaces it
+    Validators (upstream ETag/Last-Modified and the content hash) sit in validators:{request_name}.
+    """
+
+    from src.app import app_logger
+
+    request_url = query["request_url"]
+    request_name = f"{query["request_name"]}page:{page}|"
+    parsed_params = {**query["params"], "page": page}
+    validators_key = f"validators:{request_name}"
 
+    redis = services.redis
 
-            cache_status: dict = await get_cache_level(hot_params, request_hotness, jikan_response)
-            
-            cache_key: str = f"{cache_status["layer"]}:{request_name}"
-            cache_ttl: int = cache_status["ttl"]
-            
-            data_response: dict = jikan_response.json()
+    try:
+        # inside fetch attempt/try
+        try:
+            validators = {k.decode(): v.decode() for k, v in (await redis.hgetall(validators_key)).items()}
+        except RedisError as e:
+            redis_health.trip(repr(e))
+            validators = {}
+        conditional_headers = {}
+        if validators.get("etag"):
+            conditional_headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            conditional_headers["If-Modified-Since"] = validators["last_modified"]
+
+        # exception likely to occur here
+        jikan_response: httpx.Response = await fetch_jikan(request_url=request_url, client=services.client, params=parsed_params, headers=conditional_headers)
+        not_modified = jikan_response.status_code == 304
+        new_hash = None if not_modified else content_hash(jikan_response.content)
+        with span("json"):
+            data_response: dict | None = None if not_modified else jikan_response.json()
+
+        if not_modified or new_hash == validators.get("content_hash"):
+            # unchanged: give the stale entry (whichever layer it's in) a fresh TTL, computed again from
+            # its titles (src/cache/freshness.py). A 304 has no body, the stale value stands in for it
+            async with redis.pipeline(transaction=False) as pipe:
+                l1_stale, l2_stale = await pipe.get(f"l1:{request_name}").get(f"l2:{request_name}").execute()
+            stale_value = l1_stale or l2_stale
+            data = data_response if data_response is not None else codec.decode(stale_value) if stale_value else None
+
+            if stale_value and data is not None:
+                cache_status: dict = await get_cache_level(hot_params, request_hotness, data)
+                cache_ttl: int = cache_status["ttl"]
+                stored_ttl: int = cache_ttl + config.REVALIDATE_GRACE
+                async with redis.pipeline(transaction=False) as pipe:
+                    pipe.expire(f"l1:{request_name}", stored_ttl)
+                    pipe.expire(f"l2:{request_name}", stored_ttl)
+                    pipe.expire(validators_key, stored_ttl)
+                    # same value, same HTTP variants: they're extended too, not rebuilt
+                    pipe.expire(f"http:{request_name}", stored_ttl)
+                    l1_extended, l2_extended, _, _ = await pipe.execute()
+
+                if l1_extended or l2_extended:
+                    app_logger.info(f"Revalidated, unchanged ({"304" if not_modified else "same hash"}) || key: ({request_name}) | ttl: ({cache_ttl})")
+                    local_cache.set(request_name, stale_value, cache_ttl, page_class(cache_status, data))
+                    return data
+            # the stale entry vanished in the meantime. 304 has no body to fall back on, refetch unconditionally
+            if not_modified:
+                await redis.delete(validators_key)
+                return await fetch_page(query=query, hot_params=hot_params, request_hotness=request_hotness, services=services, page=page)
+
+        cache_status: dict = await get_cache_level(hot_params, request_hotness, data_response)
+        cache_key: str = f"{cache_status["layer"]}:{request_name}"
+        cache_ttl: int = cache_status["ttl"]
+        stored_ttl: int = cache_ttl + config.REVALIDATE_GRACE
 
-            # cache if fetch successful
-            await redis.setnx(name=cache_key, value=json.dumps(data_response))
-            await redis.expire(name=cache_key, time=cache_ttl)
-            app_logger.info(f"Cached! || key: ({cache_key}) | ttl: ({cache_ttl})")
+        with span("encode"):
+            encoded: bytes = codec.encode(data_response)
+        cache_class: str = page_class(cache_status, data_response)
+        local_cache.set(request_name, encoded, cache_ttl, cache_class)
+        if cache_class == "negative":
+            await negative_cache.add_empty(request_name, data_response, cache_ttl, services)
 
-            # return to FIRST CALLER of the same request
+        # cache if fetch successful. plain SET so a prefetch refresh overwrites the old value
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.set(name=cache_key, value=encoded, ex=stored_ttl)
+                track(pipe, cache_class, cache_key, size=len(encoded), hotness=request_hotness, reclassify=True)
+                pipe.delete(validators_key)
+                pipe.hset(validators_key, mapping={
+                    "etag": jikan_response.headers.get("ETag", ""),
+                    "last_modified": jikan_response.headers.get("Last-Modified", ""),
+                    "content_hash": new_hash,
+                })
+                pipe.expire(validators_key, stored_ttl)
+                # HTTP variants (ETag, gzip/br) were built from the old value
+                pipe.delete(f"http:{request_name}")
+                await pipe.execute()
+        except RedisError as e:
+            # the upstream call is already paid for, don't throw its result away
+            redis_health.trip(repr(e))
             return data_response
-        except HTTPException:
-            raise
-        except httpx.HTTPStatusError:
-            raise
-        # except Exception:
-        #     raise HTTPException(status_code=404, detail="Unknown Error")
-        # General exception removed cuz it gets in the way of debugging
-    # request collapsing logic
-    return await req_collapser.run(request_name, fetch_fun)
+        app_logger.info(f"Cached! || key: ({cache_key}) | ttl: ({cache_ttl})")
+
+        # return to FIRST CALLER of the same request
+        return data_response
+    except HTTPException as e:
+        # cacheable upstream errors (ex: 400 for a bad query) aren't asked again for a while
+        await negative_cache.add_error(request_name, e, services)
+        raise
+    except httpx.HTTPStatusError:
+        raise
+    # except Exception:
+    #     raise HTTPException(status_code=404, detail="Unknown Error")
+    # General exception removed cuz it gets in the way of debugging
+
+
+
+async def reco_request_handler(params: AnimeParams | MangaParams, services: ServiceProvider, page: int = 1) -> dict:
+    query = await build_query(params=params, services=services)
+    # known empty/failing queries are answered before any bookkeeping
+    negative = await negative_cache.lookup(f"{query["request_name"]}page:{page}|", services)
+    if negative is not None:
+        return negative_result(negative)
+    hot_params = await track_param_hotness(query=query, services=services)
+    return await page_request_handler(query=query, hot_params=hot_params, services=services, page=page)
+
+
+
+MAX_STREAM_PAGES = 20
+
+async def reco_stream_handler(params: AnimeParams | MangaParams, services: ServiceProvider, pages: int) -> AsyncIterator[str]:
+    """
+    Builds the query before anything is streamed: a bad one (ex: unknown genre) is still a plain
+    HTTP error, once the response has started it could only be an error line. Returns the NDJSON lines
+    """
+    query = await build_query(params=params, services=services)
+    hot_params = await track_param_hotness(query=query, services=services)
+    return stream_pages(query=query, hot_params=hot_params, services=services, pages=pages)
+
+
+
+def stream_error(page: int, error: HTTPException | httpx.TransportError) -> str:
+    """The error line of a failed page. Jikan unreachable or too slow is what a proxy would answer: 502/504"""
+    if isinstance(error, HTTPException):
+        status_code, detail = error.status_code, error.detail
+    elif isinstance(error, httpx.TimeoutException):
+        status_code, detail = 504, "Jikan Timeout"
+    else:
+        status_code, detail = 502, "Jikan Unreachable"
+    return json.dumps({"page": page, "error": {"status_code": status_code, "detail": detail}}) + "\n"
+
+
+async def stream_pages(query: dict, hot_params: dict, services: ServiceProvider, pages: int) -> AsyncIterator[str]:
+    """
+    Yields one NDJSON line per page, in page order.
+    Page 1 goes first since it tells us the last page. The rest are fetched concurrently
+    (jikan_limiter keeps them within the rate limit) while page 1 is already on its way to the client.
+    A failed page is an error line and the stream goes on, except for page 1: without it there's no last page.
+    """
+
+    from src.app import app_logger
+
+    tasks: list[asyncio.Task] = []
+    try:
+        try:
+            first_page = await page_request_handler(query=query, hot_params=hot_params, services=services, page=1)
+        except (HTTPException, httpx.TransportError) as e:
+            yield stream_error(1, e)
+            return
+
+        last_page = min(pages, first_page.get("pagination", {}).get("last_visible_page", 1))
+        tasks = [
+            asyncio.create_task(page_request_handler(query=query, hot_params=hot_params, services=services, page=p))
+            for p in range(2, last_page + 1)
+        ]
+        app_logger.info(f"Streaming {last_page} page/s of {query["request_name"]}")
+
+        yield json.dumps({"page": 1, **first_page}) + "\n"
+
+        for page, task in enumerate(tasks, start=2):
+            try:
+                result = await task
+            except (HTTPException, httpx.TransportError) as e:
+                yield stream_error(page, e)
+                continue
+            yield json.dumps({"page": page, **result}) + "\n"
+    finally:
+        # client went away. collapsed fetches still finish and get cached
+        for task in tasks:
+            task.cancel()
+
 
 
+MAX_BATCH_SIZE = 20
+
+async def reco_batch_handler(params_list: list[AnimeParams] | list[MangaParams], services: ServiceProvider) -> list[dict]:
+    """
+    Page 1 of several queries in one go. Results come back in request order, one entry per item:
+        {"status_code": 200, "data": {...}} or {"status_code": 4xx/5xx, "detail": "..."}
+
+    - identical items are resolved once (before and after lookups)
+    - hotness bookkeeping and every l1/l2 read go out as one pipelined round trip each
+    - misses fan out concurrently through collapsed_fetch (and jikan_limiter inside fetch_jikan)
+    - Redis degraded: every query goes through degraded_page instead
+    - known empty/failing queries (negative_cache) are answered without any I/O
+    """
+
+    from src.app import app_logger
+
+    # 1. canonicalize. raw dedupe first (params are hashable) so repeated items don't repeat lookups
+    unique_params = list(dict.fromkeys(params_list))
+    built = await asyncio.gather(
+        *(build_query(params=params, services=services) for params in unique_params),
+        return_exceptions=True,
+    )
+    queries: dict[AnimeParams | MangaParams, dict | Exception] = dict(zip(unique_params, built))
+
+    # different raw params can still land on the same canonical query (ex: genre casing)
+    canonical: dict[str, dict] = {}
+    for query in queries.values():
+        if not isinstance(query, Exception):
+            canonical.setdefault(f"{query["request_name"]}page:1|", query)
+
+    # known empty/failing queries are answered right here, they take no part in the pipelines
+    negatives: dict[str, dict | Exception] = {}
+    for name in list(canonical):
+        negative = await negative_cache.lookup(name, services)
+        if negative is not None:
+            try:
+                negatives[name] = negative_result(negative)
+            except HTTPException as e:
+                negatives[name] = e
+            canonical.pop(name)
+    names = list(canonical)
+
+    # long-term counts, local until flushed (see src/cache/rollups.py)
+    for name, query in canonical.items():
+        hotness_rollups.note("pages", name)
+        for param in param_hotness_keys(query):
+            hotness_rollups.note("params", f"{query["media"]}|{param}")
+
+    # 2-4. Redis pipelines, or the local tier / Jikan when Redis is degraded
+    results: dict[str, dict | Exception] | None = None
+    if not redis_health.degraded:
+        try:
+            results = await batch_pages(canonical=canonical, services=services)
+        except RedisError as e:
+            redis_health.trip(repr(e))
+    if results is None:
+        fetched = await asyncio.gather(*(degraded_page(query=query, services=services) for query in canonical.values()), return_exceptions=True)
+        results = dict(zip(names, fetched))
+    results.update(negatives)
+
+    # 5. back in request order, per-item errors
+    batch = []
+    for params in params_list:
+        query = queries[params]
+        result = query if isinstance(query, Exception) else results[f"{query["request_name"]}page:1|"]
+        if isinstance(result, HTTPException):
+            batch.append({"status_code": result.status_code, "detail": result.detail})
+        elif isinstance(result, Exception):
+            app_logger.error(f"Batch item failed! {result!r}")
+            batch.append({"status_code": 500, "detail": "Internal Server Error"})
+        else:
+            batch.append({"status_code": 200, "data": result})
+    return batch
+
+
+
+async def batch_pages(canonical: dict[str, dict], services: ServiceProvider) -> dict[str, dict | Exception]:
+    """Page 1 of every canonical query of a batch: pipelined bookkeeping and reads, concurrent misses"""
+
+    from src.app import app_logger
 
+    redis = services.redis
+    names = list(canonical)
+
+    # 2. hotness bookkeeping, one pipeline
+    with span("hotness"):
+        async with redis.pipeline(transaction=False) as pipe:
+            for name, query in canonical.items():
+                pipe.incr(f"hot_request|{name}")
+                for hot_cache_name in param_hotness_keys(query).values():
+                    pipe.incr(hot_cache_name)
+                    pipe.expire(hot_cache_name, 60)
+            counters = iter(await pipe.execute())
+
+    request_hotness: dict[str, int] = {}
+    hot_params: dict[str, dict] = {}
+    for name, query in canonical.items():
+        request_hotness[name] = int(next(counters))
+        hot_params[name] = {}
+        for param in param_hotness_keys(query):
+            hot_params[name][param] = int(next(counters))
+            next(counters)
+
+    # canned feeds first, one pipeline. What they don't answer goes through the generic reads
+    results: dict[str, dict | Exception] = {}
+    feed_names = [name for name in names if name in canned_feeds.specs]
+    if feed_names:
+        with span("feed"):
+            results.update(await canned_feeds.serve_many(redis, feed_names))
+    reads = [name for name in names if name not in results]
+
+    # 3. every cache read, one pipeline
+    with span("cache_read"), redis_health.timed():
+        async with redis.pipeline(transaction=False) as pipe:
+            for name in reads:
+                pipe.get(f"l1:{name}").ttl(f"l1:{name}")
+                pipe.get(f"l2:{name}").ttl(f"l2:{name}")
+            cached = await pipe.execute()
+
+    hits: dict[str, tuple[str, bytes, int]] = {}      # name -> (key it was read from, value, its Redis TTL)
+    for i, name in enumerate(reads):
+        for layer, value, ttl in zip(("l1", "l2"), cached[4 * i:4 * i + 4:2], cached[4 * i + 1:4 * i + 4:2]):
+            # stale entries are misses, fetch_page revalidates them
+            data = codec.decode(value) if value and fresh_ttl(ttl) > 0 else None
+            if data is not None:
+                hits[name] = (f"{layer}:{name}", value, ttl)
+                results[name] = data
+                break
+    app_logger.info(f"Batch: {len(names)} unique, {len(names) - len(reads)} feed/s, {len(hits)} cache hit/s")
+
+    # new hotness counters get their window, hits get re-leveled like in load_page
+    async with redis.pipeline(transaction=False) as pipe:
+        for name in names:
+            if request_hotness[name] == 1:
+                pipe.expire(f"hot_request|{name}", 60)
+        for name, (source_key, value, ttl) in hits.items():
+            cache_status: dict = await get_cache_level(hot_params=hot_params[name], request_hotness=request_hotness[name])
+            cache_key: str = f"{cache_status["layer"]}:{name}"
+            cache_class: str = page_class(cache_status, results[name])
+            if cache_key != source_key:
+                pipe.set(name=cache_key, value=value, ex=ttl, nx=True)
+            track(pipe, cache_class, cache_key, size=len(value), hotness=request_hotness[name])
+            local_cache.set(name, value, fresh_ttl(ttl), cache_class)
+        await pipe.execute()
+
+    # 4. misses fan out concurrently
+    misses = [name for name in reads if name not in hits]
+    fetched = await asyncio.gather(
+        *(
+            collapsed_fetch(query=canonical[name], hot_params=hot_params[name], request_hotness=request_hotness[name], services=services, page=1)
+            for name in misses
+        ),
+        return_exceptions=True,
+    )
+    results.update(zip(misses, fetched))
+
+    for name in names:
+        if not isinstance(results[name], Exception):
+            prefetcher.note(query=canonical[name], page=1, hot_params=hot_params[name], request_hotness=request_hotness[name], result=results[name])
+    return results
+
+
+
+async def http_request_handler(params: AnimeQuery | MangaQuery, services: ServiceProvider,
+                               if_none_match: str | None, accept_encoding: str | None) -> Response:
+    """
+    Cacheable GET. Next to the cache entry sits an http:{request_name} hash holding its strong ETag
+    and pre-compressed bodies, built once per cache entry:
+    - If-None-Match matches -> 304, only the ETag is read (no payload, no Jikan)
+    - otherwise the stored gzip/br body is sent as is, nothing is compressed per request
+    While Redis is degraded the variants are built per request and not stored.
+    """
+
+    query = await build_query(params=params, services=services)
+    page = params.page
+    request_name = f"{query["request_name"]}page:{page}|"
+    encoding = pick_encoding(accept_encoding)
+
+    negative = await negative_cache.lookup(request_name, services)
+    if negative is not None:
+        return built_response(negative_result(negative), if_none_match=if_none_match, encoding=encoding, ttl=int(negative["expires_at"] - time.time()))
+
+    hot_params = await track_param_hotness(query=query, services=services)
+    request_hotness = await track_request_hotness(request_name=request_name, services=services)
+
+    if not redis_health.degraded:
+        try:
+            return await variants_response(query=query, hot_params=hot_params, request_hotness=request_hotness, services=services,
+                                           page=page, if_none_match=if_none_match, encoding=encoding)
+        except RedisError as e:
+            redis_health.trip(repr(e))
+
+    return built_response(await degraded_page(query=query, services=services, page=page), if_none_match=if_none_match, encoding=encoding, ttl=0)
+
+
+
+def built_response(data: dict, if_none_match: str | None, encoding: str, ttl: int) -> Response:
+    """Variants built for this one response and not stored (degraded Redis, negative cache)"""
+    variants = build_variants(data)
+    field = "gzip" if encoding == "identity" else encoding
+    etag = variants["etag"].decode()
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=cache_headers(etag, ttl))
+    return Response(
+        content=decode_variant(variants[field], encoding),
+        media_type="application/json",
+        headers={**cache_headers(etag, ttl), **content_encoding_header(encoding)},
+    )
+
+
+
+async def variants_response(query: dict, hot_params: dict, request_hotness: int, services: ServiceProvider,
+                            page: int, if_none_match: str | None, encoding: str) -> Response:
+    """http_request_handler with a healthy Redis: stored variants, built on a miss"""
+
+    from src.app import app_logger
+
+    redis = services.redis
+    request_name = f"{query["request_name"]}page:{page}|"
+
+    http_key = f"http:{request_name}"
+    field = "gzip" if encoding == "identity" else encoding      # identity is served from the gzip body
+
+    # conditional requests only need the ETag, don't pull the body
+    # variants expire with their entry (ttl is the stored one, see get_fresh): stale ones answer nothing before a revalidation
+    if if_none_match:
+        with span("etag_read"):
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hget(http_key, "etag")
+                pipe.ttl(http_key)
+                etag, ttl = await pipe.execute()
+        if etag is not None and fresh_ttl(ttl) > 0 and etag_matches(if_none_match, etag.decode()):
+            app_logger.info("ETag matched, 304")
+            return Response(status_code=304, headers=cache_headers(etag.decode(), fresh_ttl(ttl)))
+
+    with span("variants_read"):
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hmget(http_key, ["etag", field, "gzip"])
+            pipe.ttl(http_key)
+            (etag, body, gzip_body), ttl = await pipe.execute()
+    if body is None and gzip_body is not None:
+        # variants were built by a worker without brotli
+        encoding, field, body = "gzip", "gzip", gzip_body
+
+    if etag is None or body is None or fresh_ttl(ttl) <= 0:
+        app_logger.info("http variants miss")
+        result = await load_page(query=query, hot_params=hot_params, request_hotness=request_hotness, services=services, page=page)
+        prefetcher.note(query=query, page=page, hot_params=hot_params, request_hotness=request_hotness, result=result)
+
+        # stale variants whose entry just revalidated unchanged were extended along with it (fetch_page)
+        if etag is not None and body is not None:
+            ttl = await redis.ttl(http_key)
+        if etag is None or body is None or fresh_ttl(ttl) <= 0:
+            variants = build_variants(result)
+            # variants live exactly as long as the entry they were built from, grace included.
+            # a stored feed page (src/cache/feeds.py) has no l1/l2 entry, it's fresh until its next refresh
+            ttl = await entry_fresh_ttl(redis, request_name)
+            if request_name in canned_feeds.specs:
+                ttl = max(ttl, await canned_feeds.fresh_ttl(redis, request_name) or -1)
+            ttl += config.REVALIDATE_GRACE
+            if fresh_ttl(ttl) > 0:
+                cache_status: dict = await get_cache_level(hot_params=hot_params, request_hotness=request_hotness)
+                async with redis.pipeline(transaction=False) as pipe:
+                    pipe.hset(http_key, mapping=variants)
+                    pipe.expire(http_key, ttl)
+                    track(pipe, page_class(cache_status, result), http_key, size=sum(map(len, variants.values())), hotness=request_hotness)
+                    await pipe.execute()
+            etag, body = variants["etag"], variants[field]
+        else:
+            app_logger.info("http variants revalidated")
+    else:
+        app_logger.info("http variants hit!")
+
+    etag = etag.decode()
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=cache_headers(etag, fresh_ttl(ttl)))
+
+    return Response(
+        content=decode_variant(body, encoding),
+        media_type="application/json",
+        headers={**cache_headers(etag, fresh_ttl(ttl)), **content_encoding_header(encoding)},
+    )
@@ -0,0 +1,73 @@
+import asyncio
+import contextlib
+import os
+import socket
+from abc import ABC, abstractmethod
+from typing import Coroutine
+
+from src.cache.backend import CacheBackend
+from src.dependencies.services import ServiceProvider
+
+
+"""
+What the background jobs share: their task lifecycle, and the leader lock of the ones that run on one worker only.
+"""
+
+
+class BackgroundJobs(ABC):
+    """
+    start() runs jobs() as tasks, stop() cancels them and waits until they're done.
+    Subclasses with something to do on the way out (flush, release a lock) put it in on_stop: it runs
+    after the tasks are gone, and a failure there (ex: Redis down at shutdown) doesn't stop the shutdown.
+    """
+    def __init__(self):
+        self.services: ServiceProvider | None = None
+        self.tasks: list[asyncio.Task] = []
+
+
+    @abstractmethod
+    def jobs(self, services: ServiceProvider) -> list[Coroutine]:
+        """The coroutines start() runs as tasks"""
+
+    async def on_stop(self, services: ServiceProvider):
+        pass
+
+
+    def start(self, services: ServiceProvider):
+        self.services = services
+        self.tasks = [asyncio.create_task(job) for job in self.jobs(services)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        for task in self.tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self.tasks = []
+        if self.services is not None:
+            with contextlib.suppress(Exception):
+                await self.on_stop(self.services)
+            self.services = None
+
+
+
+class LeaderLock:
+    """One worker out of all of them (SET NX with a TTL). It expires on its own if the leader dies"""
+    def __init__(self, key: str, ttl: int):
+        self.key = key
+        self.ttl = ttl
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def acquire(self, redis: CacheBackend) -> bool:
+        """Takes the lock, or renews it if this worker already holds it"""
+        if await redis.set(self.key, self.worker_id, nx=True, ex=self.ttl):
+            return True
+        if await redis.get(self.key) == self.worker_id.encode():
+            await redis.expire(self.key, self.ttl)
+            return True
+        return False
+
+    async def release(self, redis: CacheBackend):
+        """Lets another worker take over right away instead of after the TTL. No-op if this worker isn't the leader"""
+        if await redis.get(self.key) == self.worker_id.encode():
+            await redis.delete(self.key)
@@ -2,4 +2,24 @@ def craft_key(params: dict):
     key = ""
     for k, v in params.items():
         key += f"{str(k)}:{str(v)}|"
-    return key
\ No newline at end of file
+    return key
+
+def parse_key(key: str) -> dict:
+    """Inverse of craft_key. Values come back as strings, order is kept so craft_key(parse_key(k)) == k"""
+    params = {}
+    for pair in key.split("|"):
+        if pair:
+            k, v = pair.split(":", 1)
+            params[k] = v
+    return params
+
+
+def parse_request_name(request_name: str) -> dict:
+    """Split a page request_name (see page_request_handler) back into what's needed to refetch it"""
+    media, rest = request_name.split("|", 1)
+    request_url, key = rest.split("?", 1)
+    params = parse_key(key)
+    page = int(params.pop("page", 1))
+    query = {"media": media, "request_url": request_url, "params": params,
+             "request_name": f"{media}|{request_url}?{craft_key(params)}"}
+    return {"query": query, "page": page}
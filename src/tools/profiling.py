@@ -0,0 +1,197 @@
+import contextlib
+import contextvars
+import functools
+import itertools
+import random
+import time
+from collections import deque
+
+from src import config
+from src.dependencies.admin import is_admin
+
+
+"""
+Opt-in request profiling. A profiled request records a tree of spans (lookups, hotness counters,
+cache reads, collapser waits, Jikan calls...): span("name") around a block, @profiled("name") on a
+coroutine function. Outside of a profiled request both are a ContextVar read and nothing else.
+
+A request is profiled when it sends `X-Profile: 1` or is sampled (PROFILE_SAMPLE_RATE).
+It's kept in this worker's flight recorder (last PROFILE_BUFFER_SIZE) when it took PROFILE_SLOW_MS
+or more, or when it asked to be profiled. Tasks started inside a request (gather, the collapser)
+inherit its context, so their spans land in the same tree.
+"""
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_HEADER = b"x-admin-token"
+
+
+class Span:
+    __slots__ = ("name", "started", "ended", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.ended: float | None = None
+        self.children: list[Span] = []
+
+    @property
+    def duration(self) -> float:
+        return (self.ended or time.perf_counter()) - self.started
+
+    def to_dict(self, origin: float) -> dict:
+        return {
+            "name": self.name,
+            "start_ms": round((self.started - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            "children": [child.to_dict(origin) for child in self.children],
+        }
+
+    def folded(self, prefix: str = ""):
+        """(stack, self time in µs) pairs. Concurrent children can add up to more than their parent: self time >= 0"""
+        stack = f"{prefix};{self.name}" if prefix else self.name
+        own = self.duration - sum(child.duration for child in self.children)
+        yield stack, max(0, round(own * 1_000_000))
+        for child in self.children:
+            yield from child.folded(stack)
+
+
+class Profile:
+    def __init__(self, profile_id: int, method: str, path: str, reason: str):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.reason = reason            # "header" or "sampled"
+        self.started_at = time.time()
+        self.root = Span(f"{method} {path}")
+        self.status_code: int | None = None
+        self.done = False
+
+    def finish(self, status_code: int):
+        self.root.ended = time.perf_counter()
+        self.status_code = status_code
+        self.done = True
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id, "method": self.method, "path": self.path, "status_code": self.status_code,
+            "reason": self.reason, "started_at": self.started_at, "duration_ms": round(self.root.duration * 1000, 3),
+        }
+
+    def to_dict(self) -> dict:
+        return {**self.summary(), "spans": self.root.to_dict(self.root.started)}
+
+
+# (profile, innermost open span) of the request being handled, None when it isn't profiled
+current: contextvars.ContextVar[tuple[Profile, Span] | None] = contextvars.ContextVar("profile", default=None)
+
+
+@contextlib.contextmanager
+def span(name: str):
+    state = current.get()
+    # finished profile: a task that outlived its request (ex: a collapsed fetch whose caller left)
+    if state is None or state[0].done:
+        yield
+        return
+    profile, parent = state
+    child = Span(name)
+    parent.children.append(child)
+    token = current.set((profile, child))
+    try:
+        yield
+    finally:
+        child.ended = time.perf_counter()
+        current.reset(token)
+
+
+def profiled(name: str):
+    """Decorator: the whole coroutine is one span"""
+    def decorator(fun):
+        @functools.wraps(fun)
+        async def wrapper(*args, **kwargs):
+            if current.get() is None:
+                return await fun(*args, **kwargs)
+            with span(name):
+                return await fun(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+
+class FlightRecorder:
+    def __init__(self, sample_rate: float, slow_seconds: float, size: int):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.profiles: deque[Profile] = deque(maxlen=size)
+        self.ids = itertools.count(1)
+
+    def begin(self, method: str, path: str, requested: bool) -> contextvars.Token | None:
+        """Profile this request? Returns the token to pass to end(), None if not"""
+        if requested:
+            reason = "header"
+        elif self.sample_rate and random.random() < self.sample_rate:
+            reason = "sampled"
+        else:
+            return None
+        profile = Profile(next(self.ids), method, path, reason)
+        return current.set((profile, profile.root))
+
+    def end(self, token: contextvars.Token, status_code: int) -> Profile:
+        profile, _ = current.get()
+        current.reset(token)
+        profile.finish(status_code)
+        if profile.reason == "header" or profile.root.duration >= self.slow_seconds:
+            self.profiles.append(profile)
+        return profile
+
+    def get(self, profile_id: int) -> Profile | None:
+        return next((profile for profile in self.profiles if profile.id == profile_id), None)
+
+    def folded(self, profiles: list[Profile]) -> str:
+        """Folded stacks (flamegraph.pl, speedscope, inferno), same stacks summed across profiles"""
+        totals: dict[str, int] = {}
+        for profile in profiles:
+            for stack, micros in profile.root.folded():
+                totals[stack] = totals.get(stack, 0) + micros
+        return "".join(f"{stack} {micros}\n" for stack, micros in totals.items() if micros)
+
+flight_recorder = FlightRecorder(
+    sample_rate=config.PROFILE_SAMPLE_RATE,
+    slow_seconds=config.PROFILE_SLOW_MS / 1000,
+    size=config.PROFILE_BUFFER_SIZE,
+)
+
+
+
+class ProfilingMiddleware:
+    """
+    Plain ASGI (no per-request task like @app.middleware has): profiled or not is decided per request,
+    the profile covers the whole response, streamed bodies included. Profiled responses carry X-Profile-Id
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # on demand profiling costs span overhead and fills the recorder: admins only
+        headers = dict(scope["headers"])
+        requested = headers.get(PROFILE_HEADER, b"").lower() in (b"1", b"true", b"yes") and is_admin(headers.get(ADMIN_HEADER))
+        token = flight_recorder.begin(scope["method"], scope["path"], requested)
+        if token is None:
+            return await self.app(scope, receive, send)
+
+        profile, _ = current.get()
+        status_code = 500
+
+        async def send_with_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", str(profile.id).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            flight_recorder.end(token, status_code)
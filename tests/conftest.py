@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from bin.fake_jikan import create_app
+from src import config, lookups
+from src.cache.feeds import CannedFeeds, canned_feeds
+from src.cache.local_cache import LocalCache, local_cache
+from src.cache.memory_backend import MemoryBackend
+from src.cache.negative import NegativeCache, negative_cache
+from src.cache.prefetch import Prefetcher, prefetcher
+from src.cache.redis_health import RedisHealth, redis_health
+from src.cache.rollups import HotnessRollups, hotness_rollups
+from src.cache.warmup import CacheWarmup, warmup
+from src.dependencies.services import ServiceProvider
+from src.jikan import jikan_limiter
+from src.request_handlers import RequestCollapser, req_collapser
+from src.tools.profiling import FlightRecorder, flight_recorder
+
+
+# async tests run on anyio's pytest plugin (@pytest.mark.anyio), asyncio only: that's what the app runs on
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+
+class Upstream(httpx.ASGITransport):
+    """
+    bin/fake_jikan.py in process (no socket). Records every search request it gets.
+    failures: page -> status code Jikan answers instead, or exception the transport raises (unreachable, timeout)
+    etags: False = an upstream that never answers 304, so revalidation has to go by content hash
+    """
+    def __init__(self, size: int = 200):
+        super().__init__(app=create_app(size=size))
+        self.searches: list[httpx.Request] = []
+        self.failures: dict[int, int | Exception] = {}
+        self.etags = True
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.startswith("/v4/genres/"):
+            return await super().handle_async_request(request)
+
+        self.searches.append(request)
+        failure = self.failures.get(int(request.url.params.get("page", 1)))
+        if isinstance(failure, Exception):
+            raise failure
+        if failure:
+            return httpx.Response(failure, json={"status": failure, "message": "Upstream failure"})
+
+        if not self.etags and "If-None-Match" in request.headers:
+            del request.headers["If-None-Match"]
+        response = await super().handle_async_request(request)
+        if not self.etags:
+            del response.headers["ETag"]
+        return response
+
+
+@pytest.fixture
+def upstream(monkeypatch) -> Upstream:
+    monkeypatch.setattr(config, "JIKAN_BASE_URL", "http://fake-jikan/v4")
+    # the fake has no rate limit, don't wait on the real one
+    monkeypatch.setattr(jikan_limiter, "rate", 10_000)
+    return Upstream()
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    """The per-worker singletons (local tier, negative cache, feed names, degraded mode...) as a freshly started worker has them"""
+    fresh = {
+        local_cache: LocalCache(budgets=config.LOCAL_BUDGETS),
+        negative_cache: NegativeCache(capacity=1000, error_rate=0.01, local_size=100, sync_interval=config.NEGATIVE_SYNC_INTERVAL),
+        redis_health: RedisHealth(slow_seconds=config.REDIS_SLOW_MS / 1000, cooldown=config.REDIS_DEGRADED_COOLDOWN),
+        hotness_rollups: HotnessRollups(interval=config.ROLLUP_INTERVAL, bucket_seconds=config.ROLLUP_BUCKET_SECONDS,
+                                        retention=config.ROLLUP_RETENTION, bucket_top=config.ROLLUP_BUCKET_TOP, local_max=config.ROLLUP_LOCAL_MAX),
+        canned_feeds: CannedFeeds(),
+        prefetcher: Prefetcher(),
+        warmup: CacheWarmup(),
+        req_collapser: RequestCollapser(),
+        flight_recorder: FlightRecorder(sample_rate=0.0, slow_seconds=config.PROFILE_SLOW_MS / 1000, size=config.PROFILE_BUFFER_SIZE),
+    }
+    for singleton, new in fresh.items():
+        monkeypatch.setattr(singleton, "__dict__", new.__dict__)
+    monkeypatch.setattr(lookups, "local_lookups", {})
+
+
+@pytest.fixture
+async def services(upstream, worker):
+    """A worker's services: the fake Jikan, and the in-process backend for Redis"""
+    async with httpx.AsyncClient(transport=upstream) as client:
+        yield ServiceProvider.from_state(SimpleNamespace(client=client, redis=MemoryBackend()))
+
+
+@pytest.fixture
+async def api(services, monkeypatch):
+    """HTTP client of the app on `services`. No lifespan: background jobs are started by the tests that need them"""
+    from src.app import app
+
+    monkeypatch.setattr(app.state, "client", services.client, raising=False)
+    monkeypatch.setattr(app.state, "redis", services.redis, raising=False)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
@@ -0,0 +1,117 @@
+import asyncio
+
+import anyio
+import pytest
+from redis.exceptions import ConnectionError
+
+from src import config
+from src.cache.budgets import CacheBudgets, page_class, track
+from src.cache.redis_health import redis_health
+
+
+def new_budgets(**budgets) -> CacheBudgets:
+    return CacheBudgets(budgets={"counters": 1000, "lookups": 1, "negative": 1000, "hot": 1000, "regular": 1000, "feeds": 1, **budgets}, interval=0.01)
+
+
+async def cached(redis, cache_class: str, key: str, size: int, hotness: int = 0):
+    """A page write as fetch_page does it: the value and its bookkeeping"""
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.set(key, b"x" * size, ex=60)
+        track(pipe, cache_class, key, size=size, hotness=hotness, reclassify=True)
+        await pipe.execute()
+
+
+def test_page_class():
+    assert page_class({"description": "hot_request"}, {"data": [1]}) == "hot"
+    assert page_class({"description": "regular_cache"}, {"data": [1]}) == "regular"
+    # no results stays negative, even re-leveled as hot
+    assert page_class({"description": "hot_request"}, {"data": []}) == "negative"
+
+
+@pytest.mark.anyio
+async def test_lru_class_evicts_least_recently_used(services):
+    redis = services.redis
+    for name in ("a", "b", "c"):
+        await cached(redis, "regular", f"l2:{name}", 400)
+        await asyncio.sleep(0.01)
+    await redis.hset("http:c", "etag", '"c"')
+    await redis.hset("validators:c", "etag", '"c"')
+    # a hit on "a": "b" is the least recently used now
+    async with redis.pipeline(transaction=False) as pipe:
+        track(pipe, "regular", "l2:a", size=400)
+        await pipe.execute()
+
+    stats = await new_budgets().sweep(redis, "regular")
+    assert stats == {"bytes": 800, "budget": 1000, "evicted": 1}
+    assert not await redis.exists("l2:b")
+    assert await redis.exists("l2:a") and await redis.exists("l2:c")
+
+    await cached(redis, "regular", "l2:d", 400)
+    await new_budgets().sweep(redis, "regular")
+    # evicted with its HTTP variants and validators
+    assert not await redis.exists("l2:c")
+    assert not await redis.exists("http:c") and not await redis.exists("validators:c")
+
+
+@pytest.mark.anyio
+async def test_hot_class_keeps_value_per_byte(services):
+    redis = services.redis
+    await cached(redis, "hot", "l1:big", 600, hotness=10)
+    await cached(redis, "hot", "l1:small", 300, hotness=10)
+    await cached(redis, "hot", "l1:busy", 600, hotness=100)
+    await new_budgets().sweep(redis, "hot")
+    assert [await redis.exists(key) for key in ("l1:big", "l1:small", "l1:busy")] == [0, 1, 1]
+
+
+@pytest.mark.anyio
+async def test_expired_keys_leave_the_index_and_unevictable_classes_only_report(services):
+    redis = services.redis
+    await cached(redis, "regular", "l2:gone", 400)
+    await redis.delete("l2:gone")
+    await cached(redis, "feeds", "feed:a", 400)
+
+    budgets = new_budgets()
+    await budgets.sweep(redis, "regular")
+    assert await redis.zrange("cache_index:regular", 0, -1) == []
+    stats = await budgets.sweep(redis, "feeds")
+    assert stats == {"bytes": 400, "budget": 1, "evicted": 0}
+    assert await redis.exists("feed:a")
+
+    report = await budgets.stats(redis)
+    assert report["feeds"]["entries"] == 1 and report["feeds"]["policy"] == "none"
+    assert report["regular"]["entries"] == 0
+
+
+@pytest.mark.anyio
+async def test_coldest_counters_go_first(services):
+    redis = services.redis
+    for i in range(10):
+        await redis.set(f"hot_request|page:{i}|", i + 1, ex=60)
+    stats = await new_budgets(counters=5 * (len("hot_request|page:0|") + 64)).sweep_counters(redis)
+    assert stats["evicted"] == 5
+    assert [bool(await redis.exists(f"hot_request|page:{i}|")) for i in range(10)] == [False] * 5 + [True] * 5
+
+
+@pytest.mark.anyio
+async def test_sweeper_reports_and_trips_on_redis_errors(services, api, monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "secret")
+    redis = services.redis
+    await cached(redis, "regular", "l2:a", 400)
+    budgets = new_budgets()
+    budgets.start(services)
+    with anyio.fail_after(2):
+        while not await redis.exists("cache_stats:regular"):
+            await asyncio.sleep(0.01)
+
+    response = await api.get("/admin/cache", headers={"X-Admin-Token": "secret"})
+    assert response.json()["redis"]["regular"]["entries"] == 1
+    assert (await api.get("/admin/cache")).status_code == 403
+
+    async def fail(*args, **kwargs):
+        raise ConnectionError("Redis gone")
+    monkeypatch.setattr(redis, "set", fail)
+    with anyio.fail_after(2):
+        while not redis_health.degraded:
+            await asyncio.sleep(0.01)
+    assert not budgets.tasks[0].done()
+    await budgets.stop()
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from src.cache import codec as codec_module
+from src.cache.codec import MAGIC, Codec, train_dictionary
+
+
+"""Every codec reads what any of them wrote, short of a dictionary it doesn't have"""
+
+
+def page(i: int) -> dict:
+    return {
+        "data": [{"mal_id": i * 25 + n, "title": f"Title {i}-{n}", "score": 7.5, "status": "Finished Airing", "genres": [{"name": "Action"}]} for n in range(25)],
+        "pagination": {"current_page": i, "has_next_page": True, "items": {"count": 25, "per_page": 25}},
+    }
+
+
+@pytest.mark.parametrize("compression", ["off", "zlib", "zstd"])
+def test_round_trip(compression):
+    codec = Codec(compression, min_bytes=256, zstd_level=3, dict_path=None)
+    data = page(1)
+    value = codec.encode(data)
+    assert value.startswith(MAGIC) == (compression != "off")
+    assert codec.decode(value) == data
+
+
+def test_small_values_stay_plain_json():
+    codec = Codec("zstd", min_bytes=256, zstd_level=3, dict_path=None)
+    data = {"data": [], "pagination": {"has_next_page": False}}
+    value = codec.encode(data)
+    assert json.loads(value) == data
+    assert codec.decode(value) == data
+
+
+def test_mixed_rollout():
+    """Values written before compression (plain JSON, str or bytes) and by other codecs all decode"""
+    data = page(2)
+    readers = [Codec(compression, 256, 3, None) for compression in ("off", "zlib", "zstd")]
+    for writer in readers:
+        value = writer.encode(data)
+        assert all(reader.decode(value) == data for reader in readers)
+    assert readers[2].decode(json.dumps(data)) == data
+
+
+def test_unknown_version_is_a_miss():
+    codec = Codec("zlib", 256, 3, None)
+    value = bytearray(codec.encode(page(3)))
+    value[2] = 99
+    assert codec.decode(bytes(value)) is None
+
+
+@pytest.mark.skipif(codec_module.zstandard is None, reason="zstandard is not installed")
+def test_dictionary(tmp_path):
+    dict_path = tmp_path / "pages.dict"
+    dict_path.write_bytes(train_dictionary([json.dumps(page(i)).encode() for i in range(200)], dict_size=16 * 1024))
+
+    with_dict = Codec("zstd", 256, 3, dict_path)
+    without_dict = Codec("zstd", 256, 3, None)
+    data = page(500)
+    value = with_dict.encode(data)
+    assert len(value) < len(without_dict.encode(data))
+    assert with_dict.decode(value) == data
+    # a reader without that dictionary treats it as a miss instead of failing
+    assert without_dict.decode(value) is None
@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.cache.memory_backend import MemoryBackend
+from src.dependencies.services import ServiceProvider
+from src.request_handlers import RequestCollapser
+
+
+"""Two RequestCollapsers on one backend: two workers sharing a Redis"""
+
+
+@pytest.fixture
+async def workers():
+    services = ServiceProvider.from_state(SimpleNamespace(client=None, redis=MemoryBackend()))
+    collapsers = [RequestCollapser(), RequestCollapser()]
+    for i, collapser in enumerate(collapsers):
+        collapser.worker_id = f"worker-{i}"
+        collapser.start(services)
+    while not all(collapser.listening for collapser in collapsers):
+        await asyncio.sleep(0.01)
+    yield services.redis, collapsers
+    for collapser in collapsers:
+        await collapser.stop()
+
+
+def page_source(redis, fail: bool = False):
+    """fetch_fun (caches what it fetched, like fetch_page) and shared_read for one page, counting upstream calls"""
+    calls = []
+
+    async def fetch() -> dict:
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        if fail:
+            raise RuntimeError("upstream failed")
+        await redis.set("page", "fetched", ex=60)
+        return {"data": "fetched"}
+
+    async def read() -> dict | None:
+        value = await redis.get("page")
+        return {"data": value.decode()} if value else None
+
+    return calls, fetch, read
+
+
+@pytest.mark.anyio
+async def test_one_fetch_across_workers(workers):
+    redis, (first, second) = workers
+    calls, fetch, read = page_source(redis)
+
+    results = await asyncio.gather(*(worker.run("page", fetch, shared_read=read) for worker in (first, second, first, second)))
+    assert len(calls) == 1
+    assert results == [{"data": "fetched"}] * 4
+    assert not await redis.exists("collapse:page")
+
+
+@pytest.mark.anyio
+async def test_followers_fetch_themselves_when_the_leader_fails(workers):
+    redis, (first, second) = workers
+    calls, fetch, read = page_source(redis, fail=True)
+
+    results = await asyncio.gather(first.run("page", fetch, shared_read=read), second.run("page", fetch, shared_read=read), return_exceptions=True)
+    assert len(calls) == 2
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.anyio
+async def test_in_process_only_without_shared_read(workers):
+    redis, (first, second) = workers
+    calls, fetch, _ = page_source(redis)
+
+    await asyncio.gather(first.run("page", fetch), first.run("page", fetch), second.run("page", fetch))
+    assert len(calls) == 2
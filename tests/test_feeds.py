@@ -0,0 +1,136 @@
+import asyncio
+import datetime
+import time
+
+import anyio
+import pytest
+
+from src import config
+from src.cache.feeds import SCHEDULE_KEY, canned_feeds, season_start
+from src.cache.prefetch import prefetcher
+from src.data.schemas import AnimeParams
+from src.jikan import jikan_limiter
+from src.request_handlers import build_query, reco_batch_handler, reco_request_handler
+
+
+TODAY = datetime.date(2026, 5, 20)
+AIRING = AnimeParams(status="airing", order_by="scored_by")
+
+
+@pytest.fixture
+async def feeds(services):
+    canned_feeds.specs = await canned_feeds.define(services, today=TODAY)
+    return canned_feeds
+
+
+async def scheduled(redis) -> dict[str, float]:
+    return {member.decode(): at for member, at in await redis.zrange(SCHEDULE_KEY, 0, -1, withscores=True)}
+
+
+async def feed_name(params: AnimeParams, services) -> str:
+    return f"{(await build_query(params=params, services=services))["request_name"]}page:1|"
+
+
+def test_season_start():
+    assert season_start(TODAY) == datetime.date(2026, 4, 1)
+    assert season_start(datetime.date(2026, 12, 31)) == datetime.date(2026, 10, 1)
+
+
+@pytest.mark.anyio
+async def test_feed_names_are_client_queries(services, feeds):
+    labels = {spec["label"] for spec in feeds.specs.values()}
+    assert labels == {f"{feed}{suffix}" for feed in ("airing", "top", "season") for suffix in ("", "|type:tv", "|type:movie")}
+    assert await feed_name(AIRING, services) in feeds.specs
+    assert await feed_name(AnimeParams(status="airing", start_date=datetime.date(2026, 4, 1), type="movie"), services) in feeds.specs
+
+    # one per genre once the lookup table is there
+    await services.redis.hset("lookup:genres:anime", mapping={"action": "1", "drama": "4"})
+    specs = await canned_feeds.define(services, today=TODAY)
+    assert len(specs) == len(feeds.specs) + 2 * 3
+
+
+@pytest.mark.anyio
+async def test_refreshed_feed_is_served_without_upstream(services, upstream, feeds, api):
+    request_name = await feed_name(AIRING, services)
+    await feeds.refresh(request_name, services)
+    assert len(upstream.searches) == 1
+    assert await services.redis.hget(f"feed:{request_name}", "version") == b"1"
+    assert (await scheduled(services.redis))[request_name] > time.time()
+
+    result = await reco_request_handler(params=AIRING, services=services)
+    assert all(item["status"] == "Currently Airing" for item in result["data"])
+    [batched] = await reco_batch_handler(params_list=[AIRING], services=services)
+    assert batched == {"status_code": 200, "data": result}
+    # the GET variants were built at refresh
+    response = await api.get("/get_recommendation/anime", params={"status": "airing", "order_by": "scored_by"})
+    assert response.json() == result
+    assert int(response.headers["Cache-Control"].rsplit("=", 1)[1]) > 0
+    assert len(upstream.searches) == 1
+    assert not await services.redis.exists(f"l2:{request_name}")
+
+    # the prefetcher leaves feeds to their own refresh
+    prefetcher.enqueue("next_page", query=feeds.specs[request_name]["query"], page=1, hot_params={}, request_hotness=10)
+    assert prefetcher.queue.empty()
+
+
+@pytest.mark.anyio
+async def test_unchanged_feed_keeps_its_version(services, upstream, feeds):
+    request_name = await feed_name(AIRING, services)
+    await feeds.refresh(request_name, services)
+    await feeds.refresh(request_name, services)
+    assert upstream.searches[-1].headers["If-None-Match"]
+    assert await services.redis.hget(f"feed:{request_name}", "version") == b"1"
+
+    upstream.etags = False
+    await feeds.refresh(request_name, services)
+    assert await services.redis.hget(f"feed:{request_name}", "version") == b"1"
+
+
+@pytest.mark.anyio
+async def test_failed_refresh_serves_the_old_version(services, upstream, feeds):
+    request_name = await feed_name(AIRING, services)
+    await feeds.refresh(request_name, services)
+    result = await reco_request_handler(params=AIRING, services=services)
+
+    upstream.failures[1] = 503
+    await feeds.refresh(request_name, services)
+    assert (await scheduled(services.redis))[request_name] > time.time() + config.FEED_RETRY - 5
+    assert await reco_request_handler(params=AIRING, services=services) == result
+    assert len(upstream.searches) == 2
+
+
+@pytest.mark.anyio
+async def test_overdue_feed_takes_the_generic_path(services, upstream, feeds):
+    request_name = await feed_name(AIRING, services)
+    await feeds.refresh(request_name, services)
+    await services.redis.hset(f"feed:{request_name}", "fresh_until", time.time() - config.FEED_STALE_GRACE - 1)
+
+    await reco_request_handler(params=AIRING, services=services)
+    assert len(upstream.searches) == 2
+    assert await services.redis.exists(f"l2:{request_name}")
+
+
+@pytest.mark.anyio
+async def test_leader_materializes_every_feed(services, upstream, api, monkeypatch):
+    monkeypatch.setattr(config, "FEED_SCAN_INTERVAL", 0.01)
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "secret")
+    canned_feeds.start(services)
+    with anyio.fail_after(2):
+        while not canned_feeds.specs or len(await scheduled(services.redis)) < len(canned_feeds.specs):
+            await asyncio.sleep(0.01)
+    assert len(upstream.searches) == len(canned_feeds.specs)
+
+    feeds = (await api.get("/admin/feeds", headers={"X-Admin-Token": "secret"})).json()["feeds"]
+    assert {feed["version"] for feed in feeds} == {1}
+    assert (await api.get("/admin/feeds")).status_code == 403
+    await canned_feeds.stop()
+    assert not await services.redis.exists("feeds:leader")
+
+
+@pytest.mark.anyio
+async def test_off_without_a_spare_token(services, monkeypatch):
+    monkeypatch.setattr(jikan_limiter, "burst", 1)
+    canned_feeds.start(services)
+    # names only: their pages go through the generic path
+    assert len(canned_feeds.tasks) == 1
+    await canned_feeds.stop()
@@ -0,0 +1,55 @@
+import datetime
+
+from src import config
+from src.cache.freshness import JST, next_broadcast, page_freshness
+
+
+# a Monday, 12:00 in Tokyo
+NOW = datetime.datetime(2026, 10, 19, 3, 0, tzinfo=datetime.timezone.utc)
+
+
+def anime(status: str, **fields) -> dict:
+    return {"mal_id": 1, "status": status, **fields}
+
+
+def test_next_broadcast():
+    later_today = next_broadcast({"day": "Mondays", "time": "18:30", "timezone": "Asia/Tokyo"}, NOW)
+    assert later_today == datetime.datetime(2026, 10, 19, 18, 30, tzinfo=JST)
+
+    # aired less than FRESHNESS_SETTLE ago: still the next one, MAL hasn't caught up yet
+    just_aired = NOW - datetime.timedelta(seconds=config.FRESHNESS_SETTLE // 2)
+    slot = {"day": "Mondays", "time": just_aired.astimezone(JST).strftime("%H:%M"), "timezone": "Asia/Tokyo"}
+    assert next_broadcast(slot, NOW).date() == datetime.date(2026, 10, 19)
+
+    aired = {"day": "Mondays", "time": "09:00", "timezone": "Asia/Tokyo"}
+    assert next_broadcast(aired, NOW).date() == datetime.date(2026, 10, 26)
+
+    assert next_broadcast({"day": None, "time": None}, NOW) is None
+    assert next_broadcast({"day": "Someday", "time": "10:00"}, NOW) is None
+
+
+def test_page_takes_its_soonest_title():
+    broadcast = {"day": "Mondays", "time": "12:20", "timezone": "Asia/Tokyo"}
+    data = {"data": [anime("Finished Airing"), anime("Currently Airing", broadcast=broadcast), anime("Currently Airing")]}
+    assert page_freshness(data, NOW) == (1200 + config.FRESHNESS_SETTLE, "broadcast")
+
+
+def test_statuses():
+    assert page_freshness({"data": [anime("Finished Airing")]}, NOW) == (config.FRESHNESS_STABLE_TTL, "stable")
+    assert page_freshness({"data": [anime("Publishing")]}, NOW) == (config.FRESHNESS_AIRING_TTL, "ongoing")
+    assert page_freshness({"data": [anime("Not yet aired")]}, NOW) == (config.FRESHNESS_UPCOMING_TTL, "upcoming")
+
+    starts = {"from": "2026-10-19T04:00:00+00:00"}
+    assert page_freshness({"data": [anime("Not yet aired", aired=starts)]}, NOW) == (3600 + config.FRESHNESS_SETTLE, "upcoming")
+    # empty pages only change when titles are added, like finished ones
+    assert page_freshness({"data": []}, NOW) == (config.FRESHNESS_STABLE_TTL, "stable")
+
+
+def test_bounds():
+    far = {"from": "2030-01-01T00:00:00+00:00"}
+    assert page_freshness({"data": [anime("Not yet aired", aired=far)]}, NOW)[0] == config.FRESHNESS_STABLE_TTL
+
+    # aired almost FRESHNESS_SETTLE ago: due any second, but not refetched in a loop
+    settling = {"day": "Mondays", "time": "12:00", "timezone": "Asia/Tokyo"}
+    now = NOW + datetime.timedelta(seconds=config.FRESHNESS_SETTLE - 1)
+    assert page_freshness({"data": [anime("Currently Airing", broadcast=settling)]}, now) == (config.FRESHNESS_MIN_TTL, "broadcast")
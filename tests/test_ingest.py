@@ -0,0 +1,90 @@
+import datetime
+
+import httpx
+import pytest
+
+from bin.fake_jikan import TODAY, build_catalog, create_app, start_date
+from src import config
+from src.catalog.ingest import CatalogIngest
+from src.catalog.store import CatalogStore
+from src.jikan import jikan_limiter
+
+
+"""End to end: src/catalog/ingest.py against bin/fake_jikan.py, in process (ASGI transport, no socket)"""
+
+SIZE = 200          # 8 pages of 25
+BASE_URL = "http://fake-jikan/v4"
+
+
+class FakeJikan(httpx.ASGITransport):
+    """bin/fake_jikan.py. Counts search pages and by-id fetches, and goes away after `pages_left` search pages (a killed run)"""
+    def __init__(self, revision: int = 0, pages_left: int | None = None):
+        super().__init__(app=create_app(size=SIZE, revision=revision))
+        self.pages_left = pages_left
+        self.pages: list[int] = []
+        self.by_id = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if "page" in request.url.params:
+            if self.pages_left == 0:
+                raise httpx.ConnectError("upstream gone", request=request)
+            if self.pages_left is not None:
+                self.pages_left -= 1
+            self.pages.append(int(request.url.params["page"]))
+        elif request.url.path.rsplit("/", 1)[-1].isdigit():
+            self.by_id += 1
+        return await super().handle_async_request(request)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "JIKAN_BASE_URL", BASE_URL)
+    # the fake has no rate limit, don't wait on the real one
+    monkeypatch.setattr(jikan_limiter, "rate", 10_000)
+    store = CatalogStore(tmp_path / "catalog.db")
+    yield store
+    store.close()
+
+
+async def run(store: CatalogStore, transport: FakeJikan, job: str) -> int:
+    async with httpx.AsyncClient(transport=transport) as client:
+        ingest = CatalogIngest(store=store, client=client)
+        return await (ingest.full("anime") if job == "full" else ingest.incremental("anime", today=TODAY))
+
+
+@pytest.mark.anyio
+async def test_full_run_resumes_from_its_checkpoint(store):
+    with pytest.raises(httpx.ConnectError):
+        await run(store, FakeJikan(pages_left=3), "full")
+
+    checkpoint = store.checkpoint("anime:full")
+    assert checkpoint["finished_at"] is None
+    resume_from = checkpoint["next_page"]
+    assert 1 < resume_from <= 8
+    # a checkpoint covers exactly the pages committed before it
+    assert store.count("anime") == (resume_from - 1) * 25
+
+    transport = FakeJikan()
+    await run(store, transport, "full")
+    assert store.count("anime") == SIZE
+    assert sorted(transport.pages) == list(range(resume_from, 9))
+    assert store.checkpoint("anime:full")["finished_at"] is not None
+
+
+@pytest.mark.anyio
+async def test_incremental_run_picks_up_finished_titles(store):
+    await run(store, FakeJikan(), "full")
+
+    before = {item["mal_id"]: item for item in build_catalog("anime", SIZE)}
+    after = {item["mal_id"]: item["status"] for item in build_catalog("anime", SIZE, revision=1)}
+    finished = [mal_id for mal_id in after if after[mal_id] != before[mal_id]["status"]]
+    assert finished and all(after[mal_id] == "Finished Airing" for mal_id in finished)
+
+    transport = FakeJikan(revision=1)
+    await run(store, transport, "incremental")
+
+    # they dropped out of the airing segment: refetched by id, and only them (recent titles come with their segment)
+    since = (TODAY - datetime.timedelta(days=config.INGEST_RECENT_DAYS)).isoformat()
+    assert transport.by_id == len([mal_id for mal_id in finished if start_date(before[mal_id]) < since])
+    assert all(store.get("anime", mal_id)["status"] == after[mal_id] for mal_id in after)
+    assert store.checkpoint("anime:incremental")["finished_at"] is not None
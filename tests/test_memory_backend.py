@@ -0,0 +1,123 @@
+import pytest
+
+from src.cache import memory_backend
+from src.cache.memory_backend import MemoryBackend
+
+
+"""MemoryBackend answers like redis.asyncio.Redis(decode_responses=False): bytes back, Redis' return values"""
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(memory_backend, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def redis():
+    return MemoryBackend()
+
+
+@pytest.mark.anyio
+async def test_strings_and_expiry(redis, clock):
+    assert await redis.set("a", "1", ex=10) is True
+    assert await redis.set("a", "2", nx=True) is None
+    assert await redis.get("a") == b"1"
+    assert await redis.ttl("a") == 10
+    assert await redis.ttl("missing") == -2
+
+    clock.now += 10
+    assert await redis.get("a") is None
+    assert await redis.exists("a") == 0
+
+    # a plain SET drops the old TTL
+    await redis.set("b", 1, ex=5)
+    await redis.set("b", 2)
+    assert await redis.ttl("b") == -1
+
+
+@pytest.mark.anyio
+async def test_counters_and_expire(redis, clock):
+    assert await redis.incr("hits") == 1
+    assert await redis.incr("hits", 4) == 5
+    assert await redis.get("hits") == b"5"
+    assert await redis.expire("hits", 60) is True
+    assert await redis.expire("missing", 60) is False
+
+    # renewed TTLs don't let an outdated deadline drop the key
+    clock.now += 50
+    await redis.expire("hits", 60)
+    clock.now += 50
+    assert await redis.get("hits") == b"5"
+    assert await redis.delete("hits", "missing") == 1
+
+
+@pytest.mark.anyio
+async def test_hashes(redis):
+    assert await redis.hset("h", mapping={"etag": '"x"', "size": 12}) == 2
+    assert await redis.hset("h", "size", 13) == 0
+    assert await redis.hsetnx("h", "etag", "y") is False
+    assert await redis.hmget("h", ["etag", "size", "missing"]) == [b'"x"', b"13", None]
+    assert await redis.hincrby("h", "size", -3) == 10
+    assert await redis.hgetall("h") == {b"etag": b'"x"', b"size": b"10"}
+
+    # an emptied hash is gone, like in Redis
+    assert await redis.hdel("h", "etag", "size") == 2
+    assert await redis.exists("h") == 0
+
+
+@pytest.mark.anyio
+async def test_sorted_sets(redis):
+    await redis.zadd("z", {"b": 2, "a": 2, "c": 1})
+    assert await redis.zadd("z", {"c": 5}, nx=True) == 0
+    assert await redis.zincrby("z", 2.5, "c") == 3.5
+    # score order, ties by member
+    assert await redis.zrange("z", 0, -1, withscores=True) == [(b"a", 2.0), (b"b", 2.0), (b"c", 3.5)]
+    assert await redis.zrangebyscore("z", "(2", "+inf") == [b"c"]
+
+    assert await redis.zremrangebyrank("z", 0, -3) == 1
+    assert await redis.zrange("z", 0, -1) == [b"b", b"c"]
+    assert await redis.zremrangebyscore("z", "-inf", 3) == 1
+    assert await redis.zrem("z", "c", "missing") == 1
+    assert await redis.exists("z") == 0
+
+
+@pytest.mark.anyio
+async def test_pipeline_results_in_order(redis):
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.set("k", "v", ex=30).get("k").ttl("k")
+        pipe.incr("n")
+        assert await pipe.execute() == [True, b"v", 30, 1]
+        # execute empties the queue
+        assert await pipe.execute() == []
+
+
+@pytest.mark.anyio
+async def test_scan_iter(redis):
+    for key in ("l1:a", "l1:b", "l2:a"):
+        await redis.set(key, 1)
+    assert sorted([key async for key in redis.scan_iter(match="l1:*")]) == [b"l1:a", b"l1:b"]
+
+
+@pytest.mark.anyio
+async def test_pubsub(redis):
+    pubsub = redis.pubsub()
+    await pubsub.subscribe("channel")
+    assert await redis.publish("channel", "hello") == 1
+    assert await redis.publish("other", "nobody") == 0
+
+    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.1)
+    assert message == {"type": "message", "pattern": None, "channel": b"channel", "data": b"hello"}
+    assert await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.01) is None
+
+    await pubsub.aclose()
+    assert await redis.publish("channel", "gone") == 0
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from src.cache.memory_backend import MemoryBackend
+from src.cache.negative import LOG_KEY, BloomFilter, NegativeCache, negative_result
+from src.dependencies.services import ServiceProvider
+
+
+@pytest.fixture
+def services():
+    return ServiceProvider.from_state(SimpleNamespace(client=None, redis=MemoryBackend()))
+
+
+def new_cache(**kwargs) -> NegativeCache:
+    return NegativeCache(**{"capacity": 1000, "error_rate": 0.01, "local_size": 100, "sync_interval": 0.01, **kwargs})
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    added = [f"anime|page:{i}|" for i in range(1000)]
+    for name in added:
+        bloom.add(name)
+    assert all(name in bloom for name in added)
+
+    false_positives = sum(f"manga|page:{i}|" in bloom for i in range(10_000))
+    assert false_positives < 10_000 * 0.01 * 2
+
+
+def test_negative_result():
+    assert negative_result({"kind": "empty", "data": {"data": []}}) == {"data": []}
+    with pytest.raises(HTTPException) as error:
+        negative_result({"kind": "error", "status_code": 404, "detail": "Not Found"})
+    assert error.value.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_empty_pages_and_errors(services):
+    cache = new_cache()
+    assert await cache.lookup("a", services) is None
+
+    await cache.add_empty("a", {"data": []}, 60, services)
+    assert negative_result(await cache.lookup("a", services)) == {"data": []}
+
+    await cache.add_error("b", HTTPException(status_code=404, detail="Not Found"), services)
+    with pytest.raises(HTTPException) as error:
+        negative_result(await cache.lookup("b", services))
+    assert error.value.status_code == 404
+
+    # upstream blips (429, 5xx) aren't about the query: not negative-cached
+    for status_code in (429, 500, 503):
+        await cache.add_error(f"c{status_code}", HTTPException(status_code=status_code, detail="Upstream"), services)
+        assert await cache.lookup(f"c{status_code}", services) is None
+    assert await services.redis.ttl("neg:a") == 60
+
+
+@pytest.mark.anyio
+async def test_evicted_entries_come_back_from_redis(services):
+    cache = new_cache(local_size=1)
+    await cache.add_empty("a", {"data": []}, 60, services)
+    await cache.add_empty("b", {"data": []}, 60, services)
+    assert "a" not in cache.entries
+    assert (await cache.lookup("a", services))["data"] == {"data": []}
+    assert "a" in cache.entries
+
+
+@pytest.mark.anyio
+async def test_workers_share_entries(services):
+    """A second worker learns of the first one's entries through neg:log, without asking for them"""
+    writer, reader = new_cache(), new_cache()
+    await writer.add_empty("a", {"data": []}, 60, services)
+    assert await reader.lookup("a", services) is None       # not in its filter yet
+
+    reader.start(services)
+    try:
+        for _ in range(100):
+            if "a" in reader.entries:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await reader.stop()
+    assert (await reader.lookup("a", services))["kind"] == "empty"
+    assert len(await services.redis.zrange(LOG_KEY, 0, -1)) == 1
+
+
+@pytest.mark.anyio
+async def test_expired_entries_are_pruned(services):
+    cache = new_cache(capacity=8)
+    cache.remember("old", {"kind": "empty", "data": {}, "expires_at": time.time() - 1})
+    await cache.add_empty("new", {"data": []}, 60, services)
+    assert await cache.lookup("old", services) is None
+
+    cache.prune()
+    assert "old" not in cache.expiries and "old" not in cache.entries
+    # a quarter of the filter was stale: it was rebuilt from the live entries only
+    assert cache.bloom.count == 1 and cache.stale == 0
+    assert "new" in cache.bloom
@@ -0,0 +1,102 @@
+import asyncio
+
+import anyio
+import pytest
+from redis.exceptions import ConnectionError
+
+from src import config
+from src.cache.prefetch import Prefetcher
+from src.cache.redis_database import entry_fresh_ttl
+from src.cache.redis_health import redis_health
+from src.data.schemas import AnimeParams
+from src.jikan import RateLimiter, jikan_limiter
+from src.request_handlers import build_query, reco_request_handler
+
+
+@pytest.fixture
+async def started(services):
+    prefetcher = Prefetcher(hot_threshold=2, scan_interval=0.01)
+    prefetcher.start(services)
+    yield prefetcher
+    await prefetcher.stop()
+
+
+async def served(services, page: int = 1) -> tuple[dict, dict]:
+    """Page of the default query, through the request path. Returns the query and the page"""
+    params = AnimeParams()
+    query = await build_query(params=params, services=services)
+    return query, await reco_request_handler(params=params, services=services, page=page)
+
+
+@pytest.mark.anyio
+async def test_hot_page_gets_its_next_page_prefetched(services, upstream, started):
+    query, result = await served(services)
+    started.note(query=query, page=1, hot_params={}, request_hotness=1, result=result)
+    assert started.queue.empty()
+
+    started.note(query=query, page=1, hot_params={}, request_hotness=2, result=result)
+    with anyio.fail_after(2):
+        while await entry_fresh_ttl(services.redis, f"{query["request_name"]}page:2|") <= 0:
+            await asyncio.sleep(0.01)
+    assert [int(request.url.params["page"]) for request in upstream.searches] == [1, 2]
+
+    # already cached: the user asking for it next doesn't go upstream
+    await served(services, page=2)
+    assert len(upstream.searches) == 2
+
+
+@pytest.mark.anyio
+async def test_hot_page_refreshed_before_it_expires(services, upstream, started):
+    query, result = await served(services)
+    request_name = f"{query["request_name"]}page:1|"
+    started.tracked[request_name] = {"query": query, "page": 1, "hot_params": {}, "request_hotness": 10}
+    # 5 fresh seconds left, refresh_ahead is 15
+    await services.redis.expire(f"l2:{request_name}", config.REVALIDATE_GRACE + 5)
+
+    with anyio.fail_after(2):
+        while await entry_fresh_ttl(services.redis, request_name) <= 5:
+            await asyncio.sleep(0.01)
+    # revalidated, not refetched
+    assert upstream.searches[-1].headers["If-None-Match"]
+
+    # nobody asked for it in the last minute: dropped, not refreshed
+    await services.redis.delete(f"hot_request|{request_name}")
+    with anyio.fail_after(2):
+        while request_name in started.tracked:
+            await asyncio.sleep(0.01)
+
+
+@pytest.mark.anyio
+async def test_redis_error_in_the_worker_trips_degraded_mode(services, upstream, started, monkeypatch):
+    query, result = await served(services)
+
+    async def ttl(*args):
+        raise ConnectionError("Redis gone")
+    monkeypatch.setattr(services.redis, "ttl", ttl)
+
+    started.note(query=query, page=1, hot_params={}, request_hotness=2, result=result)
+    with anyio.fail_after(2):
+        while not redis_health.degraded:
+            await asyncio.sleep(0.01)
+    assert not started.queued
+    assert all(not task.done() for task in started.tasks)
+
+
+@pytest.mark.anyio
+async def test_off_without_a_spare_token(services, monkeypatch):
+    # several workers on JIKAN_BURST=3: a bucket of 1, and it's the reserve
+    monkeypatch.setattr(jikan_limiter, "burst", 1)
+    prefetcher = Prefetcher(reserve=1)
+    prefetcher.start(services)
+    assert prefetcher.tasks == []
+    await prefetcher.stop()
+
+
+def test_reserve_is_strict():
+    limiter = RateLimiter(rate=0.001, burst=2)
+    assert limiter.has_budget(reserve=1)
+    # a token and a half: the reserve and half a token, nothing to spare
+    limiter.tokens = 1.5
+    assert not limiter.has_budget(reserve=1)
+    assert limiter.can_spare(1)
+    assert not RateLimiter(rate=1, burst=1).can_spare(1)
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from src import config
+from src.tools.profiling import Span, flight_recorder, profiled, span
+
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "secret")
+
+
+def names(tree: dict) -> set[str]:
+    return {tree["name"], *(name for child in tree["children"] for name in names(child))}
+
+
+@pytest.mark.anyio
+async def test_spans_outside_a_profile_cost_nothing():
+    @profiled("work")
+    async def work() -> int:
+        with span("inner"):
+            return 1
+
+    assert await work() == 1
+    assert list(flight_recorder.profiles) == []
+
+
+def test_folded_stacks_are_self_time():
+    root = Span("GET /")
+    child = Span("load_page")
+    root.children.append(child)
+    root.started, root.ended = 0.0, 0.003
+    child.started, child.ended = 0.001, 0.003
+    assert list(root.folded()) == [("GET /", 1000), ("GET /;load_page", 2000)]
+
+
+@pytest.mark.anyio
+async def test_requested_profile(api, admin):
+    response = await api.post("/get_recommendation/anime", json={"status": "complete"}, headers={"X-Profile": "1", **ADMIN})
+    profile_id = response.headers["X-Profile-Id"]
+
+    profile = (await api.get(f"/admin/profiles/{profile_id}", headers=ADMIN)).json()
+    assert profile["reason"] == "header" and profile["status_code"] == 200
+    assert {"build_query", "load_page", "cache_read", "collapse:leader", "fetch_page", "fetch_jikan", "upstream"} <= names(profile["spans"])
+
+    listed = (await api.get("/admin/profiles", headers=ADMIN)).json()["profiles"]
+    assert [summary["id"] for summary in listed] == [int(profile_id)]
+
+    folded = (await api.get(f"/admin/profiles/{profile_id}", params={"format": "folded"}, headers=ADMIN)).text
+    assert "POST /get_recommendation/anime;load_page;collapse:leader;fetch_page;fetch_jikan;upstream " in folded
+    assert (await api.get("/admin/profiles/folded", headers=ADMIN)).text.startswith("POST /get_recommendation/anime")
+
+
+@pytest.mark.anyio
+async def test_only_admins_profile_on_demand(api, admin):
+    response = await api.post("/get_recommendation/anime", json={}, headers={"X-Profile": "1"})
+    assert "X-Profile-Id" not in response.headers
+    response = await api.post("/get_recommendation/anime", json={}, headers={"X-Profile": "1", "X-Admin-Token": "wrong"})
+    assert "X-Profile-Id" not in response.headers
+    assert list(flight_recorder.profiles) == []
+
+    for path in ("/admin/profiles", "/admin/profiles/folded", "/admin/profiles/1"):
+        assert (await api.get(path)).status_code == 403
+
+
+@pytest.mark.anyio
+async def test_flight_recorder_keeps_slow_sampled_requests(api, admin, monkeypatch):
+    monkeypatch.setattr(flight_recorder, "sample_rate", 1.0)
+    await api.post("/get_recommendation/anime", json={})
+    # sampled but fast: not kept
+    assert list(flight_recorder.profiles) == []
+
+    monkeypatch.setattr(flight_recorder, "slow_seconds", 0)
+    response = await api.post("/get_recommendation/anime", json={"status": "airing"})
+    profile = flight_recorder.get(int(response.headers["X-Profile-Id"]))
+    assert profile.reason == "sampled"
+    assert profile.started_at <= time.time()
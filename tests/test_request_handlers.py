@@ -0,0 +1,241 @@
+import gzip
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from src import config
+from src.cache.codec import codec
+from src.cache.local_cache import LocalCache, local_cache
+from src.cache.memory_backend import MemoryBackend
+from src.cache.redis_database import entry_fresh_ttl
+from src.cache.redis_health import redis_health
+from src.data.schemas import AnimeParams
+from src.request_handlers import build_query, load_page, reco_request_handler
+
+
+"""The request path (src/request_handlers.py) on the in-process backend, against bin/fake_jikan.py"""
+
+COMPLETE = AnimeParams(status="complete")
+
+
+async def page_name(params: AnimeParams, services, page: int = 1) -> str:
+    query = await build_query(params=params, services=services)
+    return f"{query["request_name"]}page:{page}|"
+
+
+async def make_stale(redis, request_name: str):
+    """Past its TTL, still within REVALIDATE_GRACE: what fetch_page revalidates"""
+    for key in (f"l1:{request_name}", f"l2:{request_name}", f"validators:{request_name}", f"http:{request_name}"):
+        if await redis.exists(key):
+            await redis.expire(key, config.REVALIDATE_GRACE - 5)
+
+
+@pytest.mark.anyio
+async def test_miss_is_fetched_once_then_served_from_the_cache(services, upstream):
+    first = await reco_request_handler(params=COMPLETE, services=services)
+    assert len(upstream.searches) == 1
+    assert first["data"] and all(item["status"] == "Finished Airing" for item in first["data"])
+
+    request_name = await page_name(COMPLETE, services)
+    assert codec.decode(await services.redis.get(f"l2:{request_name}")) == first
+    assert await entry_fresh_ttl(services.redis, request_name) > 0
+
+    assert await reco_request_handler(params=COMPLETE, services=services) == first
+    assert len(upstream.searches) == 1
+
+
+@pytest.mark.anyio
+async def test_a_hot_page_is_promoted_to_l1(services, upstream):
+    await reco_request_handler(params=COMPLETE, services=services)
+    request_name = await page_name(COMPLETE, services)
+    query = await build_query(params=COMPLETE, services=services)
+
+    data = await load_page(query=query, hot_params={}, request_hotness=10, services=services)
+    assert codec.decode(await services.redis.get(f"l1:{request_name}")) == data
+    # same entry, same freshness: a hit doesn't extend it
+    assert await services.redis.ttl(f"l1:{request_name}") <= await services.redis.ttl(f"l2:{request_name}")
+    assert len(upstream.searches) == 1
+
+
+@pytest.mark.anyio
+async def test_stale_entry_revalidated_with_304(services, upstream):
+    first = await reco_request_handler(params=COMPLETE, services=services)
+    request_name = await page_name(COMPLETE, services)
+    await make_stale(services.redis, request_name)
+
+    assert await reco_request_handler(params=COMPLETE, services=services) == first
+    assert len(upstream.searches) == 2
+    assert upstream.searches[-1].headers["If-None-Match"]
+    assert await entry_fresh_ttl(services.redis, request_name) > 0
+
+
+@pytest.mark.anyio
+async def test_stale_entry_revalidated_by_content_hash(services, upstream, api):
+    upstream.etags = False
+    params = {"status": "complete"}
+    built = await api.get("/get_recommendation/anime", params=params, headers={"Accept-Encoding": "gzip"})
+    request_name = await page_name(COMPLETE, services)
+    await make_stale(services.redis, request_name)
+
+    response = await api.get("/get_recommendation/anime", params=params, headers={"Accept-Encoding": "gzip", "If-None-Match": built.headers["ETag"]})
+    assert response.status_code == 304
+    assert len(upstream.searches) == 2
+    assert "If-None-Match" not in upstream.searches[-1].headers
+    # same body: the entry and its HTTP variants got their TTL back, nothing was rebuilt
+    assert await entry_fresh_ttl(services.redis, request_name) > 0
+    assert await services.redis.ttl(f"http:{request_name}") > config.REVALIDATE_GRACE
+
+
+@pytest.mark.anyio
+async def test_changed_page_is_rewritten(services, upstream):
+    await reco_request_handler(params=COMPLETE, services=services)
+    request_name = await page_name(COMPLETE, services)
+    await services.redis.hset(f"validators:{request_name}", mapping={"etag": '"outdated"', "content_hash": "outdated"})
+    await services.redis.hset(f"http:{request_name}", "etag", '"outdated"')
+    await make_stale(services.redis, request_name)
+
+    await reco_request_handler(params=COMPLETE, services=services)
+    assert len(upstream.searches) == 2
+    assert await entry_fresh_ttl(services.redis, request_name) > 0
+    assert await services.redis.hget(f"validators:{request_name}", "content_hash") != b"outdated"
+    # variants of the old value are gone, the next GET builds them again
+    assert not await services.redis.exists(f"http:{request_name}")
+
+
+@pytest.mark.anyio
+async def test_upstream_errors_are_http_errors(services, upstream):
+    upstream.failures[1] = 404
+    with pytest.raises(HTTPException) as error:
+        await reco_request_handler(params=COMPLETE, services=services)
+    assert error.value.status_code == 404
+
+    # a 404 is about the query: answered from the negative cache next time
+    with pytest.raises(HTTPException):
+        await reco_request_handler(params=COMPLETE, services=services)
+    assert len(upstream.searches) == 1
+
+
+
+@pytest.mark.anyio
+async def test_stream_pages(api, upstream):
+    response = await api.post("/get_recommendation/anime/stream", params={"pages": 3}, json={})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["page"] for line in lines] == [1, 2, 3]
+    assert all(line["data"] for line in lines)
+
+
+@pytest.mark.anyio
+async def test_stream_goes_on_after_a_failed_page(api, upstream):
+    upstream.failures = {2: httpx.ConnectError("upstream gone"), 3: httpx.ReadTimeout("upstream slow"), 4: 404}
+    response = await api.post("/get_recommendation/anime/stream", params={"pages": 5}, json={})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["page"] for line in lines] == [1, 2, 3, 4, 5]
+    assert [line.get("error", {}).get("status_code") for line in lines] == [None, 502, 504, 404, None]
+
+
+@pytest.mark.anyio
+async def test_stream_without_page_1(api, upstream):
+    upstream.failures[1] = 500
+    response = await api.post("/get_recommendation/anime/stream", params={"pages": 3}, json={})
+    assert [json.loads(line) for line in response.text.splitlines()] == [{"page": 1, "error": {"status_code": 500, "detail": "Jikan Server Error"}}]
+
+    # a bad query fails before anything is streamed
+    response = await api.post("/get_recommendation/anime/stream", json={"genres": ["nope"]})
+    assert response.status_code == 422
+
+
+
+@pytest.mark.anyio
+async def test_batch(api, upstream):
+    items = [{"status": "complete"}, {"genres": ["Action"]}, {"status": "complete"}, {"genres": ["nope"]}, {"genres": ["action"]}]
+    response = await api.post("/get_recommendation/anime/batch", json=items)
+    results = response.json()["results"]
+
+    assert [result["status_code"] for result in results] == [200, 200, 200, 422, 200]
+    assert results[0] == results[2]
+    assert results[1] == results[4]
+    assert results[0]["data"]["data"][0]["status"] == "Finished Airing"
+    # identical (and canonically identical) items are fetched once
+    assert len(upstream.searches) == 2
+
+    response = await api.post("/get_recommendation/anime/batch", json=items)
+    assert response.json()["results"] == results
+    assert len(upstream.searches) == 2
+
+
+
+@pytest.mark.anyio
+async def test_get_variants_and_304(api, upstream):
+    params = {"status": "complete"}
+    plain = await api.get("/get_recommendation/anime", params=params, headers={"Accept-Encoding": "identity"})
+    assert plain.status_code == 200
+    assert "Content-Encoding" not in plain.headers
+    etag = plain.headers["ETag"]
+
+    raw = await api.get("/get_recommendation/anime", params=params, headers={"Accept-Encoding": "gzip"})
+    assert raw.headers["Content-Encoding"] == "gzip"
+    assert raw.headers["ETag"] == etag
+    assert raw.json() == plain.json()
+
+    not_modified = await api.get("/get_recommendation/anime", params=params, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert int(not_modified.headers["Cache-Control"].rsplit("=", 1)[1]) > 0
+    assert len(upstream.searches) == 1
+
+
+@pytest.mark.anyio
+async def test_get_variants_are_stored_compressed(services, api):
+    await api.get("/get_recommendation/anime", params={"status": "complete"})
+    request_name = await page_name(COMPLETE, services)
+    variants = await services.redis.hgetall(f"http:{request_name}")
+    assert json.loads(gzip.decompress(variants[b"gzip"])) == await reco_request_handler(params=COMPLETE, services=services)
+    # lives as long as the entry it was built from
+    assert abs(await services.redis.ttl(f"http:{request_name}") - await services.redis.ttl(f"l2:{request_name}")) <= 1
+
+
+
+@pytest.mark.anyio
+async def test_degraded_redis_serves_from_the_local_tier(services, upstream):
+    first = await reco_request_handler(params=COMPLETE, services=services)
+    redis_health.trip("test")
+    assert redis_health.degraded
+
+    # Redis isn't read while degraded: an empty one changes nothing
+    services.redis = MemoryBackend()
+    assert await reco_request_handler(params=COMPLETE, services=services) == first
+    assert len(upstream.searches) == 1
+    assert [key async for key in services.redis.scan_iter()] == []
+
+
+@pytest.mark.anyio
+async def test_degraded_redis_and_failing_jikan_serve_a_stale_copy(services, upstream):
+    redis_health.trip("test")
+    first = await reco_request_handler(params=COMPLETE, services=services)
+    assert len(upstream.searches) == 1
+    # nor written
+    assert [key async for key in services.redis.scan_iter()] == []
+
+    request_name = await page_name(COMPLETE, services)
+    local_cache.set(request_name, local_cache.get(request_name), -1, "regular")
+    upstream.failures[1] = 500
+    assert await reco_request_handler(params=COMPLETE, services=services) == first
+    assert len(upstream.searches) == 2
+
+
+def test_local_cache_budgets():
+    cache = LocalCache(budgets={"regular": 10, "hot": 10})
+    cache.set("a", b"123456", 60, "regular")
+    cache.set("b", b"123456", 60, "hot")
+    cache.set("c", b"123456", 60, "regular")
+    # one LRU per class: "c" pushed out "a", not "b"
+    assert cache.get("a") is None
+    assert cache.get("b") == cache.get("c") == b"123456"
+    assert cache.stats()["regular"]["evictions"] == 1
+
+    cache.set("b", b"123456", -1, "hot")
+    assert cache.get("b") is None
+    assert cache.get("b", allow_stale=True) == b"123456"
@@ -0,0 +1,74 @@
+import pytest
+from redis.exceptions import ConnectionError
+
+from src import config
+from src.cache.rollups import HotnessRollups, hotness_rollups
+from src.data.schemas import AnimeParams
+from src.request_handlers import reco_request_handler
+
+
+def new_rollups(**kwargs) -> HotnessRollups:
+    return HotnessRollups(**{"interval": 60, "bucket_seconds": 3600, "retention": 24, "bucket_top": 100, "local_max": 100, **kwargs})
+
+
+@pytest.mark.anyio
+async def test_flushed_counts_add_up_across_workers(services):
+    redis = services.redis
+    first, second = new_rollups(), new_rollups()
+    for rollups, hits in ((first, 3), (second, 2)):
+        for _ in range(hits):
+            rollups.note("pages", "anime|q1|page:1|")
+        rollups.note("pages", "anime|q1|page:2|")
+        rollups.note("pages", "anime|q2|page:1|")
+        rollups.note("params", "anime|status:airing")
+        await rollups.flush(redis)
+    assert first.counts == {"pages": {}, "params": {}}
+
+    assert await first.top(redis, "pages", hours=1, k=2) == [("anime|q1|page:1|", 5), ("anime|q1|page:2|", 2)]
+    # pages summed per canonical query
+    assert await first.top(redis, "queries", hours=1, k=5) == [("anime|q1|", 7), ("anime|q2|", 2)]
+    assert (await first.report(redis, hours=1, k=1))["params"] == [{"name": "anime|status:airing", "hits": 2}]
+    assert await redis.ttl(f"rollup:pages:{first.bucket()}") == 3600 * 24
+
+
+@pytest.mark.anyio
+async def test_storage_is_bounded(services):
+    rollups = new_rollups(bucket_top=3, local_max=10)
+    for i in range(11):
+        rollups.note("pages", f"page:{i}|")
+    # over local_max: the heaviest half is kept
+    assert len(rollups.counts["pages"]) == 5
+
+    for i in range(10):
+        for _ in range(i + 1):
+            rollups.note("pages", f"page:{i}|")
+    await rollups.flush(services.redis)
+    assert [name for name, _ in await rollups.top(services.redis, "pages", hours=1, k=10)] == ["page:9|", "page:8|", "page:7|"]
+
+
+@pytest.mark.anyio
+async def test_failed_flush_keeps_the_counts(services, monkeypatch):
+    rollups = new_rollups()
+    rollups.note("pages", "page:1|")
+
+    async def fail(*args, **kwargs):
+        raise ConnectionError("Redis gone")
+    monkeypatch.setattr(services.redis, "zincrby", fail)
+    with pytest.raises(ConnectionError):
+        await rollups.flush(services.redis)
+    rollups.note("pages", "page:1|")
+    assert rollups.counts["pages"] == {"page:1|": 2}
+
+
+@pytest.mark.anyio
+async def test_requests_are_counted_and_reported(services, api, monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "secret")
+    for status in ("airing", "airing", "complete"):
+        await reco_request_handler(params=AnimeParams(status=status), services=services)
+    await hotness_rollups.flush(services.redis)
+
+    response = await api.get("/admin/hotness", params={"hours": 1, "k": 1}, headers={"X-Admin-Token": "secret"})
+    report = response.json()["report"]
+    assert report["params"] == [{"name": "anime|status:airing", "hits": 2}]
+    assert report["queries"][0]["name"].endswith("status:airing|sfw:true|") and report["queries"][0]["hits"] == 2
+    assert (await api.get("/admin/hotness")).status_code == 403
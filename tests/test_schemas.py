@@ -0,0 +1,55 @@
+import pytest
+from pydantic import ValidationError
+
+from src.data.schemas import AnimeQuery, MangaParams, MangaQuery, canonical_pairs
+
+
+BODIES = [
+    {},
+    {"sfw": None},
+    {"order_by": "score", "status": "airing", "rating": "pg13", "genres": ["1", "4"], "page": 3},
+    {"type": "tv", "min_score": 7, "max_score": 9.5, "start_date": "2020-01-01", "end_date": "2021-06-30"},
+]
+
+
+@pytest.mark.parametrize("body", BODIES)
+def test_canonical_pairs_match_the_dump(body):
+    params = AnimeQuery(**body)
+    dumped = params.model_dump(mode="json", exclude_none=True)
+    dumped.pop("page")
+    assert params.canonical_params() == dumped
+    # field order is the cache key order
+    assert [name for name, _ in canonical_pairs(params)] == list(dumped)
+
+
+def test_canonical_pairs_are_memoized_per_distinct_params():
+    first, second = AnimeQuery(genres=["1"], page=1), AnimeQuery(genres=["1"], page=1)
+    assert canonical_pairs(first) is canonical_pairs(second)
+    assert canonical_pairs(first) is not canonical_pairs(AnimeQuery(genres=["1"], page=2))
+
+    # the memoized pairs survive callers editing their dict
+    params = first.canonical_params()
+    params["genres"].append("2")
+    params["page"] = 2
+    assert first.canonical_params() == {"sfw": "true", "genres": ["1"]}
+
+
+def test_media_values():
+    assert MangaQuery(order_by="chapters", status="publishing").canonical_params() == {
+        "order_by": "chapters", "status": "publishing", "sfw": "true",
+    }
+    with pytest.raises(ValidationError):
+        MangaParams(status="airing")
+    with pytest.raises(ValidationError):
+        MangaParams(order_by="episodes")
+    with pytest.raises(ValidationError):
+        AnimeQuery(order_by="chapters")
+
+
+def test_ranges():
+    with pytest.raises(ValidationError):
+        AnimeQuery(min_score=8, max_score=7)
+    with pytest.raises(ValidationError):
+        AnimeQuery(start_date="2021-01-01", end_date="2020-01-01")
+    with pytest.raises(ValidationError):
+        AnimeQuery(page=0)
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import anyio
+import pytest
+from redis.exceptions import ConnectionError
+
+from src import config
+from src.cache.redis_database import entry_fresh_ttl
+from src.cache.redis_health import redis_health
+from src.cache.rollups import hotness_rollups
+from src.cache.warmup import LEADER_KEY, STATUS_KEY, CacheWarmup, read_manifest, replay_hotness, snapshot_manifest, warmup
+from src.data.schemas import AnimeParams
+from src.request_handlers import build_query
+
+
+@pytest.fixture
+def manifest_path(tmp_path, monkeypatch):
+    path = tmp_path / "warmup_manifest.json"
+    monkeypatch.setattr(config, "WARMUP_MANIFEST_PATH", path)
+    return path
+
+
+async def page_names(services, *statuses: str) -> list[str]:
+    return [f"{(await build_query(params=AnimeParams(status=status), services=services))["request_name"]}page:1|" for status in statuses]
+
+
+async def until_ready(worker: CacheWarmup):
+    with anyio.fail_after(2):
+        while not worker.ready:
+            await asyncio.sleep(0.01)
+
+
+@pytest.mark.anyio
+async def test_manifest_replayed_before_ready(services, upstream, api, manifest_path):
+    names = await page_names(services, "complete", "airing")
+    manifest_path.write_text(json.dumps({
+        "requests": [{"request_name": name, "score": 0.5} for name in names],
+        "lookups": {"lookup:genres:manga": {"action": "1"}},
+    }))
+
+    response = await api.get("/ready")
+    assert response.status_code == 503
+
+    warmup.start(services)
+    await until_ready(warmup)
+    assert all([await entry_fresh_ttl(services.redis, name) > 0 for name in names])
+    assert await services.redis.hget("lookup:genres:manga", "action") == b"1"
+    assert len(upstream.searches) == 2
+
+    response = await api.get("/ready")
+    assert response.status_code == 200
+    assert response.json() == {"ready": True, "coverage": 1.0, "warmed": 2, "total": 2}
+    await warmup.stop()
+
+
+@pytest.mark.anyio
+async def test_other_workers_follow_the_leader(services, upstream, manifest_path):
+    await services.redis.set(LEADER_KEY, "another-worker")
+    await services.redis.hset(STATUS_KEY, mapping={"warmed": 1, "total": 4, "ready": 0})
+    follower = CacheWarmup()
+    follower.start(services)
+    with anyio.fail_after(2):
+        while follower.total != 4:
+            await asyncio.sleep(0.01)
+    assert not follower.ready
+
+    await services.redis.hset(STATUS_KEY, mapping={"warmed": 4, "ready": 1})
+    await until_ready(follower)
+    assert follower.coverage == 1
+    assert upstream.searches == []
+    await follower.stop()
+
+
+@pytest.mark.anyio
+async def test_failed_warmup_still_gets_ready(services, manifest_path, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise ConnectionError("Redis gone")
+    monkeypatch.setattr(services.redis, "set", fail)
+
+    failing = CacheWarmup()
+    failing.start(services)
+    await until_ready(failing)
+    assert redis_health.degraded
+    await failing.stop()
+
+
+@pytest.mark.anyio
+async def test_manifest_from_the_rollups(services, upstream, manifest_path):
+    complete, airing, upcoming = await page_names(services, "complete", "airing", "upcoming")
+    for name, hits in ((complete, 120), (airing, 3), (upcoming, 1)):
+        for _ in range(hits):
+            hotness_rollups.note("pages", name)
+    await services.redis.hset("lookup:genres:anime", mapping={"action": "1"})
+
+    manifest = await snapshot_manifest(services=services, previous=read_manifest())
+    minutes = config.WARMUP_HISTORY_HOURS * 60
+    # hottest first. Seen only once: not worth an upstream call at startup
+    assert manifest["requests"] == [{"request_name": complete, "score": round(120 / minutes, 3)}, {"request_name": airing, "score": round(3 / minutes, 3)}]
+    assert manifest["lookups"] == {"lookup:genres:anime": {"action": "1"}}
+
+    # a page hit 120 times a day is warmed as hot as a page hit ~5 times an hour, not as a cold one
+    assert replay_hotness(manifest["requests"][0]["score"]) == 5
+    assert replay_hotness(manifest["requests"][1]["score"]) >= 1